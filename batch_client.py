@@ -0,0 +1,274 @@
+import json
+import os
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+from portkey_ai import Portkey
+
+from telemetry import Telemetry
+
+BATCH_ENDPOINT = "/v1/chat/completions"
+
+## Terminal batch states; anything else is still queued or running.
+BATCH_DONE = ("completed",)
+BATCH_FAILED = ("failed", "expired", "cancelled")
+
+
+class BatchResult:
+    """
+    Outcome of one request in a batch job: the chat completion body on
+    success, otherwise an error message.
+    """
+
+    __slots__ = ("custom_id", "body", "error")
+
+    def __init__(self, custom_id: str, body: Optional[Dict[str, Any]], error: Optional[str]):
+        self.custom_id = custom_id
+        self.body = body
+        self.error = error
+
+    @property
+    def content(self) -> Optional[str]:
+        try:
+            return self.body["choices"][0]["message"]["content"]
+        except (KeyError, IndexError, TypeError):
+            return None
+
+
+class BatchClient:
+    """
+    Offline submission of chat completions through the gateway batch API.
+
+    Requests are written to JSONL job files (one per provider, split at
+    `max_requests_per_file`), uploaded with purpose "batch", submitted,
+    polled until done, and the results mapped back by custom_id.
+    """
+
+    def __init__(
+        self,
+        portkey: Portkey,
+        work_dir: str = "batches",
+        poll_interval: float = 60,
+        max_wait_seconds: float = 24 * 3600,
+        completion_window: str = "24h",
+        max_requests_per_file: int = 50000,
+        telemetry: Optional[Telemetry] = None,
+    ):
+        self.portkey = portkey
+        self.work_dir = work_dir
+        self.poll_interval = poll_interval
+        self.max_wait_seconds = max_wait_seconds
+        self.completion_window = completion_window
+        self.max_requests_per_file = max_requests_per_file
+        self.telemetry = telemetry or Telemetry()
+
+    @classmethod
+    def from_config(
+        cls,
+        config: Dict[str, Any],
+        portkey: Portkey,
+        telemetry: Optional[Telemetry] = None,
+    ) -> Optional["BatchClient"]:
+        """
+        Build a client when batch_api.enabled is set, otherwise None.
+        """
+        cfg = config.get("batch_api") or {}
+        if not cfg.get("enabled", False):
+            return None
+
+        return cls(
+            portkey=portkey,
+            work_dir=cfg.get(
+                "work_dir", os.path.join(config["export"]["output_dir"], "batches")
+            ),
+            poll_interval=float(cfg.get("poll_interval", 60)),
+            max_wait_seconds=float(cfg.get("max_wait_seconds", 24 * 3600)),
+            completion_window=cfg.get("completion_window", "24h"),
+            max_requests_per_file=int(cfg.get("max_requests_per_file", 50000)),
+            telemetry=telemetry,
+        )
+
+    # ---------- REQUESTS ----------
+
+    @staticmethod
+    def request(custom_id: str, model: str, messages: List[Dict[str, Any]], **params) -> Dict[str, Any]:
+        """
+        One line of a batch job file.
+        """
+        return {
+            "custom_id": custom_id,
+            "method": "POST",
+            "url": BATCH_ENDPOINT,
+            "body": {"model": model, "messages": messages, **params},
+        }
+
+    @staticmethod
+    def _split_model(model: str) -> Tuple[Optional[str], str]:
+        """
+        "@openai/gpt-4o" -> ("@openai", "gpt-4o"); the provider goes in
+        the job header since one batch is sent to one provider.
+        """
+        if model.startswith("@") and "/" in model:
+            provider, name = model.split("/", 1)
+            return provider, name
+        return None, model
+
+    # ---------- SUBMIT ----------
+
+    def run(
+        self,
+        job_name: str,
+        requests: List[Dict[str, Any]],
+        metadata: Optional[Dict[str, Any]] = None,
+        stage: str = "batch",
+    ) -> Dict[str, BatchResult]:
+        """
+        Submit all requests, wait for every job and return results keyed
+        by custom_id. Requests missing from the output, or whose job
+        failed, expired or timed out, count as failed; other jobs' results
+        are kept.
+        """
+        if not requests:
+            return {}
+
+        os.makedirs(self.work_dir, exist_ok=True)
+
+        by_provider: Dict[Optional[str], List[Dict[str, Any]]] = {}
+        for req in requests:
+            provider, name = self._split_model(req["body"]["model"])
+            line = dict(req, body=dict(req["body"], model=name))
+            by_provider.setdefault(provider, []).append(line)
+
+        jobs = []
+        for provider, lines in by_provider.items():
+            for start in range(0, len(lines), self.max_requests_per_file):
+                part = lines[start:start + self.max_requests_per_file]
+                jobs.append(
+                    (part, *self._submit(job_name, len(jobs), provider, part, metadata))
+                )
+
+        results: Dict[str, BatchResult] = {}
+        for part, client, batch_id in jobs:
+            try:
+                with self.telemetry.span(f"{stage}.batch_wait", batch=batch_id):
+                    batch = self.wait_for_batch(client, batch_id)
+                results.update(self._collect(client, batch))
+            except Exception as e:
+                print(f"[BatchClient][ERROR] {e}: {len(part)} requests failed")
+                for line in part:
+                    results[line["custom_id"]] = BatchResult(line["custom_id"], None, str(e))
+
+        for req in requests:
+            if req["custom_id"] not in results:
+                results[req["custom_id"]] = BatchResult(
+                    req["custom_id"], None, "missing from batch output"
+                )
+
+        for req in requests:
+            result = results[req["custom_id"]]
+            model = req["body"]["model"]
+            self.telemetry.inc(
+                "llm_batch_requests_total",
+                stage=stage, model=model, status="error" if result.error else "ok",
+            )
+
+        return results
+
+    def _submit(
+        self,
+        job_name: str,
+        part: int,
+        provider: Optional[str],
+        lines: List[Dict[str, Any]],
+        metadata: Optional[Dict[str, Any]],
+    ) -> Tuple[Portkey, str]:
+        safe_provider = (provider or "default").lstrip("@").replace("/", "_")
+        path = os.path.join(self.work_dir, f"{job_name}-{safe_provider}-{part}.jsonl")
+
+        with open(path, "w", encoding="utf-8") as f:
+            for line in lines:
+                f.write(json.dumps(line) + "\n")
+
+        options: Dict[str, Any] = {}
+        if provider:
+            options["provider"] = provider
+        if metadata:
+            options["metadata"] = metadata
+        client = self.portkey.with_options(**options) if options else self.portkey
+
+        with open(path, "rb") as f:
+            uploaded = client.files.create(file=f, purpose="batch")
+
+        batch = client.batches.create(
+            input_file_id=uploaded.id,
+            endpoint=BATCH_ENDPOINT,
+            completion_window=self.completion_window,
+        )
+
+        print(
+            f"[BatchClient] Submitted {len(lines)} requests "
+            f"provider={provider or '-'} batch={batch.id} file={path}"
+        )
+
+        return client, batch.id
+
+    # ---------- POLL ----------
+
+    def wait_for_batch(self, client: Portkey, batch_id: str) -> Any:
+        """
+        Poll until the batch job completes successfully.
+        """
+        deadline = time.monotonic() + self.max_wait_seconds
+
+        while True:
+            batch = client.batches.retrieve(batch_id)
+
+            if batch.status in BATCH_DONE:
+                return batch
+
+            if batch.status in BATCH_FAILED:
+                raise RuntimeError(f"Batch {batch_id} {batch.status}")
+
+            if time.monotonic() > deadline:
+                raise TimeoutError(
+                    f"Batch {batch_id} still {batch.status} after "
+                    f"{self.max_wait_seconds}s"
+                )
+
+            time.sleep(self.poll_interval)
+
+    # ---------- RESULTS ----------
+
+    def _collect(self, client: Portkey, batch: Any) -> Dict[str, BatchResult]:
+        results: Dict[str, BatchResult] = {}
+
+        for file_id in (batch.output_file_id, batch.error_file_id):
+            if not file_id:
+                continue
+
+            content = client.files.content(file_id)
+            for line in content.text.splitlines():
+                if not line.strip():
+                    continue
+
+                item = json.loads(line)
+                response = item.get("response") or {}
+                status = response.get("status_code")
+
+                if item.get("error") or status != 200:
+                    error = item.get("error") or (response.get("body") or {}).get("error")
+                    results[item["custom_id"]] = BatchResult(
+                        item["custom_id"], None, f"status={status} error={error}"
+                    )
+                else:
+                    results[item["custom_id"]] = BatchResult(
+                        item["custom_id"], response.get("body"), None
+                    )
+
+        print(
+            f"[BatchClient] Batch {batch.id} done: "
+            f"{sum(1 for r in results.values() if not r.error)} ok, "
+            f"{sum(1 for r in results.values() if r.error)} failed"
+        )
+
+        return results
@@ -0,0 +1,288 @@
+import argparse
+import functools
+import json
+import os
+import resource
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+from contextlib import closing
+from typing import Any, Callable, Dict, List, Optional
+
+import yaml
+
+from eval_metric_store import EvalMetricStore
+from html_reporter import HTMLReporter
+from llm_judge import LLMJudge
+from log_extractor import LogExtractor
+from mock_gateway import MockGateway
+from runner_eval import EvalRunner
+from scheduler import Scheduler
+
+
+class StageTimer:
+    """
+    Wraps pipeline entry points and accumulates call counts and wall time
+    per stage for the duration of a benchmark.
+    """
+
+    def __init__(self):
+        self.stages: Dict[str, Dict[str, float]] = {}
+        self._patches: List[tuple] = []
+        self._lock = threading.Lock()
+
+    def wrap(self, owner: Any, attr: str, stage: str) -> None:
+        raw = owner.__dict__[attr]
+        is_static = isinstance(raw, staticmethod)
+        fn: Callable = raw.__func__ if is_static else raw
+
+        @functools.wraps(fn)
+        def timed(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                self._add(stage, time.perf_counter() - start)
+
+        setattr(owner, attr, staticmethod(timed) if is_static else timed)
+        self._patches.append((owner, attr, raw))
+
+    def _add(self, stage: str, seconds: float) -> None:
+        with self._lock:
+            entry = self.stages.setdefault(stage, {"calls": 0, "seconds": 0.0})
+            entry["calls"] += 1
+            entry["seconds"] += seconds
+
+    def restore(self) -> None:
+        for owner, attr, raw in reversed(self._patches):
+            setattr(owner, attr, raw)
+        self._patches = []
+
+
+def build_bench_config(
+    base_config_path: str,
+    workdir: str,
+    base_url: str,
+    agents: Optional[List[str]],
+    batch: bool = False,
+    streaming: bool = False,
+    chunk_size: Optional[int] = None,
+    budget_usd: Optional[float] = None,
+    batch_api: bool = False,
+    stream_replay: bool = False,
+) -> str:
+    """
+    Derive a config that points every component at the mock gateway and
+    keeps all artifacts inside `workdir`.
+    """
+    with open(base_config_path, "r") as f:
+        config = yaml.safe_load(f)
+
+    config.setdefault("http", {})["base_url"] = base_url
+    config["export"]["output_dir"] = os.path.join(workdir, "exports")
+    config["export"]["poll_interval"] = 0.05
+    config["scheduler"]["db_path"] = os.path.join(workdir, "metrics.db")
+    config["scheduler"]["rate_limit_sleep_seconds"] = 0
+    config.setdefault("call_policy", {})["backoff_base"] = 0.05
+    config["export"]["batch"] = batch
+
+    pipeline = config.setdefault("pipeline", {})
+    pipeline["streaming"] = streaming
+    if chunk_size:
+        pipeline["chunk_size"] = chunk_size
+
+    config.setdefault("replay", {})["stream"] = stream_replay
+
+    batch_cfg = config.setdefault("batch_api", {})
+    batch_cfg["enabled"] = batch_api
+    batch_cfg["poll_interval"] = 0.05
+
+    if budget_usd is not None:
+        config.setdefault("budget", {})["per_run_usd"] = budget_usd
+
+    if agents:
+        config["team"]["agents"] = [{"name": name} for name in agents]
+
+    path = os.path.join(workdir, "bench_config.yaml")
+    with open(path, "w") as f:
+        yaml.safe_dump(config, f)
+
+    return path
+
+
+def run_benchmark(args: argparse.Namespace) -> Dict[str, Any]:
+    os.environ.setdefault("PORTKEY_API_KEY", "mock")
+
+    timer = StageTimer()
+    timer.wrap(LogExtractor, "_run_export", "export")
+    timer.wrap(EvalRunner, "run_batch", "replay")
+    timer.wrap(LLMJudge, "judge_batch", "judge")
+    timer.wrap(EvalMetricStore, "upsert_evaluations", "db_write")
+    timer.wrap(HTMLReporter, "write_html_report", "report")
+
+    with open(args.config, "r") as f:
+        base_config = yaml.safe_load(f)
+
+    agents = args.agents or [a["name"] for a in base_config["team"]["agents"]]
+    models = [m.split("/")[-1] for m in base_config["models"]]
+
+    gateway = MockGateway(
+        agents=agents,
+        models=models if args.batch else None,
+        seed=args.seed,
+        latency_ms=args.latency_ms,
+        latency_jitter_ms=args.latency_jitter_ms,
+        error_rate=args.error_rate,
+        rate_limit_rps=args.rate_limit_rps,
+        export_rows=args.export_rows,
+        export_delay_ms=args.export_delay_ms,
+    )
+
+    try:
+        with gateway, tempfile.TemporaryDirectory(prefix="bench-") as workdir:
+            config_path = build_bench_config(
+                args.config,
+                workdir,
+                gateway.base_url,
+                args.agents,
+                batch=args.batch,
+                streaming=args.streaming,
+                chunk_size=args.chunk_size,
+                budget_usd=args.budget_usd,
+                batch_api=args.batch_api,
+                stream_replay=args.stream_replay,
+            )
+
+            start = time.perf_counter()
+            Scheduler(config_path).run_once()
+            elapsed = time.perf_counter() - start
+
+            db_path = os.path.join(workdir, "metrics.db")
+            with closing(sqlite3.connect(db_path)) as conn:
+                rows = conn.execute("SELECT COUNT(*) FROM evaluations").fetchone()[0]
+    finally:
+        timer.restore()
+
+    counters = dict(gateway.state.counters)
+    chat_calls = counters.get("chat.completions", 0)
+    db = timer.stages.get("db_write", {"calls": 0, "seconds": 0.0})
+
+    stages = {
+        name: {
+            "calls": int(entry["calls"]),
+            "seconds": round(entry["seconds"], 4),
+            "calls_per_second": round(entry["calls"] / entry["seconds"], 2)
+            if entry["seconds"] else None,
+        }
+        for name, entry in timer.stages.items()
+    }
+
+    return {
+        "seed": args.seed,
+        "export_rows": args.export_rows,
+        "batch": args.batch,
+        "streaming": args.streaming,
+        "batch_api": args.batch_api,
+        "stream_replay": args.stream_replay,
+        "end_to_end_seconds": round(elapsed, 4),
+        "evaluations_written": rows,
+        "evaluations_per_second": round(rows / elapsed, 2),
+        "llm_calls": chat_calls,
+        "llm_calls_per_second": round(chat_calls / elapsed, 2),
+        "db_writes_per_second": round(rows / db["seconds"], 2)
+        if db["seconds"] else None,
+        # ru_maxrss is reported in kilobytes on Linux.
+        "peak_rss_mb": round(
+            resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1
+        ),
+        "stages": stages,
+        "gateway": counters,
+    }
+
+
+def compare(result: Dict[str, Any], baseline: Dict[str, Any], tolerance: float) -> List[str]:
+    """
+    Return human-readable regressions beyond `tolerance` (fractional).
+    """
+    regressions = []
+
+    checks = [
+        ("end_to_end_seconds", "lower"),
+        ("llm_calls_per_second", "higher"),
+        ("db_writes_per_second", "higher"),
+        ("peak_rss_mb", "lower"),
+    ]
+
+    for key, better in checks:
+        new, old = result.get(key), baseline.get(key)
+        if not new or not old:
+            continue
+
+        change = (new - old) / old
+        if (better == "lower" and change > tolerance) or (
+            better == "higher" and -change > tolerance
+        ):
+            regressions.append(f"{key}: {old} -> {new} ({change:+.1%})")
+
+    return regressions
+
+
+# ---------- ENTRY POINT ----------
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="End-to-end pipeline benchmark against a local mock gateway"
+    )
+    parser.add_argument("--config", default="config.yaml")
+    parser.add_argument("--agents", nargs="*", help="Override team agents")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--export-rows", type=int, default=50)
+    parser.add_argument("--export-delay-ms", type=float, default=100.0)
+    parser.add_argument("--latency-ms", type=float, default=20.0)
+    parser.add_argument("--latency-jitter-ms", type=float, default=5.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--rate-limit-rps", type=float, default=None)
+    parser.add_argument(
+        "--batch", action="store_true",
+        help="Use team-wide exports split locally (export.batch)",
+    )
+    parser.add_argument(
+        "--streaming", action="store_true",
+        help="Process traces chunk by chunk (pipeline.streaming)",
+    )
+    parser.add_argument("--chunk-size", type=int, default=None)
+    parser.add_argument(
+        "--stream-replay", action="store_true",
+        help="Stream replay completions and record TTFT (replay.stream)",
+    )
+    parser.add_argument(
+        "--batch-api", action="store_true",
+        help="Replay and judge through the offline batch API (batch_api.enabled)",
+    )
+    parser.add_argument(
+        "--budget-usd", type=float, default=None,
+        help="Per-run budget for the cost planner (budget.per_run_usd)",
+    )
+    parser.add_argument("--output", help="Write the JSON result here")
+    parser.add_argument("--compare", help="Baseline JSON result to compare with")
+    parser.add_argument("--tolerance", type=float, default=0.2)
+
+    args = parser.parse_args()
+
+    result = run_benchmark(args)
+    report = json.dumps(result, indent=2)
+    print(report)
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(report)
+
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as f:
+            regressions = compare(result, json.load(f), args.tolerance)
+
+        for line in regressions:
+            print(f"[Benchmark] REGRESSION {line}")
+
+        sys.exit(1 if regressions else 0)
@@ -0,0 +1,293 @@
+import random
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from typing import Any, Callable, Deque, Dict, Optional, TypeVar
+
+import httpx
+
+from telemetry import Telemetry
+
+T = TypeVar("T")
+
+RETRYABLE_ERROR_NAMES = {"APITimeoutError", "APIConnectionError"}
+
+
+class CallPolicy:
+    """
+    Timeouts, retries and optional hedging for LLM calls.
+
+    Reads the optional `call_policy` section of config.yaml:
+
+        call_policy:
+          timeout_seconds: 60
+          max_retries: 3
+          backoff_base: 1.0
+          backoff_max: 30
+          models:
+            "@bedrock/...":
+              timeout_seconds: 90
+          hedge:
+            enabled: false
+            percentile: 95
+            min_samples: 20
+            max_ratio: 0.05
+            max_hedges: 200
+            max_workers: 8
+    """
+
+    DEFAULTS = {
+        "timeout_seconds": 60.0,
+        "max_retries": 3,
+        "backoff_base": 1.0,
+        "backoff_max": 30.0,
+    }
+
+    def __init__(
+        self,
+        policy_cfg: Optional[Dict[str, Any]] = None,
+        seed: Optional[int] = None,
+        telemetry: Optional[Telemetry] = None,
+    ):
+        cfg = policy_cfg or {}
+        self.telemetry = telemetry or Telemetry()
+
+        self.defaults = {
+            key: cfg.get(key, default) for key, default in self.DEFAULTS.items()
+        }
+        self.model_overrides: Dict[str, Dict[str, Any]] = cfg.get("models") or {}
+
+        hedge_cfg = cfg.get("hedge") or {}
+        self.hedge_enabled: bool = bool(hedge_cfg.get("enabled", False))
+        self.hedge_percentile: float = float(hedge_cfg.get("percentile", 95))
+        self.hedge_min_samples: int = int(hedge_cfg.get("min_samples", 20))
+        self.hedge_max_ratio: float = float(hedge_cfg.get("max_ratio", 0.05))
+        self.hedge_max_total: Optional[int] = hedge_cfg.get("max_hedges")
+        self.hedge_max_workers: int = int(hedge_cfg.get("max_workers", 8))
+
+        self._latencies: Dict[str, Deque[float]] = {}
+        self._lock = threading.Lock()
+        self._rng = random.Random(seed)
+        self._executor: Optional[ThreadPoolExecutor] = None
+
+        self.stats: Dict[str, int] = {}
+        self.reset_stats()
+
+    @classmethod
+    def from_config(
+        cls,
+        config: Dict[str, Any],
+        telemetry: Optional[Telemetry] = None,
+    ) -> "CallPolicy":
+        return cls(config.get("call_policy", {}), telemetry=telemetry)
+
+    # ---------- SETTINGS ----------
+
+    def settings_for(self, model: str) -> Dict[str, Any]:
+        settings = dict(self.defaults)
+        settings.update(self.model_overrides.get(model, {}))
+        return settings
+
+    def reset_stats(self) -> None:
+        """
+        Reset per-run counters. Observed latencies are kept.
+        """
+        with self._lock:
+            self.stats = {
+                "calls": 0,
+                "retries": 0,
+                "hedges": 0,
+                "hedge_wins": 0,
+                "failures": 0,
+            }
+
+    # ---------- LATENCY TRACKING ----------
+
+    def _record_latency(self, model: str, seconds: float) -> None:
+        with self._lock:
+            window = self._latencies.setdefault(model, deque(maxlen=500))
+            window.append(seconds)
+
+    def latency_percentile(self, model: str, percentile: float) -> Optional[float]:
+        """
+        Observed latency percentile for a model, or None until enough
+        samples have been collected.
+        """
+        with self._lock:
+            samples = sorted(self._latencies.get(model, ()))
+
+        if len(samples) < self.hedge_min_samples:
+            return None
+
+        rank = int(round(percentile / 100 * (len(samples) - 1)))
+        return samples[rank]
+
+    # ---------- CALL ----------
+
+    def call(self, model: str, fn: Callable[[float], T]) -> T:
+        """
+        Run `fn(timeout)` under the model's policy and return its result.
+        """
+        settings = self.settings_for(model)
+        attempt = 0
+
+        with self._lock:
+            self.stats["calls"] += 1
+
+        while True:
+            try:
+                return self._attempt(model, fn, settings)
+            except Exception as e:
+                if attempt >= int(settings["max_retries"]) or not self._is_retryable(e):
+                    with self._lock:
+                        self.stats["failures"] += 1
+                    self.telemetry.inc("llm_call_failures_total", model=model)
+                    raise
+
+                delay = self._backoff(attempt, settings)
+                attempt += 1
+
+                with self._lock:
+                    self.stats["retries"] += 1
+                self.telemetry.inc("llm_retries_total", model=model)
+
+                print(
+                    f"[CallPolicy] Retry {attempt}/{settings['max_retries']} "
+                    f"model={model} in {delay:.2f}s: {e}"
+                )
+                time.sleep(delay)
+
+    def _attempt(
+        self,
+        model: str,
+        fn: Callable[[float], T],
+        settings: Dict[str, Any],
+    ) -> T:
+        timeout = float(settings["timeout_seconds"])
+        hedge_after = self._hedge_delay(model)
+        start = time.monotonic()
+
+        if hedge_after is None:
+            result = fn(timeout)
+            self._record_latency(model, time.monotonic() - start)
+            return result
+
+        ## The primary never queues behind other calls' hedges, so call
+        ## concurrency is not capped by the pool and hedge_after measures
+        ## only the call itself.
+        primary = self._start_primary(fn, timeout)
+        done, _ = wait([primary], timeout=hedge_after)
+
+        if done or not self._take_hedge_budget():
+            result = primary.result()
+            self._record_latency(model, time.monotonic() - start)
+            return result
+
+        print(
+            f"[CallPolicy] Hedging model={model} "
+            f"after {hedge_after:.2f}s (p{self.hedge_percentile:g})"
+        )
+        self.telemetry.inc("llm_hedges_total", model=model)
+        hedge = self._get_executor().submit(fn, timeout)
+
+        pending = {primary, hedge}
+        first_error: Optional[BaseException] = None
+
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                try:
+                    result = future.result()
+                except Exception as e:
+                    first_error = first_error or e
+                    continue
+
+                if future is hedge:
+                    with self._lock:
+                        self.stats["hedge_wins"] += 1
+                    self.telemetry.inc("llm_hedge_wins_total", model=model)
+                else:
+                    ## A hedge still queued for a pool worker is dropped; one
+                    ## already in flight finishes and is discarded.
+                    hedge.cancel()
+
+                self._record_latency(model, time.monotonic() - start)
+                return result
+
+        raise first_error
+
+    # ---------- HEDGING ----------
+
+    @staticmethod
+    def _start_primary(fn: Callable[[float], T], timeout: float) -> "Future[T]":
+        """
+        Run the primary call on its own thread. It cannot stay on the
+        caller's thread: a blocking call there could not be abandoned when
+        the hedge wins.
+        """
+        future: "Future[T]" = Future()
+
+        def run() -> None:
+            future.set_running_or_notify_cancel()
+            try:
+                future.set_result(fn(timeout))
+            except BaseException as e:
+                future.set_exception(e)
+
+        threading.Thread(target=run, name="llm-call", daemon=True).start()
+        return future
+
+    def _hedge_delay(self, model: str) -> Optional[float]:
+        if not self.hedge_enabled:
+            return None
+        return self.latency_percentile(model, self.hedge_percentile)
+
+    def _take_hedge_budget(self) -> bool:
+        with self._lock:
+            hedges = self.stats["hedges"]
+
+            if self.hedge_max_total is not None and hedges >= int(self.hedge_max_total):
+                return False
+            if hedges + 1 > self.hedge_max_ratio * self.stats["calls"]:
+                return False
+
+            self.stats["hedges"] += 1
+            return True
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(
+                    max_workers=self.hedge_max_workers,
+                    thread_name_prefix="hedge",
+                )
+            return self._executor
+
+    # ---------- RETRY ----------
+
+    def _backoff(self, attempt: int, settings: Dict[str, Any]) -> float:
+        """
+        Exponential backoff with full jitter.
+        """
+        ceiling = min(
+            float(settings["backoff_max"]),
+            float(settings["backoff_base"]) * (2 ** attempt),
+        )
+        return self._rng.uniform(0, ceiling)
+
+    @staticmethod
+    def _is_retryable(error: BaseException) -> bool:
+        status = getattr(error, "status_code", None)
+        if status is not None:
+            return status == 429 or status >= 500
+
+        return (
+            type(error).__name__ in RETRYABLE_ERROR_NAMES
+            or isinstance(error, (httpx.TransportError, TimeoutError, ConnectionError))
+        )
+
+    def close(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+            self._executor = None
@@ -0,0 +1,452 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import zlib
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+from urllib.parse import parse_qsl, urlencode, urlsplit
+
+import httpx
+import requests
+from requests.adapters import HTTPAdapter
+from requests.structures import CaseInsensitiveDict
+from requests.utils import get_encoding_from_headers
+
+OFF = "off"
+RECORD = "record"
+REPLAY = "replay"
+
+## Stored bodies are already decoded, so transfer framing is not replayed.
+DROPPED_RESPONSE_HEADERS = {"content-encoding", "content-length", "transfer-encoding", "connection"}
+
+DEFAULT_IGNORE_BODY_FIELDS = [
+    "filters.time_of_generation_min",
+    "filters.time_of_generation_max",
+]
+
+## Signed download URLs carry per-request signatures and expiries.
+DEFAULT_IGNORE_QUERY_PARAMS = [
+    "X-Amz-Algorithm", "X-Amz-Credential", "X-Amz-Date", "X-Amz-Expires",
+    "X-Amz-Signature", "X-Amz-Security-Token", "X-Amz-SignedHeaders",
+    "Expires", "Signature", "Key-Pair-Id", "GoogleAccessId",
+    "se", "st", "sig", "sp", "sv", "sr", "expires", "signature",
+]
+
+DEFAULT_MATCH_HEADERS = ["x-portkey-provider", "x-portkey-trace-id", "x-portkey-config"]
+
+Interaction = Tuple[int, Dict[str, str], bytes]
+
+
+class Cassette:
+    """
+    Records HTTP interactions (gateway API calls and export downloads) to
+    an indexed SQLite file and serves them back offline.
+
+    Requests are matched on a hash of method, path, query and JSON body
+    (volatile fields removed, keys sorted) plus a few routing headers, so
+    a replayed run does not need the same host, time window or signed
+    URLs as the recorded one. Repeated GETs (export status polls) get the
+    latest recorded response; other repeated requests get their recorded
+    responses in order, the last one once exhausted.
+
+    Reads the optional `cassette` section of config.yaml:
+
+        cassette:
+          mode: record | replay | off
+          path: cassettes/pipeline.db
+          strict: true
+    """
+
+    def __init__(
+        self,
+        path: str = "cassettes/pipeline.db",
+        mode: str = REPLAY,
+        strict: bool = True,
+        ignore_body_fields: Optional[Iterable[str]] = None,
+        ignore_query_params: Optional[Iterable[str]] = None,
+        match_headers: Optional[Iterable[str]] = None,
+    ):
+        if mode not in (RECORD, REPLAY):
+            raise ValueError(f"Unknown cassette mode: {mode}")
+
+        self.path = Path(path)
+        self.mode = mode
+        ## Replay only: a miss fails the call instead of going live.
+        self.strict = strict
+
+        self.ignore_body_fields = [
+            field.split(".")
+            for field in (DEFAULT_IGNORE_BODY_FIELDS if ignore_body_fields is None else ignore_body_fields)
+        ]
+        self.ignore_query_params = set(
+            DEFAULT_IGNORE_QUERY_PARAMS if ignore_query_params is None else ignore_query_params
+        )
+        self.match_headers = [
+            h.lower() for h in (DEFAULT_MATCH_HEADERS if match_headers is None else match_headers)
+        ]
+
+        self._lock = threading.Lock()
+        ## Next recorded response to serve per key (replay) and keys
+        ## already re-recorded in this process (record).
+        self._served: Dict[str, int] = {}
+        self._recorded: Dict[str, int] = {}
+
+        self.stats = {"hits": 0, "misses": 0, "recorded": 0}
+        self.missed: List[str] = []
+
+        self._init_db()
+
+    @classmethod
+    def from_config(cls, config: Dict[str, Any]) -> Optional["Cassette"]:
+        """
+        Build the cassette from the cassette section, or None when off.
+        CASSETTE_MODE in the environment overrides `mode`.
+        """
+        cfg = config.get("cassette") or {}
+
+        ## YAML reads a bare `off` as False.
+        mode = os.getenv("CASSETTE_MODE") or cfg.get("mode") or OFF
+        if mode == OFF:
+            return None
+
+        cassette = cls(
+            path=cfg.get("path", "cassettes/pipeline.db"),
+            mode=mode,
+            strict=bool(cfg.get("strict", True)),
+            ignore_body_fields=cfg.get("ignore_body_fields"),
+            ignore_query_params=cfg.get("ignore_query_params"),
+            match_headers=cfg.get("match_headers"),
+        )
+
+        print(
+            f"[Cassette] mode={cassette.mode} strict={cassette.strict} "
+            f"path={cassette.path}"
+        )
+        return cassette
+
+    # ---------- INIT ----------
+
+    def _init_db(self) -> None:
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+
+        self._conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS interactions (
+                key TEXT NOT NULL,
+                seq INTEGER NOT NULL,
+
+                method TEXT NOT NULL,
+                url TEXT NOT NULL,
+                status INTEGER NOT NULL,
+                headers TEXT NOT NULL,
+                body BLOB NOT NULL,
+
+                recorded_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+
+                PRIMARY KEY(key, seq)
+            )
+        """)
+
+    @property
+    def live(self) -> bool:
+        """
+        Whether unmatched requests may reach the network.
+        """
+        return self.mode == RECORD or not self.strict
+
+    @property
+    def offline(self) -> bool:
+        return not self.live
+
+    # ---------- MATCHING ----------
+
+    def key(self, method: str, url: str, body: bytes, content_type: str, headers) -> str:
+        parts = urlsplit(url)
+        query = sorted(
+            (k, v) for k, v in parse_qsl(parts.query, keep_blank_values=True)
+            if k not in self.ignore_query_params
+        )
+
+        digest = hashlib.sha256()
+        digest.update(f"{method.upper()} {parts.path}?{urlencode(query)}\n".encode())
+        digest.update(self._normalize_body(body, content_type))
+
+        for name in self.match_headers:
+            digest.update(f"\n{name}={headers.get(name, '')}".encode())
+
+        return digest.hexdigest()
+
+    def _normalize_body(self, body: bytes, content_type: str) -> bytes:
+        if not body:
+            return b""
+
+        ## Multipart boundaries (batch file uploads) are random per request.
+        if "boundary=" in content_type:
+            boundary = content_type.split("boundary=", 1)[1].split(";")[0].strip('"')
+            return body.replace(boundary.encode(), b"BOUNDARY")
+
+        try:
+            data = json.loads(body)
+        except ValueError:
+            return body
+
+        for path in self.ignore_body_fields:
+            node = data
+            for part in path[:-1]:
+                node = node.get(part) if isinstance(node, dict) else None
+            if isinstance(node, dict):
+                node.pop(path[-1], None)
+
+        return json.dumps(data, sort_keys=True, separators=(",", ":")).encode()
+
+    # ---------- STORE ----------
+
+    def lookup(self, key: str, method: str) -> Optional[Interaction]:
+        with self._lock:
+            if method.upper() == "GET":
+                row = self._conn.execute(
+                    "SELECT status, headers, body FROM interactions "
+                    "WHERE key = ? ORDER BY seq DESC LIMIT 1",
+                    (key,),
+                ).fetchone()
+            else:
+                seq = self._served.get(key, 0)
+                row = self._conn.execute(
+                    "SELECT status, headers, body FROM interactions "
+                    "WHERE key = ? AND seq <= ? ORDER BY seq DESC LIMIT 1",
+                    (key, seq),
+                ).fetchone()
+                if row is not None:
+                    self._served[key] = seq + 1
+
+            if row is None:
+                return None
+
+            self.stats["hits"] += 1
+
+        status, headers, body = row
+        return status, json.loads(headers), zlib.decompress(body)
+
+    def record(
+        self,
+        key: str,
+        method: str,
+        url: str,
+        status: int,
+        headers: Dict[str, str],
+        body: bytes,
+    ) -> None:
+        ## Transient failures are retried live, not replayed.
+        if status == 429 or status >= 500:
+            return
+
+        headers = {
+            k.lower(): v for k, v in headers.items()
+            if k.lower() not in DROPPED_RESPONSE_HEADERS
+        }
+
+        with self._lock:
+            ## The first recording of a key in this process replaces older
+            ## ones, so re-recording does not mix runs.
+            if key not in self._recorded:
+                self._conn.execute("DELETE FROM interactions WHERE key = ?", (key,))
+                self._recorded[key] = 0
+
+            self._conn.execute(
+                "INSERT INTO interactions (key, seq, method, url, status, headers, body) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (
+                    key, self._recorded[key], method.upper(), url.split("?")[0],
+                    status, json.dumps(headers), zlib.compress(body, 6),
+                ),
+            )
+            self._recorded[key] += 1
+            self.stats["recorded"] += 1
+
+    def miss(self, method: str, url: str) -> Interaction:
+        """
+        Response served for an unrecorded request in strict replay.
+        """
+        description = f"{method.upper()} {url.split('?')[0]}"
+        with self._lock:
+            self.stats["misses"] += 1
+            self.missed.append(description)
+
+        print(f"[Cassette] Miss: {description}")
+
+        ## 404 rather than an exception: neither the SDK nor CallPolicy
+        ## retries it, so the miss surfaces immediately.
+        body = json.dumps({"error": {"message": f"cassette miss (strict replay): {description}"}})
+        return 404, {"content-type": "application/json", "x-cassette-miss": "1"}, body.encode()
+
+    # ---------- ADAPTERS ----------
+
+    def transport(self, inner: httpx.BaseTransport) -> "CassetteTransport":
+        return CassetteTransport(self, inner)
+
+    def adapter(self, **kwargs: Any) -> "CassetteAdapter":
+        return CassetteAdapter(self, **kwargs)
+
+    def reset(self) -> None:
+        """
+        Start a new run: replay sequences restart and stats are cleared.
+        """
+        with self._lock:
+            self._served.clear()
+            self.stats = {"hits": 0, "misses": 0, "recorded": 0}
+            self.missed = []
+
+    def summary(self) -> str:
+        return (
+            f"mode={self.mode} hits={self.stats['hits']} "
+            f"misses={self.stats['misses']} recorded={self.stats['recorded']}"
+        )
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+class CassetteTransport(httpx.BaseTransport):
+    """
+    httpx transport for the Portkey client: serves recorded responses,
+    or forwards to `inner` and records the result.
+    """
+
+    def __init__(self, cassette: Cassette, inner: httpx.BaseTransport):
+        self.cassette = cassette
+        self.inner = inner
+
+    def handle_request(self, request: httpx.Request) -> httpx.Response:
+        method, url = request.method, str(request.url)
+        key = self.cassette.key(
+            method, url, request.read(), request.headers.get("content-type", ""),
+            request.headers,
+        )
+
+        hit = None if self.cassette.mode == RECORD else self.cassette.lookup(key, method)
+        if hit is None and not self.cassette.live:
+            hit = self.cassette.miss(method, url)
+
+        if hit is not None:
+            status, headers, body = hit
+            return httpx.Response(status, headers=headers, content=body, request=request)
+
+        response = self.inner.handle_request(request)
+        headers = {
+            k: v for k, v in response.headers.items()
+            if k.lower() not in DROPPED_RESPONSE_HEADERS
+        }
+
+        ## Event streams pass through chunk by chunk so recorded runs keep
+        ## live TTFT; they are stored once fully read. Replays get the same
+        ## bytes, not the timing.
+        if response.headers.get("content-type", "").startswith("text/event-stream"):
+            return httpx.Response(
+                response.status_code, headers=headers, request=request,
+                stream=_RecordingStream(self.cassette, key, method, url, response),
+            )
+
+        try:
+            body = response.read()
+        finally:
+            response.close()
+
+        self.cassette.record(key, method, url, response.status_code, dict(response.headers), body)
+
+        return httpx.Response(
+            response.status_code, headers=headers, content=body, request=request,
+        )
+
+    def close(self) -> None:
+        self.inner.close()
+
+
+class _RecordingStream(httpx.SyncByteStream):
+    """
+    Yields a live response's decoded chunks and records the whole body
+    once the stream has been read to the end. A stream closed early is
+    not recorded.
+    """
+
+    def __init__(
+        self,
+        cassette: Cassette,
+        key: str,
+        method: str,
+        url: str,
+        response: httpx.Response,
+    ):
+        self.cassette = cassette
+        self.key = key
+        self.method = method
+        self.url = url
+        self.response = response
+
+    def __iter__(self) -> Iterator[bytes]:
+        chunks = []
+        for chunk in self.response.iter_bytes():
+            chunks.append(chunk)
+            yield chunk
+
+        self.cassette.record(
+            self.key, self.method, self.url, self.response.status_code,
+            dict(self.response.headers), b"".join(chunks),
+        )
+
+    def close(self) -> None:
+        self.response.close()
+
+
+class CassetteAdapter(HTTPAdapter):
+    """
+    requests adapter for the download session (signed export URLs).
+    """
+
+    def __init__(self, cassette: Cassette, **kwargs: Any):
+        super().__init__(**kwargs)
+        self.cassette = cassette
+
+    def send(self, request: requests.PreparedRequest, **kwargs: Any) -> requests.Response:
+        body = request.body or b""
+        if isinstance(body, str):
+            body = body.encode()
+
+        method, url = request.method or "GET", request.url or ""
+        key = self.cassette.key(
+            method, url, body, request.headers.get("Content-Type", ""), request.headers,
+        )
+
+        hit = None if self.cassette.mode == RECORD else self.cassette.lookup(key, method)
+        if hit is None and not self.cassette.live:
+            hit = self.cassette.miss(method, url)
+
+        if hit is not None:
+            return self._build_response(request, *hit)
+
+        response = super().send(request, **kwargs)
+        self.cassette.record(
+            key, method, url, response.status_code, dict(response.headers), response.content,
+        )
+        return response
+
+    @staticmethod
+    def _build_response(
+        request: requests.PreparedRequest,
+        status: int,
+        headers: Dict[str, str],
+        body: bytes,
+    ) -> requests.Response:
+        response = requests.Response()
+        response.status_code = status
+        response.headers = CaseInsensitiveDict(headers)
+        response.encoding = get_encoding_from_headers(response.headers)
+        response.url = request.url
+        response.request = request
+        response.reason = "OK" if status < 400 else "Cassette"
+        response._content = body
+        response._content_consumed = True
+        return response
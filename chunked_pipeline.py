@@ -0,0 +1,166 @@
+import queue
+import threading
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+from telemetry import Telemetry
+
+## Marks the end of a stage's input; one is sent per downstream worker.
+_DONE = object()
+
+Stage = Tuple[str, Callable[[Any], Any], int]
+
+
+class ChunkedPipeline:
+    """
+    Runs chunks through a chain of stages connected by bounded queues.
+
+    Each stage gets its own worker thread(s). A full queue blocks the
+    stage feeding it, so at most `queue_size` chunks wait between any two
+    stages and peak memory is set by chunk size, queue size and workers,
+    not by how many chunks the source yields.
+    """
+
+    def __init__(
+        self,
+        chunk_size: int = 500,
+        queue_size: int = 2,
+        workers: Optional[Dict[str, int]] = None,
+        telemetry: Optional[Telemetry] = None,
+    ):
+        self.chunk_size = chunk_size
+        self.queue_size = queue_size
+        self.workers = workers or {}
+        self.telemetry = telemetry or Telemetry()
+
+    @classmethod
+    def from_config(
+        cls,
+        config: Dict[str, Any],
+        telemetry: Optional[Telemetry] = None,
+    ) -> "ChunkedPipeline":
+        cfg = config.get("pipeline") or {}
+        return cls(
+            chunk_size=int(cfg.get("chunk_size", 500)),
+            queue_size=int(cfg.get("queue_size", 2)),
+            workers=cfg.get("workers"),
+            telemetry=telemetry,
+        )
+
+    def stage(self, name: str, fn: Callable[[Any], Any]) -> Stage:
+        """
+        Build a stage using the configured worker count for `name`.
+        """
+        return name, fn, max(1, int(self.workers.get(name, 1)))
+
+    # ---------- RUN ----------
+
+    def run(self, source: Iterable[Any], stages: List[Stage]) -> int:
+        """
+        Feed every item of `source` through `stages` in order.
+
+        A stage returning None drops the item. The first exception raised
+        by any stage stops the pipeline and is re-raised here.
+        Returns the number of items that left the last stage.
+        """
+        queues = [queue.Queue(maxsize=self.queue_size) for _ in stages]
+        stop = threading.Event()
+        errors: List[BaseException] = []
+        completed = [0]
+        lock = threading.Lock()
+
+        def put(q: queue.Queue, item: Any) -> bool:
+            ## Poll so a blocked producer notices a failure downstream.
+            while not stop.is_set():
+                try:
+                    q.put(item, timeout=0.1)
+                    return True
+                except queue.Full:
+                    continue
+            return False
+
+        def fail(e: BaseException) -> None:
+            with lock:
+                errors.append(e)
+            stop.set()
+
+        def feed() -> None:
+            try:
+                for item in source:
+                    if not put(queues[0], item):
+                        return
+                    self.telemetry.inc("pipeline_chunks_total", stage="read")
+            except BaseException as e:
+                fail(e)
+            finally:
+                for _ in range(stages[0][2]):
+                    put(queues[0], _DONE)
+
+        def work(i: int, name: str, fn: Callable[[Any], Any]) -> None:
+            inbox = queues[i]
+            outbox = queues[i + 1] if i + 1 < len(queues) else None
+
+            while True:
+                try:
+                    item = inbox.get(timeout=0.1)
+                except queue.Empty:
+                    if stop.is_set():
+                        return
+                    continue
+
+                if item is _DONE:
+                    return
+                if stop.is_set():
+                    continue
+
+                try:
+                    with self.telemetry.span(f"pipeline.{name}"):
+                        result = fn(item)
+                except BaseException as e:
+                    fail(e)
+                    continue
+
+                self.telemetry.inc("pipeline_chunks_total", stage=name)
+
+                if result is None:
+                    continue
+                if outbox is None:
+                    with lock:
+                        completed[0] += 1
+                elif not put(outbox, result):
+                    continue
+
+        threads: List[threading.Thread] = [
+            threading.Thread(target=feed, name="pipeline-read", daemon=True)
+        ]
+        groups: List[List[threading.Thread]] = []
+
+        for i, (name, fn, workers) in enumerate(stages):
+            group = [
+                threading.Thread(
+                    target=work,
+                    args=(i, name, fn),
+                    name=f"pipeline-{name}-{n}",
+                    daemon=True,
+                )
+                for n in range(workers)
+            ]
+            groups.append(group)
+            threads.extend(group)
+
+        for t in threads:
+            t.start()
+
+        threads[0].join()
+
+        ## Once every worker of a stage is done, tell the next stage.
+        for i, group in enumerate(groups):
+            for t in group:
+                t.join()
+            if i + 1 < len(stages):
+                for _ in range(stages[i + 1][2]):
+                    put(queues[i + 1], _DONE)
+
+        if errors:
+            raise errors[0]
+
+        return completed[0]
@@ -0,0 +1,197 @@
+import threading
+import time
+from collections import deque
+from typing import Any, Deque, Dict, List, Optional, Tuple
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class CircuitBreaker:
+    """
+    Error-rate / latency circuit breaker for a single provider or model.
+
+    closed    -> calls flow; outcomes are tracked over a sliding window.
+    open      -> calls are rejected until `cooldown_seconds` have passed.
+    half_open -> up to `half_open_probes` calls are let through; a success
+                 closes the breaker, a failure re-opens it.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        window: int = 20,
+        min_calls: int = 5,
+        error_rate: float = 0.5,
+        latency_threshold_seconds: Optional[float] = None,
+        cooldown_seconds: float = 60.0,
+        half_open_probes: int = 1,
+    ):
+        self.name = name
+        self.min_calls = min_calls
+        self.error_rate = error_rate
+        self.latency_threshold_seconds = latency_threshold_seconds
+        self.cooldown_seconds = cooldown_seconds
+        self.half_open_probes = half_open_probes
+
+        self.state = CLOSED
+        self.opened_at: Optional[float] = None
+        self.last_reason: str = ""
+
+        self._outcomes: Deque[bool] = deque(maxlen=window)
+        self._probes_in_flight = 0
+        self._probe_started_at = 0.0
+        self._lock = threading.Lock()
+
+    # ---------- STATE ----------
+
+    def allow(self) -> bool:
+        """
+        Return True if a call may be attempted now.
+        """
+        with self._lock:
+            if self.state == OPEN:
+                if time.monotonic() - self.opened_at < self.cooldown_seconds:
+                    return False
+
+                self.state = HALF_OPEN
+                self._probes_in_flight = 0
+                print(f"[CircuitBreaker] {self.name} half-open, probing")
+
+            if self.state == HALF_OPEN:
+                now = time.monotonic()
+                if self._probes_in_flight >= self.half_open_probes:
+                    ## A probe that never reported back must not wedge us.
+                    if now - self._probe_started_at < self.cooldown_seconds:
+                        return False
+                    self._probes_in_flight = 0
+
+                self._probes_in_flight += 1
+                self._probe_started_at = now
+
+            return True
+
+    def release(self) -> None:
+        """
+        Give back a probe slot taken by allow() for a call that was not
+        made after all.
+        """
+        with self._lock:
+            if self.state == HALF_OPEN and self._probes_in_flight:
+                self._probes_in_flight -= 1
+
+    def record_success(self, latency_seconds: float) -> None:
+        if (
+            self.latency_threshold_seconds is not None
+            and latency_seconds > self.latency_threshold_seconds
+        ):
+            self.record_failure(
+                f"latency {latency_seconds:.1f}s > "
+                f"{self.latency_threshold_seconds}s"
+            )
+            return
+
+        with self._lock:
+            if self.state == HALF_OPEN:
+                print(f"[CircuitBreaker] {self.name} closed after probe")
+                self.state = CLOSED
+                self._outcomes.clear()
+
+            self._outcomes.append(True)
+
+    def record_failure(self, reason: str) -> None:
+        with self._lock:
+            self.last_reason = reason
+
+            if self.state == HALF_OPEN:
+                self._trip(f"probe failed: {reason}")
+                return
+
+            self._outcomes.append(False)
+
+            calls = len(self._outcomes)
+            failures = calls - sum(self._outcomes)
+
+            if calls >= self.min_calls and failures / calls >= self.error_rate:
+                self._trip(
+                    f"error rate {failures}/{calls} >= {self.error_rate:.0%} "
+                    f"(last: {reason})"
+                )
+
+    def _trip(self, reason: str) -> None:
+        self.state = OPEN
+        self.opened_at = time.monotonic()
+        self.last_reason = reason
+        print(f"[CircuitBreaker] {self.name} OPEN: {reason}")
+
+
+class CircuitBreakerRegistry:
+    """
+    Breakers keyed by provider (e.g. "@bedrock") and by full model name.
+    A call is allowed only when both its provider and model breakers allow it.
+
+    Reads the optional `circuit_breaker` section of config.yaml.
+    """
+
+    def __init__(self, breaker_cfg: Optional[Dict[str, Any]] = None):
+        self.breaker_cfg = breaker_cfg or {}
+        self._breakers: Dict[str, CircuitBreaker] = {}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_config(cls, config: Dict[str, Any]) -> "CircuitBreakerRegistry":
+        return cls(config.get("circuit_breaker", {}))
+
+    @staticmethod
+    def provider_of(model: str) -> str:
+        return model.split("/", 1)[0] if "/" in model else model
+
+    def _get(self, name: str) -> CircuitBreaker:
+        with self._lock:
+            if name not in self._breakers:
+                self._breakers[name] = CircuitBreaker(name=name, **self.breaker_cfg)
+            return self._breakers[name]
+
+    def breakers_for(self, model: str) -> List[CircuitBreaker]:
+        """
+        Provider then model breaker; one breaker when the model name has
+        no provider prefix, so each outcome is counted once.
+        """
+        provider = self.provider_of(model)
+        if provider == model:
+            return [self._get(model)]
+        return [self._get(provider), self._get(model)]
+
+    # ---------- API ----------
+
+    def allow(self, model: str) -> Tuple[bool, str]:
+        """
+        Return (allowed, reason). Reason is empty when allowed.
+        """
+        granted: List[CircuitBreaker] = []
+        for breaker in self.breakers_for(model):
+            if not breaker.allow():
+                ## No call follows: hand back probe slots already taken.
+                for earlier in granted:
+                    earlier.release()
+                return False, f"circuit open for {breaker.name}: {breaker.last_reason}"
+            granted.append(breaker)
+        return True, ""
+
+    def record_success(self, model: str, latency_seconds: float) -> None:
+        for breaker in self.breakers_for(model):
+            breaker.record_success(latency_seconds)
+
+    def record_failure(self, model: str, reason: str) -> None:
+        for breaker in self.breakers_for(model):
+            breaker.record_failure(reason)
+
+    def snapshot(self) -> List[Dict[str, Any]]:
+        with self._lock:
+            breakers = list(self._breakers.values())
+
+        return [
+            {"name": b.name, "state": b.state, "reason": b.last_reason}
+            for b in breakers
+        ]
@@ -0,0 +1,396 @@
+import hashlib
+import json
+import math
+import os
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence
+
+from trace_batch import TraceBatch
+from trace_store import TraceStore
+
+try:
+    import tiktoken
+except ImportError:  # optional: fall back to a character-based estimate
+    tiktoken = None
+
+## USD per 1M tokens, used for models missing from budget.prices.
+DEFAULT_PRICE = {"input": 1.0, "output": 3.0}
+
+## Judge instruction sent as the system message by LLMJudge._call_judge.
+JUDGE_SYSTEM_PROMPT = (
+    "You are an AI evaluator. "
+    "Return ONLY valid JSON exactly matching "
+    "the required output format."
+)
+
+
+class TokenCounter:
+    """
+    Local token counts for cost estimates. Uses tiktoken's batched encoder
+    when it is installed, otherwise ~4 characters per token.
+    """
+
+    def __init__(self, encoding: str = "o200k_base"):
+        self._encoder = None
+        if tiktoken is not None:
+            try:
+                self._encoder = tiktoken.get_encoding(encoding)
+            except Exception as e:
+                print(f"[TokenCounter] tiktoken unavailable ({e}), using estimate")
+
+    def count_batch(self, texts: Sequence[str]) -> List[int]:
+        if self._encoder is not None:
+            return [len(t) for t in self._encoder.encode_ordinary_batch(list(texts))]
+        return [math.ceil(len(t) / 4) for t in texts]
+
+    def count(self, text: str) -> int:
+        return self.count_batch([text])[0]
+
+
+class CostPlan:
+    """
+    Planned tokens and spend for one agent's run, plus what the budget
+    allowed: which models to replay and what share of traces to keep.
+    """
+
+    def __init__(self, agent: str, traces: int):
+        self.agent = agent
+        self.traces = traces
+        self.sample_fraction = 1.0
+        self.models: List[str] = []
+        self.dropped_models: List[str] = []
+        ## (model, stage) -> {"tokens": ..., "usd": ...} for one pass over
+        ## all traces. Replay is one pass per model; the judge runs once on
+        ## the baseline and once per replayed model.
+        self.lines: Dict[tuple, Dict[str, float]] = {}
+        self.budget_usd: Optional[float] = None
+
+    def _included(self, key: tuple, models: Sequence[str]) -> int:
+        """
+        Number of passes a (model, stage) line makes with `models` kept.
+        """
+        model, stage = key
+        if stage == "judge":
+            return 1 + len(models)
+        return 1 if model in models else 0
+
+    def cost(self, models: Optional[Sequence[str]] = None, fraction: Optional[float] = None) -> float:
+        """
+        Planned USD for `models` (default: the kept models) at `fraction`.
+        """
+        models = self.models if models is None else models
+        fraction = self.sample_fraction if fraction is None else fraction
+
+        return fraction * sum(
+            line["usd"] * self._included(key, models)
+            for key, line in self.lines.items()
+        )
+
+    def rows(self) -> List[Dict[str, Any]]:
+        """
+        Planned spend per (model, stage) after budget decisions.
+        """
+        out = []
+        for key, line in self.lines.items():
+            passes = self._included(key, self.models)
+            if not passes:
+                continue
+
+            out.append({
+                "agent": self.agent,
+                "model": key[0],
+                "stage": key[1],
+                "planned_tokens": int(line["tokens"] * passes * self.sample_fraction),
+                "planned_usd": line["usd"] * passes * self.sample_fraction,
+            })
+        return out
+
+    def summary(self) -> Dict[str, Any]:
+        return {
+            "agent": self.agent,
+            "traces": self.traces,
+            "sample_fraction": round(self.sample_fraction, 4),
+            "models": self.models,
+            "dropped_models": self.dropped_models,
+            "planned_usd": round(self.cost(), 4),
+            "budget_usd": self.budget_usd,
+        }
+
+
+class CostPlanner:
+    """
+    Pre-flight estimate of replay and judge spend, enforced against
+    per-run and per-agent budgets.
+
+    A sample of exported inputs/outputs is tokenized together with the
+    runner system prompt and the judge template; per-model prices come
+    from budget.prices (USD per 1M tokens).
+    """
+
+    def __init__(
+        self,
+        config: Dict[str, Any],
+        budget_cfg: Optional[Dict[str, Any]] = None,
+        counter: Optional[TokenCounter] = None,
+        price_multiplier: float = 1.0,
+    ):
+        cfg = budget_cfg or {}
+
+        self.config = config
+        self.per_run_usd: Optional[float] = cfg.get("per_run_usd")
+        self.per_agent_usd: Optional[float] = cfg.get("per_agent_usd")
+        self.agent_budgets: Dict[str, float] = cfg.get("agents") or {}
+        self.sample_size = int(cfg.get("sample_size", 200))
+        self.strategy = cfg.get("strategy", "downsample")
+        self.min_sample_fraction = float(cfg.get("min_sample_fraction", 0.1))
+        self.judge_output_tokens = int(cfg.get("judge_output_tokens", 250))
+        self.prices: Dict[str, Dict[str, float]] = cfg.get("prices") or {}
+        ## < 1 when calls go through the (discounted) batch API.
+        self.price_multiplier = price_multiplier
+
+        self.counter = counter or TokenCounter(cfg.get("encoding", "o200k_base"))
+
+        ## Planned USD already committed by earlier agents in this run, and
+        ## agents still to be planned (they share what is left evenly).
+        self.committed_usd = 0.0
+        self.pending: List[str] = []
+
+    @classmethod
+    def from_config(cls, config: Dict[str, Any]) -> "CostPlanner":
+        budget_cfg = config.get("budget") or {}
+        batch_cfg = config.get("batch_api") or {}
+
+        multiplier = 1.0
+        if batch_cfg.get("enabled", False):
+            multiplier = float(batch_cfg.get("price_multiplier", 0.5))
+
+        return cls(config, budget_cfg, price_multiplier=multiplier)
+
+    def reset(self, agents: Sequence[str] = ()) -> None:
+        self.committed_usd = 0.0
+        self.pending = list(agents)
+
+    def price(self, model: str) -> Dict[str, float]:
+        return self.prices.get(model) or self.prices.get("default") or DEFAULT_PRICE
+
+    def usd(self, model: str, input_tokens: float, output_tokens: float) -> float:
+        price = self.price(model)
+        return (
+            (input_tokens * price["input"] + output_tokens * price["output"])
+            * self.price_multiplier / 1e6
+        )
+
+    # ---------- ESTIMATE ----------
+
+    @staticmethod
+    def _count(log_file_path: str) -> int:
+        store = TraceStore.for_log_file(log_file_path)
+        if store is not None:
+            return store.count()
+
+        with open(log_file_path, "rb") as f:
+            return sum(1 for line in f if line.strip())
+
+    def _sample(self, log_file_path: str) -> tuple:
+        """
+        Return (trace count, sampled inputs, sampled outputs). Streams the
+        export chunk by chunk so large windows are never indexed at once.
+        """
+        inputs: List[str] = []
+        outputs: List[str] = []
+
+        n = self._count(log_file_path)
+        step = max(1, n // self.sample_size) if n else 1
+
+        for chunk in TraceBatch.iter_chunks(log_file_path, 5000):
+            with chunk:
+                first = -chunk.start % step
+                for i in range(first, len(chunk), step):
+                    input_data, output_data = chunk[i].bodies()
+                    ## Replay sends json.dumps(input) as the user message.
+                    inputs.append(json.dumps(input_data) if input_data is not None else "")
+                    outputs.append(output_data or "")
+
+            if len(inputs) >= self.sample_size:
+                break
+
+        return n, inputs[:self.sample_size], outputs[:self.sample_size]
+
+    @staticmethod
+    def _read_text(path: str) -> str:
+        if path and os.path.exists(path):
+            return Path(path).read_text(encoding="utf-8")
+        return path or ""
+
+    def estimate(self, agent: str, log_file_path: str, models: Sequence[str]) -> CostPlan:
+        """
+        Estimate tokens and spend for replaying `log_file_path` on `models`
+        and judging the baseline plus every replayed model.
+        """
+        agent_cfg = self.config["agents"][agent]
+        judge_cfg = agent_cfg["judge"]
+
+        n, inputs, outputs = self._sample(log_file_path)
+        plan = CostPlan(agent, n)
+        plan.models = list(models)
+
+        if not inputs:
+            return plan
+
+        system_tokens, template_tokens, judge_system_tokens = self.counter.count_batch([
+            self._read_text(agent_cfg.get("system_prompt_for_runners", "")),
+            self._read_text(judge_cfg.get("prompt_file", "")),
+            JUDGE_SYSTEM_PROMPT,
+        ])
+
+        input_tokens = self.counter.count_batch(inputs)
+        output_tokens = self.counter.count_batch(outputs)
+
+        avg_in = sum(input_tokens) / len(input_tokens)
+        ## Replayed outputs are assumed to be as long as production ones.
+        avg_out = sum(output_tokens) / len(output_tokens)
+
+        replay_in = system_tokens + avg_in
+        for model in models:
+            plan.lines[(model, "replay")] = {
+                "tokens": n * (replay_in + avg_out),
+                "usd": n * self.usd(model, replay_in, avg_out),
+            }
+
+        judge_model = judge_cfg["model"]
+        judge_in = judge_system_tokens + template_tokens + avg_in + avg_out
+        plan.lines[(judge_model, "judge")] = {
+            "tokens": n * (judge_in + self.judge_output_tokens),
+            "usd": n * self.usd(judge_model, judge_in, self.judge_output_tokens),
+        }
+
+        return plan
+
+    # ---------- BUDGET ----------
+
+    def _agent_budget(self, agent: str) -> Optional[float]:
+        budgets = [self.agent_budgets.get(agent, self.per_agent_usd)]
+
+        if self.per_run_usd is not None:
+            remaining = max(0.0, self.per_run_usd - self.committed_usd)
+            sharing = 1 + sum(1 for a in self.pending if a != agent)
+            budgets.append(remaining / sharing)
+
+        budgets = [b for b in budgets if b is not None]
+        return min(budgets) if budgets else None
+
+    def plan(self, agent: str, log_file_path: str, models: Sequence[str]) -> CostPlan:
+        """
+        Estimate, then fit the plan into the remaining budget by
+        downsampling traces and/or dropping the most expensive models.
+        """
+        plan = self.estimate(agent, log_file_path, models)
+        budget = plan.budget_usd = self._agent_budget(agent)
+
+        if budget is not None and plan.cost() > budget:
+            self._fit(plan, budget)
+
+        self.committed_usd += plan.cost()
+        if agent in self.pending:
+            self.pending.remove(agent)
+
+        print(
+            f"[CostPlanner] agent={agent} traces={plan.traces} "
+            f"planned=${plan.cost():.4f} budget="
+            f"{'none' if budget is None else f'${budget:.4f}'} "
+            f"sample={plan.sample_fraction:.2f} models={len(plan.models)} "
+            f"dropped={plan.dropped_models}"
+        )
+
+        return plan
+
+    def _fit(self, plan: CostPlan, budget: float) -> None:
+        def replay_cost(model: str) -> float:
+            return plan.lines[(model, "replay")]["usd"]
+
+        ## Drop the most expensive model until the rest fits, at full
+        ## volume (drop_models) or at no less than min_sample_fraction.
+        while True:
+            full = plan.cost(fraction=1.0)
+
+            if self.strategy == "downsample":
+                fraction = min(1.0, budget / full) if full else 1.0
+                if fraction >= self.min_sample_fraction:
+                    plan.sample_fraction = fraction
+                    return
+            elif full <= budget:
+                plan.sample_fraction = 1.0
+                return
+
+            if not plan.models:
+                break
+
+            model = max(plan.models, key=replay_cost)
+            plan.models.remove(model)
+            plan.dropped_models.append(model)
+
+        ## Not even the baseline judge fits: skip the agent entirely.
+        plan.sample_fraction = 0.0
+
+    # ---------- APPLY ----------
+
+    @staticmethod
+    def downsample_export(log_file_path: str, fraction: float) -> int:
+        """
+        Keep a stable `fraction` of traces (hash of trace_id) in the
+        export, in place; the full export is kept as `<name>.full.jsonl`.
+        Re-ingests the TraceStore sidecar if there is one.
+        Returns the number of traces kept.
+        """
+        path = Path(log_file_path)
+        full_path = path.with_suffix(".full.jsonl")
+        os.replace(path, full_path)
+
+        threshold = fraction * 2 ** 64
+        kept = 0
+
+        with open(full_path, "rb") as src, open(path, "wb") as dst:
+            for line in src:
+                try:
+                    trace_id = json.loads(line).get("trace_id") or ""
+                except json.JSONDecodeError:
+                    continue
+                digest = hashlib.blake2b(trace_id.encode("utf-8"), digest_size=8).digest()
+                if int.from_bytes(digest, "big") < threshold:
+                    dst.write(line)
+                    kept += 1
+
+        if TraceStore.for_log_file(log_file_path) is not None:
+            TraceStore.ingest(log_file_path)
+
+        print(
+            f"[CostPlanner] Downsampled {log_file_path} to {kept} traces "
+            f"({fraction:.0%})"
+        )
+
+        return kept
+
+    def actual_rows(
+        self,
+        agent: str,
+        tokens: Dict[tuple, float],
+    ) -> List[Dict[str, Any]]:
+        """
+        Actual spend per (model, stage) from token counts keyed by
+        (stage, model, kind) with kind "prompt" or "completion".
+        """
+        usage: Dict[tuple, Dict[str, float]] = {}
+        for (stage, model, kind), value in tokens.items():
+            entry = usage.setdefault((model, stage), {"prompt": 0, "completion": 0})
+            entry[kind] = entry.get(kind, 0) + value
+
+        return [
+            {
+                "agent": agent,
+                "model": model,
+                "stage": stage,
+                "actual_tokens": int(entry["prompt"] + entry["completion"]),
+                "actual_usd": self.usd(model, entry["prompt"], entry["completion"]),
+            }
+            for (model, stage), entry in usage.items()
+        ]
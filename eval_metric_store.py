@@ -1,6 +1,8 @@
 import sqlite3
+import time
+from contextlib import closing, contextmanager
 from pathlib import Path
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, Iterable, Iterator
 
 
 class EvalMetricStore:
@@ -8,12 +10,21 @@ class EvalMetricStore:
         self.db_path = Path(db_path)
         self._init_db()
 
+    @contextmanager
+    def _connect(self) -> Iterator[sqlite3.Connection]:
+        """
+        Commit on success, roll back on error and always close; sqlite3's
+        own context manager only does the first two.
+        """
+        with closing(sqlite3.connect(self.db_path)) as conn, conn:
+            yield conn
+
     # ---------- INIT ----------
 
     def _init_db(self) -> None:
         self.db_path.parent.mkdir(parents=True, exist_ok=True)
 
-        with sqlite3.connect(self.db_path) as conn:
+        with self._connect() as conn:
             conn.execute("""
                 CREATE TABLE IF NOT EXISTS evaluations (
                     id INTEGER PRIMARY KEY AUTOINCREMENT,
@@ -26,12 +37,22 @@ class EvalMetricStore:
                     cost REAL,
                     quality_score REAL,
 
+                    ttft_ms REAL,
+                    inter_token_ms REAL,
+                    tokens_per_second REAL,
+
+                    verdicts TEXT,
+
+                    run_id TEXT,
+
                     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
 
                     UNIQUE(trace_id, agent, model)
                 )
             """)
 
+            self._add_missing_columns(conn)
+
             conn.execute("""
                 CREATE INDEX IF NOT EXISTS idx_eval_agent
                 ON evaluations(agent)
@@ -47,6 +68,74 @@ class EvalMetricStore:
                 ON evaluations(trace_id)
             """)
 
+            ## The scheduler run that last wrote each row; analysis reads
+            ## only the current run's evaluations.
+            conn.execute("""
+                CREATE INDEX IF NOT EXISTS idx_eval_run
+                ON evaluations(run_id)
+            """)
+
+            ## Planned (pre-flight) vs actual spend, kept across runs.
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS spend (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+
+                    run_id TEXT NOT NULL,
+                    agent TEXT NOT NULL,
+                    model TEXT NOT NULL,
+                    stage TEXT NOT NULL,
+
+                    planned_tokens INTEGER,
+                    planned_usd REAL,
+                    actual_tokens INTEGER,
+                    actual_usd REAL,
+                    sample_fraction REAL,
+
+                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+
+                    UNIQUE(run_id, agent, model, stage)
+                )
+            """)
+
+            ## Run leases: at most one scheduler per name runs at a time.
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS leases (
+                    name TEXT PRIMARY KEY,
+                    owner TEXT NOT NULL,
+                    expires_at REAL NOT NULL,
+                    acquired_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                )
+            """)
+
+            ## Last completed slot per (team, schedule), for catch-up.
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS schedule_state (
+                    team TEXT NOT NULL,
+                    schedule TEXT NOT NULL,
+                    last_slot TEXT NOT NULL,
+                    status TEXT,
+                    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+
+                    PRIMARY KEY(team, schedule)
+                )
+            """)
+
+    ## Columns added after the first release; older databases get them
+    ## through ALTER TABLE on open.
+    ADDED_COLUMNS = {
+        "ttft_ms": "REAL",
+        "inter_token_ms": "REAL",
+        "tokens_per_second": "REAL",
+        "verdicts": "TEXT",
+        "run_id": "TEXT",
+    }
+
+    def _add_missing_columns(self, conn: sqlite3.Connection) -> None:
+        existing = {row[1] for row in conn.execute("PRAGMA table_info(evaluations)")}
+        for column, kind in self.ADDED_COLUMNS.items():
+            if column not in existing:
+                conn.execute(f"ALTER TABLE evaluations ADD COLUMN {column} {kind}")
+
     # ---------- INSERT ----------
 
     def upsert_evaluation(
@@ -57,13 +146,15 @@ class EvalMetricStore:
         response_time_ms: Optional[float] = None,
         cost: Optional[float] = None,
         quality_score: Optional[float] = None,
+        verdicts: Optional[str] = None,
+        run_id: Optional[str] = None,
     ) -> None:
         """
         Insert or update evaluation metrics.
         Idempotent per (trace_id, agent, model).
         """
 
-        with sqlite3.connect(self.db_path) as conn:
+        with self._connect() as conn:
             conn.execute("""
                 INSERT INTO evaluations (
                     trace_id,
@@ -71,14 +162,18 @@ class EvalMetricStore:
                     model,
                     response_time_ms,
                     cost,
-                    quality_score
+                    quality_score,
+                    verdicts,
+                    run_id
                 )
-                VALUES (?, ?, ?, ?, ?, ?)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
                 ON CONFLICT(trace_id, agent, model)
                 DO UPDATE SET
                     response_time_ms = excluded.response_time_ms,
                     cost = excluded.cost,
                     quality_score = excluded.quality_score,
+                    verdicts = excluded.verdicts,
+                    run_id = excluded.run_id,
                     created_at = CURRENT_TIMESTAMP
             """, (
                 trace_id,
@@ -86,11 +181,148 @@ class EvalMetricStore:
                 model,
                 response_time_ms,
                 cost,
-                quality_score
+                quality_score,
+                verdicts,
+                run_id,
             ))
 
+    def upsert_evaluations(
+        self,
+        rows: Iterable[Dict[str, Any]],
+        run_id: Optional[str] = None,
+    ) -> int:
+        """
+        Batch variant of upsert_evaluation: one connection, one transaction.
+        Returns the number of rows written.
+        """
+        params = [
+            (
+                row["trace_id"],
+                row["agent"],
+                row["model"],
+                row.get("response_time_ms"),
+                row.get("cost"),
+                row.get("quality_score"),
+                row.get("verdicts"),
+                run_id,
+            )
+            for row in rows
+        ]
+
+        with self._connect() as conn:
+            conn.executemany("""
+                INSERT INTO evaluations (
+                    trace_id,
+                    agent,
+                    model,
+                    response_time_ms,
+                    cost,
+                    quality_score,
+                    verdicts,
+                    run_id
+                )
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+                ON CONFLICT(trace_id, agent, model)
+                DO UPDATE SET
+                    response_time_ms = excluded.response_time_ms,
+                    cost = excluded.cost,
+                    quality_score = excluded.quality_score,
+                    verdicts = excluded.verdicts,
+                    run_id = excluded.run_id,
+                    created_at = CURRENT_TIMESTAMP
+            """, params)
+
+        return len(params)
+
+    def upsert_stream_metrics(self, rows: Iterable[Dict[str, Any]]) -> int:
+        """
+        Upsert streaming latency metrics (TTFT, inter-token latency,
+        tokens/s) without touching judge-written columns. Replays are
+        recorded before they are judged, so this may create the row; each
+        row's `run_id` (if any) ties it to its run.
+        """
+        params = [
+            (
+                row["trace_id"],
+                row["agent"],
+                row["model"],
+                row.get("ttft_ms"),
+                row.get("inter_token_ms"),
+                row.get("tokens_per_second"),
+                row.get("run_id"),
+            )
+            for row in rows
+        ]
+
+        with self._connect() as conn:
+            conn.executemany("""
+                INSERT INTO evaluations (
+                    trace_id,
+                    agent,
+                    model,
+                    ttft_ms,
+                    inter_token_ms,
+                    tokens_per_second,
+                    run_id
+                )
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+                ON CONFLICT(trace_id, agent, model)
+                DO UPDATE SET
+                    ttft_ms = excluded.ttft_ms,
+                    inter_token_ms = excluded.inter_token_ms,
+                    tokens_per_second = excluded.tokens_per_second,
+                    run_id = COALESCE(excluded.run_id, evaluations.run_id)
+            """, params)
+
+        return len(params)
+
+    def record_spend(self, run_id: str, rows: Iterable[Dict[str, Any]]) -> int:
+        """
+        Upsert planned and/or actual spend per (run, agent, model, stage).
+        Fields missing from a row keep their stored value.
+        """
+        params = [
+            (
+                run_id,
+                row["agent"],
+                row["model"],
+                row["stage"],
+                row.get("planned_tokens"),
+                row.get("planned_usd"),
+                row.get("actual_tokens"),
+                row.get("actual_usd"),
+                row.get("sample_fraction"),
+            )
+            for row in rows
+        ]
+
+        with self._connect() as conn:
+            conn.executemany("""
+                INSERT INTO spend (
+                    run_id,
+                    agent,
+                    model,
+                    stage,
+                    planned_tokens,
+                    planned_usd,
+                    actual_tokens,
+                    actual_usd,
+                    sample_fraction
+                )
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+                ON CONFLICT(run_id, agent, model, stage)
+                DO UPDATE SET
+                    planned_tokens = COALESCE(excluded.planned_tokens, planned_tokens),
+                    planned_usd = COALESCE(excluded.planned_usd, planned_usd),
+                    actual_tokens = COALESCE(excluded.actual_tokens, actual_tokens),
+                    actual_usd = COALESCE(excluded.actual_usd, actual_usd),
+                    sample_fraction = COALESCE(excluded.sample_fraction, sample_fraction)
+            """, params)
+
+        return len(params)
+
     def _fetch(self, query: str, params=()):
-        with sqlite3.connect(self.db_path) as conn:
+        with self._connect() as conn:
             conn.row_factory = sqlite3.Row
             cursor = conn.execute(query, params)
             return [dict(row) for row in cursor.fetchall()]
@@ -102,21 +334,197 @@ class EvalMetricStore:
         Drop the evaluations table if it exists.
         Use with caution. This is destructive.
         """
-        with sqlite3.connect(self.db_path) as conn:
+        with self._connect() as conn:
             conn.execute("DELETE FROM evaluations")
 
 
+    # ---------- LEASES ----------
+
+    def acquire_lease(self, name: str, owner: str, ttl_seconds: float) -> bool:
+        """
+        Take (or extend) the lease `name` unless another owner holds an
+        unexpired one. A single conditional upsert, so it is atomic.
+        """
+        now = time.time()
+
+        with self._connect() as conn:
+            cursor = conn.execute("""
+                INSERT INTO leases (name, owner, expires_at)
+                VALUES (?, ?, ?)
+                ON CONFLICT(name)
+                DO UPDATE SET
+                    owner = excluded.owner,
+                    expires_at = excluded.expires_at,
+                    acquired_at = CASE
+                        WHEN leases.owner = excluded.owner THEN leases.acquired_at
+                        ELSE CURRENT_TIMESTAMP
+                    END
+                WHERE leases.owner = excluded.owner OR leases.expires_at < ?
+            """, (name, owner, now + ttl_seconds, now))
+
+            return cursor.rowcount == 1
+
+    def renew_lease(self, name: str, owner: str, ttl_seconds: float) -> bool:
+        with self._connect() as conn:
+            cursor = conn.execute("""
+                UPDATE leases SET expires_at = ?
+                WHERE name = ? AND owner = ?
+            """, (time.time() + ttl_seconds, name, owner))
+
+            return cursor.rowcount == 1
+
+    def release_lease(self, name: str, owner: str) -> None:
+        with self._connect() as conn:
+            conn.execute(
+                "DELETE FROM leases WHERE name = ? AND owner = ?", (name, owner)
+            )
+
+    def lease_holder(self, name: str) -> Optional[Dict[str, Any]]:
+        rows = self._fetch(
+            "SELECT owner, expires_at, acquired_at FROM leases WHERE name = ?", (name,)
+        )
+        return rows[0] if rows else None
+
+    # ---------- SCHEDULES ----------
+
+    def schedule_slot(self, team: str, schedule: str) -> Optional[str]:
+        rows = self._fetch("""
+            SELECT last_slot FROM schedule_state
+            WHERE team = ? AND schedule = ?
+        """, (team, schedule))
+        return rows[0]["last_slot"] if rows else None
+
+    def record_schedule_slot(
+        self, team: str, schedule: str, slot: str, status: str
+    ) -> None:
+        with self._connect() as conn:
+            conn.execute("""
+                INSERT INTO schedule_state (team, schedule, last_slot, status)
+                VALUES (?, ?, ?, ?)
+                ON CONFLICT(team, schedule)
+                DO UPDATE SET
+                    last_slot = excluded.last_slot,
+                    status = excluded.status,
+                    updated_at = CURRENT_TIMESTAMP
+            """, (team, schedule, slot, status))
+
     # ---------- AGGREGATES ----------
 
-    def aggregate_model_metrics(self):
+    def aggregate_model_metrics(self, run_id: Optional[str] = None):
+        """
+        Per-model averages, over one run's rows when `run_id` is given.
+        Traces counts judged rows; replayed-but-unjudged rows only feed
+        the streaming averages.
+        """
         return self._fetch("""
             SELECT
                 model,
-                COUNT(*) AS traces,
+                COUNT(quality_score) AS traces,
                 AVG(quality_score) AS avg_quality,
                 AVG(cost) AS avg_cost,
-                AVG(response_time_ms) AS avg_latency
+                AVG(response_time_ms) AS avg_latency,
+                AVG(ttft_ms) AS avg_ttft,
+                AVG(inter_token_ms) AS avg_inter_token,
+                AVG(tokens_per_second) AS avg_tokens_per_second
             FROM evaluations
+            WHERE (? IS NULL OR run_id = ?)
             GROUP BY model
-        """)
+        """, (run_id, run_id))
+
+    def evaluation_rows(
+        self,
+        agents: Optional[Iterable[str]] = None,
+        run_id: Optional[str] = None,
+    ):
+        """
+        Raw (agent, model, trace_id, quality, cost, latency) tuples of
+        judged rows for columnar analysis, optionally limited to some
+        agents and to the rows written by one run.
+        """
+        query = """
+            SELECT agent, model, trace_id, quality_score, cost, response_time_ms
+            FROM evaluations
+        """
+        where = ["quality_score IS NOT NULL"]
+        params: tuple = ()
+
+        if agents is not None:
+            agents = tuple(agents)
+            where.append(f"agent IN ({','.join('?' * len(agents))})")
+            params += agents
+
+        if run_id is not None:
+            where.append("run_id = ?")
+            params += (run_id,)
+
+        query += " WHERE " + " AND ".join(where)
 
+        with self._connect() as conn:
+            return conn.execute(query, params).fetchall()
+
+    def section_fingerprints(self, run_id: Optional[str] = None):
+        """
+        Cheap per (agent, model) summary used by the reporter to decide
+        which report sections changed since the last render.
+        """
+        return self._fetch("""
+            SELECT
+                agent,
+                model,
+                COUNT(*) AS traces,
+                TOTAL(quality_score) AS quality,
+                TOTAL(cost) AS cost,
+                TOTAL(response_time_ms) AS latency,
+                TOTAL(ttft_ms) AS ttft,
+                MAX(created_at) AS updated_at
+            FROM evaluations
+            WHERE (? IS NULL OR run_id = ?)
+            GROUP BY agent, model
+            ORDER BY agent, model
+        """, (run_id, run_id))
+
+    def agent_metric_rows(self, agent: str, run_id: Optional[str] = None):
+        """
+        (model, quality, cost, latency) per judged evaluation of one agent.
+        """
+        with self._connect() as conn:
+            return conn.execute("""
+                SELECT model, quality_score, cost, response_time_ms
+                FROM evaluations
+                WHERE agent = ? AND (? IS NULL OR run_id = ?)
+                AND quality_score IS NOT NULL
+            """, (agent, run_id, run_id)).fetchall()
+
+    def trace_evaluations(
+        self,
+        agent: str,
+        trace_ids: Iterable[str],
+        run_id: Optional[str] = None,
+    ):
+        """
+        Every model's evaluation of the given traces of one agent.
+        """
+        trace_ids = list(trace_ids)
+        if not trace_ids:
+            return []
+
+        return self._fetch(f"""
+            SELECT trace_id, model, quality_score, cost, response_time_ms, verdicts
+            FROM evaluations
+            WHERE agent = ? AND (? IS NULL OR run_id = ?)
+            AND trace_id IN ({','.join('?' * len(trace_ids))})
+            ORDER BY trace_id, model
+        """, (agent, run_id, run_id, *trace_ids))
+
+    def spend_by_agent(self, run_id: str):
+        return self._fetch("""
+            SELECT
+                agent,
+                SUM(planned_usd) AS planned_usd,
+                SUM(actual_usd) AS actual_usd,
+                SUM(planned_tokens) AS planned_tokens,
+                SUM(actual_tokens) AS actual_tokens
+            FROM spend
+            WHERE run_id = ?
+            GROUP BY agent
+        """, (run_id,))
@@ -1,87 +1,648 @@
-from typing import List, Dict
+import hashlib
+import html
+import json
 import os
+import re
+import shutil
+from typing import Any, Dict, IO, Iterable, List, Optional
+
+import numpy as np
+
+from eval_metric_store import EvalMetricStore
+from trace_batch import TraceBatch
+
+BASELINE = "baseline"
+
+STYLE = """
+    body { font-family: Arial, sans-serif; padding: 24px; }
+    h1 { margin-bottom: 16px; }
+    nav a { margin-right: 12px; }
+    table { border-collapse: collapse; width: 100%; margin-bottom: 16px; }
+    th, td { border: 1px solid #ddd; padding: 10px; text-align: left; vertical-align: top; }
+    th { background-color: #f4f4f4; }
+    tr:nth-child(even) { background-color: #fafafa; }
+    .charts { display: flex; flex-wrap: wrap; gap: 16px; }
+    .chart { font-size: 12px; }
+    .chart rect { fill: #4a7bd0; }
+    .body { max-width: 480px; max-height: 160px; overflow: auto; white-space: pre-wrap; }
+    .pager button { margin-right: 8px; }
+"""
+
+## Lazily loads per-trace pages (report/data/<agent>/page-N.js) with a
+## script tag, so the report also works when opened from disk.
+SCRIPT = """
+(function () {
+  var state = {};
+
+  function cell(tr, text, rowspan, cls) {
+    var td = document.createElement("td");
+    if (rowspan) td.rowSpan = rowspan;
+    if (cls) { var div = document.createElement("div"); div.className = cls; div.textContent = text; td.appendChild(div); }
+    else td.textContent = text;
+    tr.appendChild(td);
+    return td;
+  }
+
+  function fmt(value, digits) {
+    return value === null || value === undefined ? "-" : Number(value).toFixed(digits);
+  }
+
+  function verdicts(v) {
+    if (!v) return "-";
+    return Object.keys(v).map(function (k) {
+      var item = v[k] || {};
+      return k + ": " + (item.score === undefined ? "-" : item.score) +
+        (item.reasoning ? " (" + item.reasoning + ")" : "");
+    }).join("\\n");
+  }
+
+  window.reportPage = function (data) {
+    var s = state[data.agent];
+    if (!s || s.page !== data.page) return;
+    var body = s.table.tBodies[0];
+    body.textContent = "";
+    data.rows.forEach(function (row) {
+      var models = Object.keys(row.models);
+      models.forEach(function (model, i) {
+        var tr = document.createElement("tr");
+        var m = row.models[model];
+        if (i === 0) {
+          cell(tr, row.trace_id, models.length);
+          cell(tr, row.input || "-", models.length, "body");
+        }
+        cell(tr, model);
+        cell(tr, m.output || "-", 0, "body");
+        cell(tr, fmt(m.quality, 2));
+        cell(tr, fmt(m.cost, 5));
+        cell(tr, fmt(m.latency_ms, 0));
+        cell(tr, verdicts(m.verdicts), 0, "body");
+        body.appendChild(tr);
+      });
+    });
+    s.label.textContent = "Page " + (data.page + 1) + " of " + s.pages;
+  };
+
+  function load(agent, page) {
+    var s = state[agent];
+    if (page < 0 || page >= s.pages) return;
+    s.page = page;
+    var script = document.createElement("script");
+    script.src = s.dir + "/page-" + String(page + 1).padStart(5, "0") + ".js";
+    script.onload = script.onerror = function () { script.remove(); };
+    document.body.appendChild(script);
+  }
+
+  document.querySelectorAll("[data-trace-table]").forEach(function (el) {
+    var agent = el.getAttribute("data-agent");
+    state[agent] = {
+      table: el.querySelector("table"),
+      label: el.querySelector(".page-label"),
+      dir: el.getAttribute("data-dir"),
+      pages: Number(el.getAttribute("data-pages")),
+      page: -1
+    };
+    el.querySelector(".prev").onclick = function () { load(agent, state[agent].page - 1); };
+    el.querySelector(".next").onclick = function () { load(agent, state[agent].page + 1); };
+    if (state[agent].pages) load(agent, 0);
+  });
+})();
+"""
+
+
+def _esc(value: Any) -> str:
+    return html.escape(str(value), quote=True)
+
+
+def _fingerprint(*parts: Any) -> str:
+    payload = json.dumps(parts, sort_keys=True, default=str)
+    return hashlib.sha1(payload.encode("utf-8")).hexdigest()
+
+
+class _AtomicWriter:
+    """
+    Write to `<path>.tmp` and move into place on success, so a reader
+    never sees a half-written report.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.tmp = path + ".tmp"
+
+    def __enter__(self) -> IO[str]:
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        self.handle = open(self.tmp, "w", encoding="utf-8")
+        return self.handle
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        self.handle.close()
+        if exc_type is None:
+            os.replace(self.tmp, self.path)
+        else:
+            os.remove(self.tmp)
 
 
 class HTMLReporter:
-    @staticmethod
-    def write_html_report(
-        metrics: List[Dict],
-        output_path: str,
+    """
+    Streams the evaluation report to disk.
+
+    The report is assembled from cached section fragments: an overview
+    (model averages and recommendations) and one section per agent with
+    per-model stats, latency / cost histograms and a per-trace table.
+    Trace rows (input, each model's output, per-criterion verdicts) are
+    written as paginated data files and loaded by the page on demand.
+
+    Layout under `output_dir`:
+
+        evaluation_report.html
+        report/manifest.json            section and page fingerprints
+        report/sections/<name>.html     cached fragments
+        report/data/<agent>/page-N.js   per-trace pages
+
+    A section (or page) is re-rendered only when the fingerprint of its
+    underlying data changed since the last report.
+    """
+
+    def __init__(
+        self,
+        store: EvalMetricStore,
+        output_dir: str,
+        page_size: int = 200,
+        histogram_bins: int = 20,
+        max_body_chars: int = 2000,
         title: str = "LLM Evaluation Report",
-    ) -> None:
+    ):
+        self.store = store
+        self.output_dir = output_dir
+        self.page_size = page_size
+        self.histogram_bins = histogram_bins
+        self.max_body_chars = max_body_chars
+        self.title = title
+
+        self.report_dir = os.path.join(output_dir, "report")
+        self.manifest_path = os.path.join(self.report_dir, "manifest.json")
+
+    @classmethod
+    def from_config(
+        cls,
+        config: Dict[str, Any],
+        store: EvalMetricStore,
+    ) -> "HTMLReporter":
+        cfg = config.get("report") or {}
+        return cls(
+            store=store,
+            output_dir=config["export"]["output_dir"],
+            page_size=int(cfg.get("page_size", 200)),
+            histogram_bins=int(cfg.get("histogram_bins", 20)),
+            max_body_chars=int(cfg.get("max_body_chars", 2000)),
+            title=cfg.get("title", "LLM Evaluation Report"),
+        )
+
+    # ---------- REPORT ----------
+
+    def write_html_report(
+        self,
+        exports: Dict[str, Dict[str, str]],
+        recommendations: Optional[Dict] = None,
+        run_id: Optional[str] = None,
+    ) -> str:
         """
-        Write aggregated evaluation metrics to an HTML report.
+        Regenerate changed sections and reassemble the report.
+
+        `exports` maps agent -> {model (or "baseline") -> export file};
+        it supplies the trace bodies for the per-trace table. With
+        `run_id` every table, chart and trace page shows only that run's
+        evaluations, like its recommendations.
         """
+        manifest = self._load_manifest()
+        sections: Dict[str, str] = {}
+        pages: Dict[str, Any] = {}
+        rendered = 0
+
+        fingerprints: Dict[str, List[Dict]] = {}
+        for row in self.store.section_fingerprints(run_id):
+            fingerprints.setdefault(row["agent"], []).append(row)
+
+        agent_recs = (recommendations or {}).get("agents", {})
+
+        ## Overview: model averages + recommendations.
+        fp = _fingerprint(fingerprints, self._stable(recommendations))
+        if self._stale(manifest, "overview", fp):
+            with _AtomicWriter(self._section_path("overview")) as f:
+                self._write_overview(f, recommendations, run_id)
+            rendered += 1
+        sections["overview"] = fp
+
+        agents = sorted(set(fingerprints) | set(exports))
+        for agent in agents:
+            files = exports.get(agent, {})
+            file_sizes = {
+                model: os.path.getsize(path)
+                for model, path in files.items() if os.path.exists(path)
+            }
+            name = f"agent-{self._slug(agent)}"
+
+            fp = _fingerprint(
+                fingerprints.get(agent), file_sizes,
+                agent_recs.get(agent), self.page_size,
+            )
+            if self._stale(manifest, name, fp):
+                pages[agent] = self._write_pages(
+                    agent, files, file_sizes,
+                    manifest.get("pages", {}).get(agent, []), run_id,
+                )
+                with _AtomicWriter(self._section_path(name)) as f:
+                    self._write_agent_section(
+                        f, agent, agent_recs.get(agent), len(pages[agent]), run_id
+                    )
+                rendered += 1
+            else:
+                pages[agent] = manifest.get("pages", {}).get(agent, [])
+            sections[name] = fp
+
+        self._drop_removed(manifest, sections, agents)
+
+        report_path = os.path.join(self.output_dir, "evaluation_report.html")
+        with _AtomicWriter(report_path) as f:
+            self._write_document(f, agents)
+
+        with _AtomicWriter(self.manifest_path) as f:
+            json.dump({"sections": sections, "pages": pages}, f)
+
+        print(
+            f"[HTMLReporter] Report written to {report_path} "
+            f"({rendered} of {len(sections)} sections regenerated)"
+        )
+
+        return report_path
+
+    # ---------- DOCUMENT ----------
+
+    def _write_document(self, f: IO[str], agents: List[str]) -> None:
+        f.write(
+            f"<!DOCTYPE html>\n<html>\n<head>\n<meta charset=\"UTF-8\">\n"
+            f"<title>{_esc(self.title)}</title>\n<style>{STYLE}</style>\n"
+            f"</head>\n<body>\n<h1>{_esc(self.title)}</h1>\n<nav>\n"
+            f"<a href=\"#overview\">Overview</a>\n"
+        )
+        for agent in agents:
+            f.write(f"<a href=\"#agent-{self._slug(agent)}\">{_esc(agent)}</a>\n")
+        f.write("</nav>\n")
+
+        for name in ["overview"] + [f"agent-{self._slug(a)}" for a in agents]:
+            with open(self._section_path(name), "r", encoding="utf-8") as part:
+                shutil.copyfileobj(part, f)
+
+        f.write(f"<script>{SCRIPT}</script>\n</body>\n</html>\n")
+
+    def _write_overview(
+        self,
+        f: IO[str],
+        recommendations: Optional[Dict],
+        run_id: Optional[str] = None,
+    ) -> None:
+        f.write(
+            "<section id=\"overview\">\n<h2>Models</h2>\n<table>\n<thead><tr>"
+            "<th>Model</th><th>Total Traces</th><th>Avg Quality</th>"
+            "<th>Avg Cost</th><th>Avg Latency (ms)</th><th>Avg TTFT (ms)</th>"
+            "<th>Avg Inter-token (ms)</th><th>Avg Tokens/s</th>"
+            "</tr></thead>\n<tbody>\n"
+        )
+
+        for row in self.store.aggregate_model_metrics(run_id):
+            f.write(
+                f"<tr><td>{_esc(row.get('model', '-'))}</td>"
+                f"<td>{row.get('traces', '-')}</td>"
+                f"<td>{self._fmt(row.get('avg_quality'), 3)}</td>"
+                f"<td>{self._fmt(row.get('avg_cost'), 4)}</td>"
+                f"<td>{self._fmt(row.get('avg_latency'), 2)}</td>"
+                f"<td>{self._fmt(row.get('avg_ttft'), 1)}</td>"
+                f"<td>{self._fmt(row.get('avg_inter_token'), 2)}</td>"
+                f"<td>{self._fmt(row.get('avg_tokens_per_second'), 1)}</td></tr>\n"
+            )
+
+        f.write("</tbody>\n</table>\n")
+        self._write_recommendations(f, recommendations)
+        f.write("</section>\n")
 
-        rows = ""
-        for row in metrics:
-            rows += f"""
-            <tr>
-                <td>{row.get('model', '-')}</td>
-                <td>{row.get('total_runs', '-')}</td>
-                <td>{HTMLReporter._fmt(row.get('avg_quality'), 3)}</td>
-                <td>{HTMLReporter._fmt(row.get('avg_cost'), 4)}</td>
-                <td>{HTMLReporter._fmt(row.get('avg_latency'), 2)}</td>
-            </tr>
-            """
-
-        html = f"""
-        <!DOCTYPE html>
-        <html>
-        <head>
-            <meta charset="UTF-8">
-            <title>{title}</title>
-            <style>
-                body {{
-                    font-family: Arial, sans-serif;
-                    padding: 24px;
-                }}
-                h1 {{
-                    margin-bottom: 16px;
-                }}
-                table {{
-                    border-collapse: collapse;
-                    width: 100%;
-                }}
-                th, td {{
-                    border: 1px solid #ddd;
-                    padding: 10px;
-                    text-align: left;
-                }}
-                th {{
-                    background-color: #f4f4f4;
-                }}
-                tr:nth-child(even) {{
-                    background-color: #fafafa;
-                }}
-            </style>
-        </head>
-        <body>
-            <h1>{title}</h1>
-            <table>
-                <thead>
-                    <tr>
-                        <th>Model</th>
-                        <th>Total Traces</th>
-                        <th>Avg Quality</th>
-                        <th>Avg Cost</th>
-                        <th>Avg Latency (ms)</th>
-                    </tr>
-                </thead>
-                <tbody>
-                    {rows}
-                </tbody>
-            </table>
-        </body>
-        </html>
+    def _write_recommendations(self, f: IO[str], recommendations: Optional[Dict]) -> None:
+        if not recommendations or not recommendations.get("agents"):
+            return
+
+        f.write(
+            f"<h2>Recommendations</h2>\n<p>{recommendations['confidence']:.0%} "
+            f"bootstrap intervals over {recommendations['bootstrap_samples']} "
+            f"resamples; quality margin {recommendations['quality_margin']:.0%} "
+            f"of baseline.</p>\n<table>\n<thead><tr><th>Agent</th>"
+            f"<th>Recommended Model</th><th>Confidence</th>"
+            f"<th>Quality vs Baseline [CI]</th><th>Monthly Savings (USD)</th>"
+            f"<th>Pareto Frontier</th><th>Reason</th></tr></thead>\n<tbody>\n"
+        )
+
+        for agent, analysis in recommendations["agents"].items():
+            pick = analysis.get("recommendation") or {}
+            chosen = next(
+                (m for m in analysis["models"] if m["model"] == pick.get("model")),
+                {},
+            )
+            ci = chosen.get("quality_diff_ci") or [None, None]
+            frontier = ", ".join(m["model"] for m in analysis["models"] if m["pareto"])
+
+            f.write(
+                f"<tr><td>{_esc(agent)}</td><td>{_esc(pick.get('model', '-'))}</td>"
+                f"<td>{self._fmt(pick.get('confidence'), 3)}</td>"
+                f"<td>{self._fmt(chosen.get('quality_diff'), 3)} "
+                f"[{self._fmt(ci[0], 3)}, {self._fmt(ci[1], 3)}]</td>"
+                f"<td>{self._fmt(pick.get('monthly_savings_usd'), 2)}</td>"
+                f"<td>{_esc(frontier or '-')}</td>"
+                f"<td>{_esc(pick.get('reason', '-'))}</td></tr>\n"
+            )
+
+        f.write("</tbody>\n</table>\n")
+
+    # ---------- AGENT SECTION ----------
+
+    def _write_agent_section(
+        self,
+        f: IO[str],
+        agent: str,
+        analysis: Optional[Dict],
+        page_count: int,
+        run_id: Optional[str] = None,
+    ) -> None:
+        slug = self._slug(agent)
+        rows = self.store.agent_metric_rows(agent, run_id)
+
+        models = np.array([r[0] for r in rows], dtype=str)
+        ## NULL cost/latency become NaN and are ignored below.
+        values = np.array([r[1:] for r in rows], dtype=float).reshape(-1, 3)
+        names = sorted(set(models.tolist()))
+
+        pareto = {m["model"] for m in (analysis or {}).get("models", []) if m["pareto"]}
+        pick = ((analysis or {}).get("recommendation") or {}).get("model")
+
+        f.write(
+            f"<section id=\"agent-{slug}\">\n<h2>Agent {_esc(agent)}</h2>\n"
+            f"<table>\n<thead><tr><th>Model</th><th>Traces</th>"
+            f"<th>Avg Quality</th><th>Avg Cost</th><th>Total Cost</th>"
+            f"<th>p50 Latency (ms)</th><th>p95 Latency (ms)</th>"
+            f"<th>Pareto</th></tr></thead>\n<tbody>\n"
+        )
+
+        for model in names:
+            quality, cost, latency = values[models == model].T
+            marker = " (recommended)" if model == pick else ""
+            f.write(
+                f"<tr><td>{_esc(model)}{marker}</td><td>{len(quality)}</td>"
+                f"<td>{self._fmt(self._nan(np.nanmean, quality), 3)}</td>"
+                f"<td>{self._fmt(self._nan(np.nanmean, cost), 5)}</td>"
+                f"<td>{self._fmt(self._nan(np.nansum, cost), 4)}</td>"
+                f"<td>{self._fmt(self._nan(np.nanpercentile, latency, 50), 0)}</td>"
+                f"<td>{self._fmt(self._nan(np.nanpercentile, latency, 95), 0)}</td>"
+                f"<td>{'yes' if model in pareto else '-'}</td></tr>\n"
+            )
+
+        f.write("</tbody>\n</table>\n")
+
+        for column, label in ((2, "Latency (ms)"), (1, "Cost (USD)")):
+            f.write(f"<h3>{label} distribution</h3>\n<div class=\"charts\">\n")
+            self._write_histograms(f, models, values[:, column], names, label)
+            f.write("</div>\n")
+
+        f.write(
+            f"<h3>Traces</h3>\n<div data-trace-table data-agent=\"{_esc(agent)}\" "
+            f"data-dir=\"report/data/{slug}\" data-pages=\"{page_count}\">\n"
+            f"<div class=\"pager\"><button class=\"prev\">Previous</button>"
+            f"<button class=\"next\">Next</button>"
+            f"<span class=\"page-label\">{'No traces' if not page_count else ''}</span></div>\n"
+            f"<table>\n<thead><tr><th>Trace</th><th>Input</th><th>Model</th>"
+            f"<th>Output</th><th>Quality</th><th>Cost</th><th>Latency (ms)</th>"
+            f"<th>Verdicts</th></tr></thead>\n<tbody></tbody>\n</table>\n</div>\n"
+            f"</section>\n"
+        )
+
+    def _write_histograms(
+        self,
+        f: IO[str],
+        models: np.ndarray,
+        column: np.ndarray,
+        names: List[str],
+        label: str,
+    ) -> None:
+        finite = np.isfinite(column)
+        if not finite.any():
+            f.write("<p>No data</p>\n")
+            return
+
+        ## Shared bins so the per-model charts are comparable.
+        edges = np.histogram_bin_edges(column[finite], bins=self.histogram_bins)
+        for model in names:
+            counts, _ = np.histogram(column[finite & (models == model)], bins=edges)
+            f.write(self._svg_histogram(model, counts, edges, label))
+
+    @staticmethod
+    def _svg_histogram(
+        model: str,
+        counts: np.ndarray,
+        edges: np.ndarray,
+        label: str,
+        width: int = 320,
+        height: int = 120,
+    ) -> str:
+        peak = max(int(counts.max()), 1)
+        bar = width / len(counts)
+
+        bars = "".join(
+            f"<rect x=\"{i * bar:.1f}\" y=\"{height - c / peak * height:.1f}\" "
+            f"width=\"{max(bar - 1, 1):.1f}\" height=\"{c / peak * height:.1f}\">"
+            f"<title>{edges[i]:.4g} - {edges[i + 1]:.4g}: {c}</title></rect>"
+            for i, c in enumerate(counts.tolist())
+        )
+
+        return (
+            f"<div class=\"chart\"><div>{_esc(model)}</div>"
+            f"<svg width=\"{width}\" height=\"{height}\" role=\"img\" "
+            f"aria-label=\"{_esc(label)} histogram for {_esc(model)}\">{bars}</svg>"
+            f"<div>{edges[0]:.4g} &ndash; {edges[-1]:.4g}</div></div>\n"
+        )
+
+    # ---------- TRACE PAGES ----------
+
+    def _write_pages(
+        self,
+        agent: str,
+        files: Dict[str, str],
+        file_sizes: Dict[str, int],
+        previous: List[str],
+        run_id: Optional[str] = None,
+    ) -> List[str]:
         """
+        Write one data file per page of baseline traces, skipping pages
+        whose evaluations and exports are unchanged. Returns the page
+        fingerprints.
+        """
+        data_dir = os.path.join(self.report_dir, "data", self._slug(agent))
+        baseline_file = files.get(BASELINE)
+
+        if not baseline_file or not os.path.exists(baseline_file):
+            shutil.rmtree(data_dir, ignore_errors=True)
+            return []
+
+        ## Only trace ids and line offsets are indexed; bodies are read
+        ## for the page being written. Replay rows are located by the
+        ## baseline trace they replay, like their evaluations.
+        batches = {
+            model: TraceBatch.from_log_file(path)
+            for model, path in files.items() if os.path.exists(path)
+        }
+        positions = {
+            model: {trace_id: i for i, trace_id in enumerate(batch.source_trace_ids)}
+            for model, batch in batches.items() if model != BASELINE
+        }
 
-        os.makedirs(os.path.dirname(output_path), exist_ok=True)
+        baseline = batches[BASELINE]
+        fingerprints = []
+        written = 0
 
-        with open(output_path, "w", encoding="utf-8") as f:
-            f.write(html)
+        try:
+            for number, start in enumerate(range(0, len(baseline), self.page_size)):
+                trace_ids = baseline.trace_ids[start:start + self.page_size]
+                evaluations = self.store.trace_evaluations(agent, trace_ids, run_id)
 
-        print(f"[HTMLReporter] Report written to {output_path}")
+                fp = _fingerprint(trace_ids, evaluations, file_sizes)
+                fingerprints.append(fp)
+
+                path = os.path.join(data_dir, f"page-{number + 1:05d}.js")
+                if number < len(previous) and previous[number] == fp and os.path.exists(path):
+                    continue
+
+                rows = self._page_rows(
+                    baseline, start, trace_ids, batches, positions, evaluations
+                )
+                with _AtomicWriter(path) as f:
+                    f.write("reportPage(")
+                    json.dump({"agent": agent, "page": number, "rows": rows}, f)
+                    f.write(");\n")
+                written += 1
+        finally:
+            for batch in batches.values():
+                batch.close()
+
+        ## Pages past the new end belong to a larger earlier export.
+        for number in range(len(fingerprints), len(previous)):
+            stale = os.path.join(data_dir, f"page-{number + 1:05d}.js")
+            if os.path.exists(stale):
+                os.remove(stale)
+
+        print(
+            f"[HTMLReporter] agent={agent}: {written} of {len(fingerprints)} "
+            f"trace pages written"
+        )
+
+        return fingerprints
+
+    def _page_rows(
+        self,
+        baseline: TraceBatch,
+        start: int,
+        trace_ids: List[str],
+        batches: Dict[str, TraceBatch],
+        positions: Dict[str, Dict[str, int]],
+        evaluations: List[Dict[str, Any]],
+    ) -> List[Dict[str, Any]]:
+        by_trace: Dict[str, Dict[str, Dict]] = {}
+        for row in evaluations:
+            by_trace.setdefault(row["trace_id"], {})[row["model"]] = row
+
+        rows = []
+        for offset, trace_id in enumerate(trace_ids):
+            input_data, output = baseline[start + offset].bodies()
+            outputs = {BASELINE: output}
+
+            for model, index in positions.items():
+                i = index.get(trace_id)
+                if i is not None:
+                    outputs[model] = batches[model][i].output
+
+            models = {}
+            for model in sorted(set(outputs) | set(by_trace.get(trace_id, {}))):
+                ev = by_trace.get(trace_id, {}).get(model) or {}
+                models[model] = {
+                    "output": self._clip(outputs.get(model)),
+                    "quality": ev.get("quality_score"),
+                    "cost": ev.get("cost"),
+                    "latency_ms": ev.get("response_time_ms"),
+                    "verdicts": json.loads(ev["verdicts"]) if ev.get("verdicts") else None,
+                }
+
+            rows.append({
+                "trace_id": trace_id,
+                "input": self._clip(input_data),
+                "models": models,
+            })
+
+        return rows
+
+    # ---------- MANIFEST ----------
+
+    def _load_manifest(self) -> Dict[str, Any]:
+        try:
+            with open(self.manifest_path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _stale(self, manifest: Dict[str, Any], name: str, fp: str) -> bool:
+        return (
+            manifest.get("sections", {}).get(name) != fp
+            or not os.path.exists(self._section_path(name))
+        )
+
+    def _drop_removed(
+        self,
+        manifest: Dict[str, Any],
+        sections: Dict[str, str],
+        agents: Iterable[str],
+    ) -> None:
+        for name in set(manifest.get("sections", {})) - set(sections):
+            path = self._section_path(name)
+            if os.path.exists(path):
+                os.remove(path)
+
+        current = {self._slug(a) for a in agents}
+        data_root = os.path.join(self.report_dir, "data")
+        if os.path.isdir(data_root):
+            for slug in set(os.listdir(data_root)) - current:
+                shutil.rmtree(os.path.join(data_root, slug), ignore_errors=True)
+
+    def _section_path(self, name: str) -> str:
+        return os.path.join(self.report_dir, "sections", f"{name}.html")
+
+    # ---------- HELPERS ----------
+
+    @staticmethod
+    def _stable(recommendations: Optional[Dict]) -> Optional[Dict]:
+        ## Run-specific fields would otherwise invalidate every section.
+        if not recommendations:
+            return None
+        return {
+            k: v for k, v in recommendations.items()
+            if k not in ("generated_at", "elapsed_seconds")
+        }
+
+    @staticmethod
+    def _slug(name: str) -> str:
+        return re.sub(r"[^\w.-]", "_", name)
+
+    def _clip(self, text: Optional[str]) -> Optional[str]:
+        if text is None or len(text) <= self.max_body_chars:
+            return text
+        return text[:self.max_body_chars] + "..."
+
+    @staticmethod
+    def _nan(fn, values: np.ndarray, *args) -> Optional[float]:
+        if not np.isfinite(values).any():
+            return None
+        return float(fn(values, *args))
 
     @staticmethod
     def _fmt(value, precision: int):
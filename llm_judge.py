@@ -2,14 +2,24 @@ import json
 import argparse
 import sys
 import os
+import time
 from pathlib import Path
-from typing import Dict, Any, List
+from typing import Dict, Any, List, Optional, Tuple
 from portkey_ai import Portkey
+from portkey_client import PortkeyClientFactory
+from call_policy import CallPolicy
+from batch_client import BatchClient
+from telemetry import Telemetry
+from trace_batch import EvaluationBatch, TraceBatch
 from dotenv import load_dotenv
 import yaml
 
 load_dotenv()
 
+## path -> (mtime_ns, template); shared by every judge in the process so
+## long-running schedulers read each prompt once until it changes.
+_PROMPT_CACHE: Dict[str, Tuple[int, str]] = {}
+
 
 class LLMJudge:
     def __init__(
@@ -17,12 +27,18 @@ class LLMJudge:
         agent_name: str,
         model_name: str,
         config_path: str = "config.yaml",
-        log_file_path: str = "logs.jsonl"
+        log_file_path: str = "logs.jsonl",
+        portkey: Optional[Portkey] = None,
+        call_policy: Optional[CallPolicy] = None,
+        telemetry: Optional[Telemetry] = None,
+        batch_client: Optional[BatchClient] = None,
+        config: Optional[Dict[str, Any]] = None,
     ):
         self.agent_name = agent_name
         self.model_name = model_name
         self.log_file_path = log_file_path
-        self.config = self._load_config(config_path)
+        ## An already parsed config (the scheduler's) skips re-reading the file.
+        self.config = config or self._load_config(config_path)
 
         agents_cfg = self.config.get("agents", {})
         if agent_name not in agents_cfg:
@@ -33,113 +49,28 @@ class LLMJudge:
             self.judge_cfg["prompt_file"]
         )
 
-        self.portkey = Portkey(
-            api_key=os.getenv("PORTKEY_API_KEY")
-        )
-    
-    # ------------------------------ LOG PARSING --------------------
-
-    def _extract_inputs_from_logs(self) -> List[str]:
-        """
-        Extract request message content from JSONL logs.
-
-        Path:
-        request -> messages -> [1] -> content
-        """
-        inputs: List[str] = []
-
-        log_path = Path(self.log_file_path)
-        if not log_path.exists():
-            raise FileNotFoundError(f"Log file not found: {log_path}")
-
-        with log_path.open("r", encoding="utf-8") as f:
-            for line_no, line in enumerate(f, start=1):
-                try:
-                    entry = json.loads(line)
-                    content = (
-                        entry["request"]["messages"][1]["content"]
-                    )
-                    inputs.append(content)
-                except Exception as e:
-                    print(
-                        f"[EvalRunner] Skipping line {line_no}: {e}"
-                    )
-
-        print(
-            f"[EvalRunner] Extracted {len(inputs)} inputs"
-            f"from {self.log_file_path}"
-        )
+        self.portkey = portkey or PortkeyClientFactory.from_config(
+            self.config
+        ).get_client()
 
-        return inputs
+        self.call_policy = call_policy or CallPolicy.from_config(self.config)
 
-    def _extract_outputs_from_logs(self) -> List[str]:
-        """
-        Extract response message content from JSONL logs.
+        self.telemetry = telemetry or Telemetry()
 
-        Path:
-        response -> messages -> [1] -> content
-        """
-        outputs: List[str] = []
-
-        log_path = Path(self.log_file_path)
-        if not log_path.exists():
-            raise FileNotFoundError(f"Log file not found: {log_path}")
-
-        with log_path.open("r", encoding="utf-8") as f:
-            for line_no, line in enumerate(f, start=1):
-                try:
-                    entry = json.loads(line)
-                    content = (
-                        entry["response"]["choices"][0]["message"]["content"]
-                    )
-                    outputs.append(content)
-                except Exception as e:
-                    print(
-                        f"[EvalRunner] Skipping line {line_no}: {e}"
-                    )
-
-        print(
-            f"[EvalRunner] Extracted {len(outputs)} outputs"
-            f"from {self.log_file_path}"
-        )
-
-        return outputs
+        ## When set, judge calls go through the offline batch API instead.
+        self.batch_client = batch_client
+    
+    # ------------------------------ LOG PARSING --------------------
 
-    def _extract_metadata_from_logs(self) -> list[Dict[str, Any]]:
+    def _load_traces(self) -> TraceBatch:
         """
-        Extract trace_id,cost,response_time from JSONL logs.
-
-        Path: 
-
-        trace_id, cost, reponseTime at the root it self.
+        Load trace ids, cost and response_time as compact columns.
+        Input/output bodies are read lazily per trace:
 
+        request -> messages -> [1] -> content
+        response -> choices -> [0] -> message -> content
         """
-
-        metadata_list = []
-
-        log_path = Path(self.log_file_path)
-        if not log_path.exists():
-            raise FileNotFoundError(f"Log file not found: {log_path}")
-
-        with log_path.open("r", encoding="utf-8") as f:
-            for line_no, line in enumerate(f, start=1):
-                try:
-                    entry = json.loads(line)
-                    metadata = {}   
-                    metadata["trace_id"] = entry.get("trace_id", "")
-                    metadata["cost"] = entry.get("cost", 0)
-                    metadata["response_time"] = entry.get("response_time", 0)
-                    metadata_list.append(metadata)
-                except Exception as e:
-                    print(
-                        f"[EvalRunner] Skipping line {line_no}: {e}"
-                    )
-
-        print(
-            f"[EvalRunner] Extracted metadata from {self.log_file_path}"
-        )
-
-        return metadata_list    
+        return TraceBatch.from_log_file(self.log_file_path)
 
     # ---------- CONFIG ----------
 
@@ -153,7 +84,13 @@ class LLMJudge:
         path = Path(prompt_path)
         if not path.exists():
             sys.exit(f"Prompt file not found: {prompt_path}")
-        return path.read_text(encoding="utf-8")
+
+        mtime = path.stat().st_mtime_ns
+        cached = _PROMPT_CACHE.get(prompt_path)
+        if cached is None or cached[0] != mtime:
+            cached = (mtime, path.read_text(encoding="utf-8"))
+            _PROMPT_CACHE[prompt_path] = cached
+        return cached[1]
 
     # ---------- PROMPT ----------
 
@@ -177,89 +114,204 @@ class LLMJudge:
 
     # ---------- LLM CALL ----------
 
-    def _call_judge(self, prompt: str) -> dict:
-        response = self.portkey.with_options(
-            metadata=self.judge_cfg.get("metadata", {})
-        ).chat.completions.create(
-            model=self.judge_cfg["model"],
-            temperature=self.judge_cfg.get("temperature", 0),
-            messages=[
-                {
-                    "role": "system",
-                    "content": (
-                        "You are an AI evaluator. "
-                        "Return ONLY valid JSON exactly matching "
-                        "the required output format."
-                    ),
-                },
-                {"role": "user", "content": prompt},
-            ],
-        )
-
-        content = response.choices[0].message.content.strip()
+    @staticmethod
+    def _judge_messages(prompt: str) -> List[Dict[str, str]]:
+        return [
+            {
+                "role": "system",
+                "content": (
+                    "You are an AI evaluator. "
+                    "Return ONLY valid JSON exactly matching "
+                    "the required output format."
+                ),
+            },
+            {"role": "user", "content": prompt},
+        ]
 
+    @staticmethod
+    def _parse_evaluation(content: str) -> dict:
         try:
-            return json.loads(content)
+            return json.loads(content.strip())
         except json.JSONDecodeError:
             raise ValueError(
                 f"Invalid JSON returned by judge:\n{content}"
             )
 
+    @staticmethod
+    def _total_score(evaluation: dict) -> float:
+        total_score = 0
+        for _, value in evaluation.items():
+            total_score += value.get("score", 0)
+        return total_score
+
+    def _call_judge(self, prompt: str) -> dict:
+        response = self._judge_completion(prompt)
+        return self._parse_evaluation(response.choices[0].message.content)
+
+    def _judge_completion(self, prompt: str) -> Any:
+        client = self.portkey.with_options(
+            metadata=self.judge_cfg.get("metadata", {})
+        )
+
+        start = time.perf_counter()
+        response = self.call_policy.call(
+            self.judge_cfg["model"],
+            lambda timeout: client.chat.completions.create(
+                model=self.judge_cfg["model"],
+                temperature=self.judge_cfg.get("temperature", 0),
+                messages=self._judge_messages(prompt),
+                timeout=timeout,
+            ),
+        )
+
+        self.telemetry.record_llm_call(
+            "judge", self.judge_cfg["model"], response, time.perf_counter() - start,
+            agent=self.agent_name,
+        )
+
+        return response
+
+    def judge_one(self, input_data: str, output_data: str) -> Tuple[dict, float, Any]:
+        """
+        Judge a single (input, output) pair, as a queue worker does.
+        Returns the per-criterion evaluation, its total score and the
+        judge call's usage.
+        """
+        prompt = self._build_judge_prompt(self.prompt_template, input_data, output_data)
+        response = self._judge_completion(prompt)
+        evaluation = self._parse_evaluation(response.choices[0].message.content)
+        return evaluation, self._total_score(evaluation), getattr(response, "usage", None)
+
     # ---------- Evaluate ----------
 
     def run(
         self
-    ) -> List[Dict[str, Any]]:
+    ) -> EvaluationBatch:
 
-        inputs = self._extract_inputs_from_logs()
+        tags = {"agent": self.agent_name, "model": self.model_name}
 
-        outputs = self._extract_outputs_from_logs()
+        with self.telemetry.span("judge.parse", **tags) as span:
+            traces = self._load_traces()
+            span["rows"] = len(traces)
 
-        metadata = self._extract_metadata_from_logs()
+        print(f"[LLMJUDGE] Starting evaluation for {len(traces)} items")
 
+        return self.judge_batch(traces)
 
-        ## Iterate over inputs and we will have the same output and metadata
+    def judge_batch(self, traces: TraceBatch) -> EvaluationBatch:
+        """
+        Judge one batch of traces (a whole export or a single chunk).
+        """
+        if self.batch_client is not None:
+            with traces:
+                return self._judge_via_batch_api(traces)
 
-        evals = []
+        tags = {"agent": self.agent_name, "model": self.model_name}
+        evals = EvaluationBatch(self.agent_name, self.model_name)
 
-        print(f"[LLMJUDGE] Starting evaluation for {len(inputs)} items")
+        with traces:
+            for i, trace in enumerate(traces, start=traces.start):
+                input_data, output_data = trace.bodies()
 
-        for i in range(len(inputs)):
-            input_data = inputs[i]
-            output_data = outputs[i]
-            metadata_ = metadata[i]
+                if input_data is None or output_data is None:
+                    print(
+                        f"[LLMJUDGE] Skipping trace {trace.trace_id}: "
+                        f"missing input or output"
+                    )
+                    continue
+
+                prompt = self._build_judge_prompt(
+                    self.prompt_template,
+                    input_data,
+                    output_data,
+                )
+
+                ## This Judge call is for quality evaluation
+                with self.telemetry.span("judge.call", index=i, **tags):
+                    evaluation = self._call_judge(prompt)
+
+                ## Replays are stored under the production trace they
+                ## replay, so every model's row pairs with the baseline.
+                evals.append(
+                    trace_id=trace.source_trace_id,
+                    response_time_ms=trace.response_time,
+                    cost=trace.cost,
+                    quality_score=self._total_score(evaluation),
+                    verdicts=evaluation,
+                )
+
+                self.telemetry.inc("traces_judged_total", **tags)
+                self.telemetry.inc("trace_cost_total", trace.cost, **tags)
+
+        return evals
 
+    # ---------- BATCH API ----------
+
+    def _judge_via_batch_api(self, traces: TraceBatch) -> EvaluationBatch:
+        """
+        Judge the whole batch as one offline job. Failed requests and
+        unparseable verdicts are skipped instead of aborting the run.
+        """
+        tags = {"agent": self.agent_name, "model": self.model_name}
+        evals = EvaluationBatch(self.agent_name, self.model_name)
+        judge_model = self.judge_cfg["model"]
+
+        requests = []
+        for i, trace in enumerate(traces):
+            input_data, output_data = trace.bodies()
+            if input_data is None or output_data is None:
+                print(
+                    f"[LLMJUDGE] Skipping trace {trace.trace_id}: "
+                    f"missing input or output"
+                )
+                continue
 
             prompt = self._build_judge_prompt(
-                self.prompt_template,
-                input_data,
-                output_data,
+                self.prompt_template, input_data, output_data
+            )
+            requests.append(BatchClient.request(
+                str(i),
+                judge_model,
+                self._judge_messages(prompt),
+                temperature=self.judge_cfg.get("temperature", 0),
+            ))
+
+        safe_model = self.model_name.split("/")[-1].replace(":", "_")
+        results = self.batch_client.run(
+            f"judge-{self.agent_name}-{safe_model}-{traces.start}",
+            requests,
+            metadata=self.judge_cfg.get("metadata"),
+            stage="judge",
+        )
+
+        for req in requests:
+            i = int(req["custom_id"])
+            trace = traces[i]
+            result = results[req["custom_id"]]
+
+            try:
+                if result.error:
+                    raise ValueError(result.error)
+                evaluation = self._parse_evaluation(result.content or "")
+            except ValueError as e:
+                print(f"[LLMJUDGE] Skipping trace {trace.trace_id}: {e}")
+                continue
+
+            self.telemetry.inc("llm_calls_total", stage="judge", model=judge_model)
+            self.telemetry.record_tokens(
+                "judge", judge_model, result.body.get("usage") or {},
+                agent=self.agent_name,
+            )
+
+            evals.append(
+                trace_id=trace.source_trace_id,
+                response_time_ms=trace.response_time,
+                cost=trace.cost,
+                quality_score=self._total_score(evaluation),
+                verdicts=evaluation,
             )
 
-            ## This Judge call is for quality evaluation
-            evaluation = self._call_judge(prompt)
-            ## trace_id
-            ## response_time_ms
-            ## cost
-
-            total_score = 0
-            for _, value in evaluation.items():
-                total_score += value.get("score", 0)
-
-            ## Here you can extract additional metadata if needed
-            trace_id = metadata_.get("trace_id", "")
-            response_time_ms = metadata_.get("response_time", 0)
-            cost = metadata_.get("cost", 0)
-
-            eval = {
-                "agent": self.agent_name,
-                "model": self.model_name,
-                "trace_id": trace_id,
-                "response_time_ms": response_time_ms,
-                "cost": cost,
-                "quality_score": total_score,
-            }
-
-            evals.append(eval)
+            self.telemetry.inc("traces_judged_total", **tags)
+            self.telemetry.inc("trace_cost_total", trace.cost, **tags)
 
         return evals
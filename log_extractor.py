@@ -1,13 +1,43 @@
 import os
+import json
 import time
 import yaml
 import requests
-from typing import List, Optional
+from typing import Callable, Dict, IO, List, Optional
 from dotenv import load_dotenv
 from portkey_ai import Portkey
+from portkey_client import PortkeyClientFactory
+from telemetry import Telemetry
+from trace_store import TraceStore
 
 load_dotenv()
 
+## Only the fields downstream stages read, per export kind. Production
+## logs are replayed (request) and judged as the baseline (response, cost,
+## latency); metadata routes batched exports by agent.
+BASELINE_REQUESTED_DATA = [
+    "trace_id",
+    "created_at",
+    "request",
+    "response",
+    "cost",
+    "response_time",
+    "metadata",
+]
+
+## Replays are judged (request, response) and scored on cost / latency;
+## metadata carries the source trace, ai_model routes batched exports.
+EVAL_REQUESTED_DATA = [
+    "trace_id",
+    "request",
+    "response",
+    "ai_model",
+    "total_units",
+    "cost",
+    "response_time",
+    "metadata",
+]
+
 
 class LogExtractor:
     def __init__(
@@ -15,61 +45,57 @@ class LogExtractor:
         api_key: Optional[str] = None,
         workspace_id: str = "",
         poll_interval: int = 5,
+        portkey: Optional[Portkey] = None,
+        session: Optional[requests.Session] = None,
+        download_timeout: Optional[tuple] = None,
+        telemetry: Optional[Telemetry] = None,
+        columnar: bool = False,
     ):
-        self.portkey = Portkey(
-            api_key=api_key or os.getenv("PORTKEY_API_KEY")
-        )
+        if portkey is None or session is None:
+            factory = PortkeyClientFactory(api_key=api_key)
+            portkey = portkey or factory.get_client()
+            session = session or factory.get_session()
+            download_timeout = download_timeout or factory.timeout
+
+        self.portkey = portkey
+        self.session = session
+        self.download_timeout = download_timeout
         self.workspace_id = workspace_id
         self.poll_interval = poll_interval
+        self.telemetry = telemetry or Telemetry()
+        ## Also ingest each download into a `<export>.db` TraceStore.
+        self.columnar = columnar
 
     # ---------- EXPORT WORKFLOW ----------
 
     def create_export(
         self,
         team_id: str,
-        agent_id: str,
+        agent_id: Optional[str],
         time_min: str,
         time_max: str,
+        requested_data: List[str],
         model_id: Optional[str] = None,
         description: str = "Log Export",
     ) -> str:
         """
-        Create a log export and return export_id.
+        Create a log export of the `requested_data` fields and return
+        export_id. Without agent_id the export covers every agent of the team.
         """
+        metadata = {"team": team_id}
+        if agent_id:
+            metadata["agent"] = agent_id
+
         res = self.portkey.logs.exports.create(
             filters={
                 "time_of_generation_min": time_min,
                 "time_of_generation_max": time_max,
-                "metadata": {
-                    "team": team_id,
-                    "agent": agent_id,
-                },
+                "metadata": metadata,
                 "ai_model": model_id
             },
             workspace_id=self.workspace_id,
             description=description,
-            requested_data=[
-                "id",
-                "trace_id",
-                "created_at",
-                "request",
-                "response",
-                "is_success",
-                "ai_org",
-                "ai_model",
-                "req_units",
-                "res_units",
-                "total_units",
-                "request_url",
-                "cost",
-                "cost_currency",
-                "response_time",
-                "response_status_code",
-                "mode",
-                "config",
-                "prompt_slug",
-                "metadata",
-            ],
+            requested_data=requested_data,
         )
         return res.id
 
@@ -111,53 +137,165 @@ class LogExtractor:
 
     # ---------- FILE HANDLING ----------
 
-    @staticmethod
-    def download_file(url: str, output_path: str) -> None:
+    def download_file(self, url: str, output_path: str) -> None:
+        """
+        Download exported logs to file over the shared session.
+        """
+        with self.session.get(
+            url, stream=True, timeout=self.download_timeout
+        ) as response:
+            response.raise_for_status()
+
+            with open(output_path, "wb") as f:
+                for chunk in response.iter_content(chunk_size=1 << 20):
+                    f.write(chunk)
+
+    def split_export(
+        self,
+        input_file: str,
+        route: Callable[[Dict], Optional[str]],
+    ) -> Dict[str, int]:
         """
-        Download exported logs to file.
+        Split one export into several files in a single streaming pass.
+
+        `route(entry)` returns the output path for a log entry, or None to
+        drop it. Lines are copied as-is. Returns rows written per path.
         """
-        response = requests.get(url)
-        response.raise_for_status()
+        handles: Dict[str, IO[bytes]] = {}
+        counts: Dict[str, int] = {}
+
+        try:
+            with open(input_file, "rb") as f:
+                for line_no, line in enumerate(f, start=1):
+                    try:
+                        path = route(json.loads(line))
+                    except Exception as e:
+                        print(f"[LogExtractor] Skipping line {line_no}: {e}")
+                        continue
+
+                    if path is None:
+                        continue
+
+                    if path not in handles:
+                        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+                        handles[path] = open(path, "wb")
+                        counts[path] = 0
+
+                    handles[path].write(line)
+                    counts[path] += 1
+        finally:
+            for handle in handles.values():
+                handle.close()
 
-        with open(output_path, "wb") as f:
-            f.write(response.content)
+        if self.columnar:
+            for path in counts:
+                TraceStore.ingest(path)
+
+        print(
+            f"[LogExtractor] Split {input_file} into {len(counts)} files"
+        )
+
+        return counts
 
     # ---------- HIGH-LEVEL API ----------
 
-    def export_logs_for_agent(
+    def _run_export(
         self,
         team_id: str,
-        agent_id: str,
+        agent_id: Optional[str],
+        model_id: Optional[str],
         time_min: str,
         time_max: str,
         output_file: str,
-        model_id: Optional[str],
+        requested_data: List[str],
+        ingest: bool,
     ) -> None:
-        """
-        End-to-end export for a single agent.
-        """
-
-        if model_id:
-            print(f"[LogExtractor] Exporting logs for model: {model_id}")
+        tags = {"agent": agent_id or "*", "model": model_id or "baseline"}
 
+        with self.telemetry.span("export.create", **tags):
             export_id = self.create_export(
                 team_id=team_id,
                 agent_id=agent_id,
                 time_min=time_min,
                 time_max=time_max,
+                requested_data=requested_data,
                 model_id=model_id
             )
 
-        else :
-            export_id = self.create_export(
-                team_id=team_id,
-                agent_id=agent_id,
-                time_min=time_min,
-                time_max=time_max
-            )
+            self.start_export(export_id)
+
+        with self.telemetry.span("export.wait", **tags):
+            self.wait_for_export(export_id)
+
+        with self.telemetry.span("export.download", **tags) as span:
+            url = self.get_download_url(export_id)
+            self.download_file(url, output_file)
+            span["bytes"] = os.path.getsize(output_file)
+
+        self.telemetry.inc("export_bytes_total", span["bytes"], **tags)
+
+        if ingest and self.columnar:
+            with self.telemetry.span("export.ingest", **tags):
+                TraceStore.ingest(output_file)
+
+    def export_logs_for_agent(
+        self,
+        team_id: str,
+        agent_id: str,
+        time_min: str,
+        time_max: str,
+        output_file: str,
+        model_id: Optional[str],
+        requested_data: Optional[List[str]] = None,
+    ) -> None:
+        """
+        End-to-end export for a single agent. Fields default to the
+        baseline set, or the eval set when exporting a model's replays.
+        """
+        if model_id:
+            print(f"[LogExtractor] Exporting logs for model: {model_id}")
+
+        self._run_export(
+            team_id=team_id,
+            agent_id=agent_id,
+            model_id=model_id,
+            time_min=time_min,
+            time_max=time_max,
+            output_file=output_file,
+            requested_data=requested_data or (
+                EVAL_REQUESTED_DATA if model_id else BASELINE_REQUESTED_DATA
+            ),
+            ingest=True,
+        )
+
+    def export_logs_for_team(
+        self,
+        team_id: str,
+        time_min: str,
+        time_max: str,
+        output_file: str,
+        route: Callable[[Dict], Optional[str]],
+        requested_data: List[str],
+    ) -> Dict[str, int]:
+        """
+        One export covering every agent and model of a team for the window,
+        split locally with `route` (see split_export).
+        """
+        print(f"[LogExtractor] Exporting batched logs for team: {team_id}")
+
+        self._run_export(
+            team_id=team_id,
+            agent_id=None,
+            model_id=None,
+            time_min=time_min,
+            time_max=time_max,
+            output_file=output_file,
+            requested_data=requested_data,
+            ingest=False,
+        )
 
-        self.start_export(export_id)
-        self.wait_for_export(export_id)
+        with self.telemetry.span("export.split", team=team_id) as span:
+            counts = self.split_export(output_file, route)
+            span["files"] = len(counts)
 
-        url = self.get_download_url(export_id)
-        self.download_file(url, output_file)
\ No newline at end of file
+        return counts
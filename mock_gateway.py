@@ -0,0 +1,822 @@
+import argparse
+import json
+import random
+import re
+import threading
+import time
+import uuid
+import zlib
+from datetime import datetime, timedelta, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Optional
+from urllib.parse import urlparse
+
+## USD per 1M (prompt, completion) tokens for export row costs, so replayed
+## models differ in price like real ones; unknown models use the default.
+MODEL_PRICES = {
+    "gpt-4o": (2.5, 10.0),
+    "gpt-4o-mini": (0.15, 0.6),
+    "gpt-3.5-turbo-0125": (0.5, 1.5),
+    "us.meta.llama3-1-70b-instruct-v1:0": (0.72, 0.72),
+}
+DEFAULT_MODEL_PRICE = (1.0, 3.0)
+
+## Production traffic is served by this model unless `models` is given.
+PRODUCTION_MODEL = "gpt-4o"
+
+
+class MockGatewayState:
+    """
+    Configuration, counters and export bookkeeping shared by all
+    request handler threads.
+    """
+
+    def __init__(
+        self,
+        seed: int = 42,
+        latency_ms: float = 50.0,
+        latency_jitter_ms: float = 20.0,
+        error_rate: float = 0.0,
+        rate_limit_rps: Optional[float] = None,
+        export_rows: int = 100,
+        export_delay_ms: float = 200.0,
+        body_chars: int = 800,
+        agents: Optional[List[str]] = None,
+        models: Optional[List[str]] = None,
+        eval_team: str = "portkey",
+        failed_batch_providers: Optional[List[str]] = None,
+    ):
+        self.seed = seed
+        self.latency_ms = latency_ms
+        self.latency_jitter_ms = latency_jitter_ms
+        self.error_rate = error_rate
+        self.rate_limit_rps = rate_limit_rps
+        self.export_rows = export_rows
+        self.export_delay_ms = export_delay_ms
+        self.body_chars = body_chars
+        ## Team-wide exports (no agent / ai_model filter) spread their rows
+        ## round-robin across these, like a real multi-agent team would.
+        self.agents = agents or []
+        self.models = models or []
+        ## Exports for this team's metadata are eval replays: served only
+        ## from logged completions, never synthesized.
+        self.eval_team = eval_team
+        ## Batch jobs sent to these providers end "failed" without output.
+        self.failed_batch_providers = set(failed_batch_providers or [])
+
+        self.exports: Dict[str, Dict[str, Any]] = {}
+        ## Completions sent with metadata (eval replays), served back by
+        ## exports whose filters match them, like Portkey's own logs.
+        self.logged: List[Dict[str, Any]] = []
+        self.files: Dict[str, bytes] = {}
+        self.batches: Dict[str, Dict[str, Any]] = {}
+        self.counters: Dict[str, int] = {}
+        ## Re-entrant: batch completion counts errors while holding it.
+        self.lock = threading.RLock()
+
+        self._tokens = rate_limit_rps or 0.0
+        self._tokens_at = time.monotonic()
+        ## Error injection draws from one seeded stream (not rng_for), so
+        ## a retried request can succeed like a transient upstream error.
+        self._error_rng = random.Random(seed)
+
+    def count(self, key: str) -> None:
+        with self.lock:
+            self.counters[key] = self.counters.get(key, 0) + 1
+
+    def rng_for(self, *parts: Any) -> random.Random:
+        """
+        Deterministic RNG keyed on the seed and request content, so the
+        same request gets the same answer regardless of arrival order.
+        """
+        key = "|".join(str(p) for p in parts).encode("utf-8")
+        return random.Random(self.seed ^ zlib.crc32(key))
+
+    def log_completion(
+        self,
+        body: Dict[str, Any],
+        payload: Dict[str, Any],
+        metadata: Dict[str, Any],
+        trace_id: Optional[str],
+    ) -> None:
+        messages = body.get("messages", [])
+        with self.lock:
+            self.logged.append({
+                "trace_id": trace_id or f"trace-{uuid.uuid4().hex[:16]}",
+                "created_at": datetime.now(timezone.utc),
+                "model": body.get("model", "mock-model").split("/")[-1],
+                "input": messages[1]["content"] if len(messages) > 1 else "",
+                "output": payload["choices"][0]["message"]["content"],
+                "metadata": metadata,
+            })
+
+    @staticmethod
+    def _filter_time(value: Any) -> Optional[datetime]:
+        try:
+            parsed = datetime.fromisoformat(str(value).replace("Z", "+00:00"))
+        except ValueError:
+            return None
+        return parsed if parsed.tzinfo is not None else None
+
+    def matching_logs(self, filters: Dict[str, Any]) -> List[Dict[str, Any]]:
+        """
+        Logged completions matching an export's metadata / ai_model filter,
+        generated within its time_of_generation_min / _max (replays of
+        earlier runs are left out, an inverted window matches nothing).
+        """
+        metadata = filters.get("metadata") or {}
+        model = filters.get("ai_model")
+        since = self._filter_time(filters.get("time_of_generation_min"))
+        until = self._filter_time(filters.get("time_of_generation_max"))
+
+        with self.lock:
+            return [
+                log for log in self.logged
+                if all(log["metadata"].get(k) == v for k, v in metadata.items())
+                and (not model or log["model"] == model)
+                and (since is None or log["created_at"] >= since)
+                and (until is None or log["created_at"] <= until)
+            ]
+
+    def inject_error(self) -> bool:
+        if not self.error_rate:
+            return False
+        with self.lock:
+            return self._error_rng.random() < self.error_rate
+
+    def take_rate_token(self) -> bool:
+        if not self.rate_limit_rps:
+            return True
+
+        with self.lock:
+            now = time.monotonic()
+            self._tokens = min(
+                self.rate_limit_rps,
+                self._tokens + (now - self._tokens_at) * self.rate_limit_rps,
+            )
+            self._tokens_at = now
+
+            if self._tokens < 1:
+                return False
+
+            self._tokens -= 1
+            return True
+
+
+class MockGatewayHandler(BaseHTTPRequestHandler):
+    """
+    Implements the subset of the Portkey API used by this project:
+
+        POST /v1/chat/completions
+        POST /v1/logs/exports
+        POST /v1/logs/exports/{id}/start
+        GET  /v1/logs/exports
+        GET  /v1/logs/exports/{id}/download
+        GET  /files/{id}.jsonl            (signed download URL)
+        POST /v1/files                    (batch input upload, multipart)
+        GET  /v1/files/{id}/content
+        POST /v1/batches
+        GET  /v1/batches/{id}
+    """
+
+    protocol_version = "HTTP/1.1"
+    state: MockGatewayState = None  # set by MockGateway
+
+    def log_message(self, format, *args):  # keep benchmark output clean
+        pass
+
+    # ---------- ROUTING ----------
+
+    def do_POST(self):
+        path = urlparse(self.path).path
+
+        if path.endswith("/files"):
+            return self._upload_file()
+
+        body = self._read_json()
+
+        if path.endswith("/chat/completions"):
+            return self._chat_completion(body)
+
+        if path.endswith("/logs/exports"):
+            return self._create_export(body)
+
+        match = re.search(r"/logs/exports/([^/]+)/start$", path)
+        if match:
+            return self._start_export(match.group(1))
+
+        if path.endswith("/batches"):
+            return self._create_batch(body)
+
+        self._send_json(404, {"error": f"unknown route {path}"})
+
+    def do_GET(self):
+        path = urlparse(self.path).path
+
+        if path.endswith("/logs/exports"):
+            return self._list_exports()
+
+        match = re.search(r"/logs/exports/([^/]+)/download$", path)
+        if match:
+            return self._download_url(match.group(1))
+
+        match = re.search(r"/files/([^/]+)\.jsonl$", path)
+        if match:
+            return self._export_file(match.group(1))
+
+        match = re.search(r"/files/([^/]+)/content$", path)
+        if match:
+            return self._file_content(match.group(1))
+
+        match = re.search(r"/batches/([^/]+)$", path)
+        if match:
+            return self._retrieve_batch(match.group(1))
+
+        self._send_json(404, {"error": f"unknown route {path}"})
+
+    # ---------- CHAT ----------
+
+    def _chat_completion(self, body: Dict[str, Any]) -> None:
+        state = self.state
+        state.count("chat.completions")
+
+        if not state.take_rate_token():
+            state.count("rate_limited")
+            return self._send_json(429, {"error": {"message": "rate limited"}})
+
+        messages = body.get("messages", [])
+        rng = state.rng_for(body.get("model", "mock-model"), messages[-1]["content"] if messages else "")
+
+        delay = max(0.0, rng.gauss(state.latency_ms, state.latency_jitter_ms))
+        if body.get("stream"):
+            return self._stream_completion(body, rng, delay / 1000)
+
+        time.sleep(delay / 1000)
+
+        status, payload = self._completion(body, rng)
+        if status == 200:
+            self._log_completion(body, payload)
+        self._send_json(status, payload)
+
+    def _header_json(self, name: str) -> Dict[str, Any]:
+        try:
+            value = json.loads(self.headers.get(name) or "{}")
+        except json.JSONDecodeError:
+            return {}
+        return value if isinstance(value, dict) else {}
+
+    def _log_completion(self, body: Dict[str, Any], payload: Dict[str, Any]) -> None:
+        metadata = self._header_json("x-portkey-metadata")
+        if metadata:
+            self.state.log_completion(
+                body, payload, metadata, self.headers.get("x-portkey-trace-id")
+            )
+
+    def _stream_completion(
+        self,
+        body: Dict[str, Any],
+        rng: random.Random,
+        delay: float,
+    ) -> None:
+        """
+        Server-sent events: ~30% of the latency before the first token,
+        the rest spread over one chunk per word.
+        """
+        status, payload = self._completion(body, rng)
+        if status != 200:
+            return self._send_json(status, payload)
+        self._log_completion(body, payload)
+
+        content = payload["choices"][0]["message"]["content"]
+        pieces = re.findall(r"\S+\s*", content) or [content]
+        per_piece = delay * 0.7 / len(pieces)
+
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+
+        def event(choices: list, **extra) -> None:
+            chunk = {
+                "id": payload["id"],
+                "object": "chat.completion.chunk",
+                "created": payload["created"],
+                "model": payload["model"],
+                "choices": choices,
+                **extra,
+            }
+            self._write_chunk(f"data: {json.dumps(chunk)}\n\n".encode("utf-8"))
+
+        time.sleep(delay * 0.3)
+        for i, piece in enumerate(pieces):
+            delta = {"content": piece}
+            if i == 0:
+                delta["role"] = "assistant"
+            event([{"index": 0, "delta": delta, "finish_reason": None}])
+            time.sleep(per_piece)
+
+        event([{"index": 0, "delta": {}, "finish_reason": "stop"}])
+        if (body.get("stream_options") or {}).get("include_usage"):
+            event([], usage=payload["usage"])
+
+        self._write_chunk(b"data: [DONE]\n\n")
+        self._write_chunk(b"")
+
+    def _completion(self, body: Dict[str, Any], rng: random.Random) -> tuple:
+        """
+        (status, payload) for one chat completion request.
+        """
+        state = self.state
+
+        if state.inject_error():
+            state.count("errors")
+            return 500, {"error": {"message": "mock upstream error"}}
+
+        messages = body.get("messages", [])
+        model = body.get("model", "mock-model")
+        prompt = messages[-1]["content"] if messages else ""
+
+        system = messages[0]["content"] if messages else ""
+        if "evaluator" in system.lower():
+            ## Scores follow the case's input, not the output judged, so
+            ## every model ties with the baseline on quality and the cheaper
+            ## replays can be recommended.
+            case = re.search(r"<input>(.*?)</input>", prompt, re.S)
+            content = self._judge_content(
+                prompt, state.rng_for("judge", self._case_key(case.group(1) if case else prompt))
+            )
+        else:
+            content = self._filler(rng, state.body_chars)
+
+        prompt_tokens = max(1, len(prompt) // 4)
+        completion_tokens = max(1, len(content) // 4)
+
+        return 200, {
+            "id": f"chatcmpl-{uuid.UUID(int=rng.getrandbits(128)).hex}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": model,
+            "choices": [{
+                "index": 0,
+                "message": {"role": "assistant", "content": content},
+                "finish_reason": "stop",
+            }],
+            "usage": {
+                "prompt_tokens": prompt_tokens,
+                "completion_tokens": completion_tokens,
+                "total_tokens": prompt_tokens + completion_tokens,
+            },
+        }
+
+    @staticmethod
+    def _case_key(text: str) -> str:
+        """
+        A judged input with the JSON string encoding replays add removed,
+        so a replay and its baseline share one key.
+        """
+        text = text.strip()
+        while True:
+            try:
+                value = json.loads(text)
+            except ValueError:
+                return text
+            if not isinstance(value, str):
+                return text
+            text = value.strip()
+
+    @staticmethod
+    def _cost(model: str, req_units: int, res_units: int) -> float:
+        prompt_price, completion_price = MODEL_PRICES.get(model, DEFAULT_MODEL_PRICE)
+        return round((req_units * prompt_price + res_units * completion_price) / 1e6, 8)
+
+    @staticmethod
+    def _judge_content(prompt: str, rng: random.Random) -> str:
+        criteria = re.findall(r'"(\w+)":\s*\{\s*"score"', prompt) or [
+            "accuracy", "relevance", "tone",
+        ]
+        return json.dumps({
+            name: {"score": rng.randint(1, 3), "reasoning": "mock verdict"}
+            for name in dict.fromkeys(criteria)
+        })
+
+    @staticmethod
+    def _filler(rng: random.Random, chars: int) -> str:
+        words = ["offer", "card", "cashback", "policy", "benefit", "team",
+                 "campaign", "customer", "credit", "travel", "leave", "form"]
+        out = []
+        size = 0
+        while size < chars:
+            word = rng.choice(words)
+            out.append(word)
+            size += len(word) + 1
+        return " ".join(out)
+
+    # ---------- EXPORTS ----------
+
+    def _create_export(self, body: Dict[str, Any]) -> None:
+        state = self.state
+        state.count("logs.exports.create")
+
+        filters = body.get("filters") or {}
+        ## Eval exports return the replays actually sent (possibly none);
+        ## production exports are synthesized.
+        logs = None
+        if (filters.get("metadata") or {}).get("team") == state.eval_team:
+            logs = state.matching_logs(filters)
+
+        with state.lock:
+            export_id = uuid.UUID(int=random.Random(
+                state.seed + len(state.exports)
+            ).getrandbits(128)).hex
+
+            state.exports[export_id] = {
+                "id": export_id,
+                "status": "draft",
+                "filters": filters,
+                "requested_data": body.get("requested_data"),
+                "workspace_id": body.get("workspace_id"),
+                "started_at": None,
+                "logs": logs,
+                "rows": len(logs) if logs is not None else state.export_rows,
+            }
+
+        self._send_json(200, {
+            "id": export_id, "total": state.exports[export_id]["rows"], "object": "export",
+        })
+
+    def _start_export(self, export_id: str) -> None:
+        state = self.state
+        state.count("logs.exports.start")
+
+        with state.lock:
+            export = state.exports.get(export_id)
+            if export is None:
+                return self._send_json(404, {"error": "export not found"})
+            export["status"] = "in_progress"
+            export["started_at"] = time.monotonic()
+
+        self._send_json(200, {"message": "export started", "object": "export"})
+
+    def _list_exports(self) -> None:
+        state = self.state
+        state.count("logs.exports.list")
+
+        data = []
+        with state.lock:
+            for export in state.exports.values():
+                if (
+                    export["status"] == "in_progress"
+                    and (time.monotonic() - export["started_at"]) * 1000
+                    >= state.export_delay_ms
+                ):
+                    export["status"] = "success"
+                data.append({"id": export["id"], "status": export["status"]})
+
+        self._send_json(200, {"object": "list", "total": len(data), "data": data})
+
+    def _download_url(self, export_id: str) -> None:
+        self.state.count("logs.exports.download")
+        host, port = self.server.server_address[:2]
+        self._send_json(200, {
+            "signed_url": f"http://{host}:{port}/files/{export_id}.jsonl",
+        })
+
+    def _export_file(self, export_id: str) -> None:
+        state = self.state
+        state.count("files.download")
+
+        export = state.exports.get(export_id)
+        if export is None:
+            return self._send_json(404, {"error": "export not found"})
+
+        self.send_response(200)
+        self.send_header("Content-Type", "application/x-ndjson")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+
+        buffer = []
+        for i in range(export["rows"]):
+            buffer.append(json.dumps(self._export_row(export, i)) + "\n")
+            if len(buffer) >= 256:
+                self._write_chunk("".join(buffer).encode("utf-8"))
+                buffer = []
+
+        if buffer:
+            self._write_chunk("".join(buffer).encode("utf-8"))
+        self._write_chunk(b"")
+
+    def _export_row(self, export: Dict[str, Any], index: int) -> Dict[str, Any]:
+        state = self.state
+        filters = export["filters"] or {}
+        metadata = dict(filters.get("metadata") or {})
+        spread = index
+        if "agent" not in metadata and state.agents:
+            metadata["agent"] = state.agents[index % len(state.agents)]
+            spread = index // len(state.agents)
+        model = filters.get("ai_model")
+        if not model:
+            model = state.models[spread % len(state.models)] if state.models else PRODUCTION_MODEL
+        if export["logs"] is not None:
+            model = export["logs"][index]["model"]
+        rng = state.rng_for(export["id"], index)
+
+        created = datetime(2026, 1, 16, tzinfo=timezone.utc) + timedelta(
+            seconds=index * 37
+        )
+        req_units = rng.randint(200, 1200)
+        res_units = rng.randint(100, 600)
+        user_input = json.dumps({
+            "target_segment": self._filler(rng, 60),
+            "campaign_goal": self._filler(rng, 60),
+            "tone": self._filler(rng, 20),
+        })
+
+        row = {
+            "id": f"log-{export['id'][:8]}-{index}",
+            ## Unique per export: replays only pair with their baseline
+            ## through the trace id / metadata they were sent with.
+            "trace_id": f"trace-{export['id'][:8]}-{index:08d}",
+            "created_at": created.isoformat(),
+            "request": {
+                "model": model,
+                "messages": [
+                    {"role": "system", "content": "You are a marketing assistant."},
+                    {"role": "user", "content": user_input},
+                ],
+            },
+            "response": {
+                "choices": [{
+                    "index": 0,
+                    "message": {
+                        "role": "assistant",
+                        "content": self._filler(rng, state.body_chars),
+                    },
+                }],
+            },
+            "is_success": True,
+            "ai_org": "openai",
+            "ai_model": model,
+            "req_units": req_units,
+            "res_units": res_units,
+            "total_units": req_units + res_units,
+            "request_url": "https://api.openai.com/v1/chat/completions",
+            "cost": self._cost(model, req_units, res_units),
+            "cost_currency": "USD",
+            "response_time": rng.randint(300, 4000),
+            "response_status_code": 200,
+            "mode": "single",
+            "config": None,
+            "prompt_slug": None,
+            "metadata": metadata,
+        }
+
+        if export["logs"] is not None:
+            log = export["logs"][index]
+            row.update({
+                "trace_id": log["trace_id"],
+                "created_at": log["created_at"].isoformat(),
+                "ai_model": log["model"],
+                "metadata": log["metadata"],
+            })
+            row["request"]["model"] = log["model"]
+            row["request"]["messages"][1]["content"] = log["input"]
+            row["response"]["choices"][0]["message"]["content"] = log["output"]
+
+        requested = export.get("requested_data")
+        if requested:
+            row = {k: v for k, v in row.items() if k in requested}
+        return row
+
+    # ---------- BATCHES ----------
+
+    def _upload_file(self) -> None:
+        state = self.state
+        state.count("files.create")
+
+        length = int(self.headers.get("Content-Length") or 0)
+        raw = self.rfile.read(length)
+        content = self._multipart_file(raw, self.headers.get("Content-Type", ""))
+
+        with state.lock:
+            file_id = f"file-{len(state.files):06d}"
+            state.files[file_id] = content
+
+        self._send_json(200, {
+            "id": file_id,
+            "object": "file",
+            "bytes": len(content),
+            "created_at": int(time.time()),
+            "filename": "batch.jsonl",
+            "purpose": "batch",
+            "status": "processed",
+        })
+
+    @staticmethod
+    def _multipart_file(raw: bytes, content_type: str) -> bytes:
+        match = re.search(r"boundary=\"?([^\";]+)", content_type)
+        if not match:
+            return raw
+
+        for part in raw.split(b"--" + match.group(1).encode("ascii")):
+            head, _, data = part.partition(b"\r\n\r\n")
+            if b'name="file"' in head:
+                return data[:-2] if data.endswith(b"\r\n") else data
+        return b""
+
+    def _file_content(self, file_id: str) -> None:
+        self.state.count("files.content")
+        content = self.state.files.get(file_id)
+        if content is None:
+            return self._send_json(404, {"error": "file not found"})
+
+        self.send_response(200)
+        self.send_header("Content-Type", "application/jsonl")
+        self.send_header("Content-Length", str(len(content)))
+        self.end_headers()
+        self.wfile.write(content)
+
+    def _create_batch(self, body: Dict[str, Any]) -> None:
+        state = self.state
+        state.count("batches.create")
+
+        if body.get("input_file_id") not in state.files:
+            return self._send_json(400, {"error": {"message": "unknown input_file_id"}})
+
+        with state.lock:
+            batch_id = f"batch-{len(state.batches):06d}"
+            state.batches[batch_id] = {
+                "id": batch_id,
+                "object": "batch",
+                "endpoint": body.get("endpoint"),
+                "input_file_id": body["input_file_id"],
+                "completion_window": body.get("completion_window", "24h"),
+                "status": "validating",
+                "output_file_id": None,
+                "error_file_id": None,
+                "created_at": int(time.time()),
+                "request_counts": {"total": 0, "completed": 0, "failed": 0},
+                "_started": time.monotonic(),
+                "_metadata": self._header_json("x-portkey-metadata"),
+                "_provider": self.headers.get("x-portkey-provider"),
+            }
+
+        self._retrieve_batch(batch_id)
+
+    def _retrieve_batch(self, batch_id: str) -> None:
+        state = self.state
+        state.count("batches.retrieve")
+
+        with state.lock:
+            batch = state.batches.get(batch_id)
+            if batch is None:
+                return self._send_json(404, {"error": "batch not found"})
+
+            elapsed_ms = (time.monotonic() - batch["_started"]) * 1000
+            if batch["status"] == "validating":
+                batch["status"] = "in_progress"
+            elif batch["status"] == "in_progress" and elapsed_ms >= state.export_delay_ms:
+                if batch["_provider"] in state.failed_batch_providers:
+                    batch["status"] = "failed"
+                else:
+                    self._complete_batch(batch)
+
+            payload = {k: v for k, v in batch.items() if not k.startswith("_")}
+
+        self._send_json(200, payload)
+
+    def _complete_batch(self, batch: Dict[str, Any]) -> None:
+        """
+        Run every request of the batch (no per-request latency or rate
+        limit) and store output / error files. Called with the lock held.
+        """
+        state = self.state
+        outputs, errors = [], []
+
+        for line in state.files[batch["input_file_id"]].splitlines():
+            if not line.strip():
+                continue
+            request = json.loads(line)
+            body = request.get("body", {})
+            messages = body.get("messages", [])
+            rng = state.rng_for(
+                body.get("model", "mock-model"),
+                messages[-1]["content"] if messages else "",
+            )
+            status, payload = self._completion(body, rng)
+
+            ## Like Portkey, logs carry only the job's header metadata.
+            metadata = batch["_metadata"]
+            if status == 200 and metadata:
+                state.log_completion(body, payload, metadata, None)
+
+            result = {
+                "id": f"batch_req_{len(outputs) + len(errors)}",
+                "custom_id": request.get("custom_id"),
+                "response": {"status_code": status, "body": payload},
+                "error": None,
+            }
+            (outputs if status == 200 else errors).append(json.dumps(result))
+
+        for key, lines in (("output_file_id", outputs), ("error_file_id", errors)):
+            if lines:
+                file_id = f"file-{len(state.files):06d}"
+                state.files[file_id] = ("\n".join(lines) + "\n").encode("utf-8")
+                batch[key] = file_id
+
+        batch["status"] = "completed"
+        batch["completed_at"] = int(time.time())
+        batch["request_counts"] = {
+            "total": len(outputs) + len(errors),
+            "completed": len(outputs),
+            "failed": len(errors),
+        }
+
+    # ---------- IO ----------
+
+    def _read_json(self) -> Dict[str, Any]:
+        length = int(self.headers.get("Content-Length") or 0)
+        if not length:
+            return {}
+        return json.loads(self.rfile.read(length) or b"{}")
+
+    def _send_json(self, status: int, payload: Dict[str, Any]) -> None:
+        data = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _write_chunk(self, data: bytes) -> None:
+        self.wfile.write(f"{len(data):X}\r\n".encode("ascii") + data + b"\r\n")
+
+
+class MockGateway:
+    """
+    Local stand-in for the Portkey API. Point `http.base_url` at `base_url`.
+    """
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 0, **state_kwargs):
+        self.state = MockGatewayState(**state_kwargs)
+        handler = type(
+            "BoundMockGatewayHandler", (MockGatewayHandler,), {"state": self.state}
+        )
+        self.server = ThreadingHTTPServer((host, port), handler)
+        self.server.daemon_threads = True
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def base_url(self) -> str:
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}/v1"
+
+    def start(self) -> "MockGateway":
+        self._thread = threading.Thread(
+            target=self.server.serve_forever, name="mock-gateway", daemon=True
+        )
+        self._thread.start()
+        print(f"[MockGateway] Listening on {self.base_url}")
+        return self
+
+    def stop(self) -> None:
+        self.server.shutdown()
+        self.server.server_close()
+
+    def __enter__(self) -> "MockGateway":
+        return self.start()
+
+    def __exit__(self, *exc) -> None:
+        self.stop()
+
+
+# ---------- ENTRY POINT ----------
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Local mock Portkey gateway")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8787)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--latency-ms", type=float, default=50.0)
+    parser.add_argument("--latency-jitter-ms", type=float, default=20.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--rate-limit-rps", type=float, default=None)
+    parser.add_argument("--export-rows", type=int, default=100)
+    parser.add_argument("--export-delay-ms", type=float, default=200.0)
+
+    args = parser.parse_args()
+
+    gateway = MockGateway(
+        host=args.host,
+        port=args.port,
+        seed=args.seed,
+        latency_ms=args.latency_ms,
+        latency_jitter_ms=args.latency_jitter_ms,
+        error_rate=args.error_rate,
+        rate_limit_rps=args.rate_limit_rps,
+        export_rows=args.export_rows,
+        export_delay_ms=args.export_delay_ms,
+    )
+
+    try:
+        gateway.start()._thread.join()
+    except KeyboardInterrupt:
+        gateway.stop()
@@ -0,0 +1,368 @@
+import argparse
+import json
+import time
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+from eval_metric_store import EvalMetricStore
+
+BASELINE = "baseline"
+
+
+class EvaluationFrame:
+    """
+    Evaluations held as NumPy columns. Agent, model and trace ids are
+    integer codes into the `agents` / `models` / `trace_ids` vocabularies.
+    """
+
+    def __init__(self, rows: List[tuple]):
+        if rows:
+            agent, model, trace, quality, cost, latency = zip(*rows)
+        else:
+            agent = model = trace = quality = cost = latency = ()
+
+        self.agents, self.agent = np.unique(np.array(agent, dtype=str), return_inverse=True)
+        self.models, self.model = np.unique(np.array(model, dtype=str), return_inverse=True)
+        self.trace_ids, self.trace = np.unique(np.array(trace, dtype=str), return_inverse=True)
+
+        ## NULLs (e.g. rows only carrying stream metrics) become NaN.
+        self.quality = np.array(quality, dtype=float)
+        self.cost = np.array(cost, dtype=float)
+        self.latency = np.array(latency, dtype=float)
+
+    @classmethod
+    def from_store(
+        cls,
+        store: EvalMetricStore,
+        agents: Optional[List[str]] = None,
+        run_id: Optional[str] = None,
+    ) -> "EvaluationFrame":
+        return cls(store.evaluation_rows(agents, run_id))
+
+    def __len__(self) -> int:
+        return len(self.quality)
+
+
+def pareto_frontier(points: np.ndarray) -> np.ndarray:
+    """
+    Boolean mask of non-dominated rows of `points` (n x k), where every
+    column is to be minimized.
+    """
+    if len(points) == 0:
+        return np.zeros(0, dtype=bool)
+
+    ## dominates[j, i]: j is no worse than i everywhere and better somewhere.
+    no_worse = (points[:, None, :] <= points[None, :, :]).all(axis=2)
+    better = (points[:, None, :] < points[None, :, :]).any(axis=2)
+    return ~(no_worse & better).any(axis=0)
+
+
+class ModelAnalyzer:
+    """
+    Per-agent cost / quality / latency analysis of replayed models against
+    the production baseline.
+
+    For each agent: the Pareto frontier over (cost, latency, -quality),
+    paired bootstrap confidence intervals for the quality difference and
+    the per-trace cost saving versus baseline, projected monthly savings
+    from the observed traffic volume, and a recommended model.
+
+    A model is recommended when it is on the frontier, cheaper than the
+    baseline and non-inferior on quality (its mean quality is at least
+    baseline * (1 - quality_margin)) in `confidence` of the resamples;
+    among those the largest projected saving wins. Otherwise the
+    recommendation is to keep the baseline.
+    """
+
+    def __init__(
+        self,
+        bootstrap_samples: int = 2000,
+        confidence: float = 0.95,
+        quality_margin: float = 0.02,
+        min_paired_traces: int = 30,
+        max_bootstrap_cells: int = 5_000_000,
+        days_per_month: float = 30.0,
+        seed: int = 42,
+    ):
+        self.bootstrap_samples = bootstrap_samples
+        self.confidence = confidence
+        self.quality_margin = quality_margin
+        self.min_paired_traces = min_paired_traces
+        ## Resamples are drawn in blocks of at most this many indices.
+        self.max_bootstrap_cells = max_bootstrap_cells
+        self.days_per_month = days_per_month
+        self.seed = seed
+
+    @classmethod
+    def from_config(cls, config: Dict[str, Any]) -> "ModelAnalyzer":
+        cfg = config.get("analysis") or {}
+        return cls(
+            bootstrap_samples=int(cfg.get("bootstrap_samples", 2000)),
+            confidence=float(cfg.get("confidence", 0.95)),
+            quality_margin=float(cfg.get("quality_margin", 0.02)),
+            min_paired_traces=int(cfg.get("min_paired_traces", 30)),
+            max_bootstrap_cells=int(cfg.get("max_bootstrap_cells", 5_000_000)),
+            days_per_month=float(cfg.get("days_per_month", 30)),
+            seed=int(cfg.get("seed", 42)),
+        )
+
+    # ---------- BOOTSTRAP ----------
+
+    def bootstrap_means(self, values: np.ndarray, rng: np.random.Generator) -> np.ndarray:
+        """
+        Means of `bootstrap_samples` resamples of the rows of `values`
+        (n x k), returned as (samples x k).
+        """
+        n = len(values)
+        block = max(1, self.max_bootstrap_cells // max(n, 1))
+        means = np.empty((self.bootstrap_samples, values.shape[1]))
+
+        ## 1-D takes on contiguous columns are several times faster than
+        ## fancy-indexing rows of the 2-D array.
+        columns = [np.ascontiguousarray(c) for c in values.T]
+
+        for start in range(0, self.bootstrap_samples, block):
+            stop = min(start + block, self.bootstrap_samples)
+            idx = rng.integers(0, n, size=(stop - start, n), dtype=np.int32)
+            for k, column in enumerate(columns):
+                means[start:stop, k] = column.take(idx).mean(axis=1)
+
+        return means
+
+    # ---------- ANALYSIS ----------
+
+    def analyze(
+        self,
+        frame: EvaluationFrame,
+        window_days: Optional[float] = None,
+        sample_fractions: Optional[Dict[str, float]] = None,
+    ) -> Dict[str, Any]:
+        """
+        Analyze every agent in `frame`.
+
+        Monthly volume is the number of baseline traces over
+        `window_days`, scaled up by the agent's sample fraction when the
+        baseline export was downsampled.
+        """
+        sample_fractions = sample_fractions or {}
+        started = time.perf_counter()
+
+        agents = {
+            name: self._analyze_agent(
+                frame, code, window_days, sample_fractions.get(name) or 1.0
+            )
+            for code, name in enumerate(frame.agents)
+        }
+
+        return {
+            "generated_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+            "rows": len(frame),
+            "window_days": window_days,
+            "bootstrap_samples": self.bootstrap_samples,
+            "confidence": self.confidence,
+            "quality_margin": self.quality_margin,
+            "elapsed_seconds": round(time.perf_counter() - started, 3),
+            "agents": agents,
+        }
+
+    def _analyze_agent(
+        self,
+        frame: EvaluationFrame,
+        agent_code: int,
+        window_days: Optional[float],
+        sample_fraction: float,
+    ) -> Dict[str, Any]:
+        agent = str(frame.agents[agent_code])
+        rng = np.random.default_rng([self.seed, agent_code])
+
+        in_agent = frame.agent == agent_code
+        model_codes = np.unique(frame.model[in_agent])
+        names = [str(frame.models[c]) for c in model_codes]
+
+        ## Per-model means (NaN-aware: stream-only rows have no score).
+        stats = []
+        for code in model_codes:
+            rows = in_agent & (frame.model == code)
+            stats.append({
+                "traces": int(rows.sum()),
+                "avg_quality": self._nanmean(frame.quality[rows]),
+                "avg_cost": self._nanmean(frame.cost[rows]),
+                "avg_latency": self._nanmean(frame.latency[rows]),
+            })
+
+        points = np.array(
+            [[s["avg_cost"], s["avg_latency"], s["avg_quality"]] for s in stats],
+            dtype=float,
+        ).reshape(-1, 3)
+        points[:, 2] *= -1
+        ## Missing metrics never help a model onto the frontier.
+        on_frontier = pareto_frontier(np.nan_to_num(points, nan=np.inf))
+
+        if BASELINE not in names:
+            print(f"[ModelAnalyzer] No baseline for agent={agent}, skipping comparison")
+            return {
+                "models": [
+                    dict(model=name, pareto=bool(p), **s)
+                    for name, p, s in zip(names, on_frontier, stats)
+                ],
+                "recommendation": None,
+            }
+
+        baseline_code = model_codes[names.index(BASELINE)]
+        baseline_rows = in_agent & (frame.model == baseline_code)
+        baseline = stats[names.index(BASELINE)]
+
+        monthly_traces = None
+        if window_days:
+            monthly_traces = (
+                baseline["traces"] / sample_fraction / window_days * self.days_per_month
+            )
+
+        ## Baseline values indexed by trace code, for pairing.
+        by_trace = np.full((len(frame.trace_ids), 2), np.nan)
+        by_trace[frame.trace[baseline_rows]] = np.column_stack(
+            (frame.quality[baseline_rows], frame.cost[baseline_rows])
+        )
+        floor = (baseline["avg_quality"] or 0.0) * self.quality_margin
+
+        models = []
+        for i, (code, name) in enumerate(zip(model_codes, names)):
+            entry = dict(model=name, pareto=bool(on_frontier[i]), **stats[i])
+
+            if code != baseline_code:
+                rows = in_agent & (frame.model == code)
+                paired = np.column_stack((
+                    frame.quality[rows] - by_trace[frame.trace[rows], 0],
+                    by_trace[frame.trace[rows], 1] - frame.cost[rows],
+                ))
+                paired = paired[~np.isnan(paired).any(axis=1)]
+                entry.update(self._compare(paired, floor, monthly_traces, rng))
+
+            models.append(entry)
+
+        return {
+            "baseline": baseline,
+            "monthly_traces": self._round(monthly_traces, 0),
+            "models": models,
+            "recommendation": self._recommend(models, baseline),
+        }
+
+    def _compare(
+        self,
+        paired: np.ndarray,
+        floor: float,
+        monthly_traces: Optional[float],
+        rng: np.random.Generator,
+    ) -> Dict[str, Any]:
+        """
+        Bootstrap the paired (quality diff, cost saving) per trace.
+        """
+        n = len(paired)
+        if n < self.min_paired_traces:
+            return {"paired": n, "p_non_inferior": None}
+
+        means = self.bootstrap_means(paired, rng)
+        alpha = (1 - self.confidence) / 2
+        lo, hi = np.quantile(means, [alpha, 1 - alpha], axis=0)
+        quality_diff, saving = paired.mean(axis=0)
+
+        result = {
+            "paired": n,
+            "quality_diff": self._round(quality_diff, 4),
+            "quality_diff_ci": [self._round(lo[0], 4), self._round(hi[0], 4)],
+            "p_non_inferior": self._round(np.mean(means[:, 0] >= -floor), 4),
+            "saving_per_trace": self._round(saving, 6),
+        }
+
+        if monthly_traces is not None:
+            result["monthly_savings_usd"] = self._round(saving * monthly_traces, 2)
+            result["monthly_savings_ci"] = [
+                self._round(lo[1] * monthly_traces, 2),
+                self._round(hi[1] * monthly_traces, 2),
+            ]
+
+        return result
+
+    def _recommend(self, models: List[Dict[str, Any]], baseline: Dict[str, Any]) -> Dict[str, Any]:
+        candidates = [
+            m for m in models
+            if m["model"] != BASELINE
+            and m["pareto"]
+            and m.get("p_non_inferior") is not None
+            and m["p_non_inferior"] >= self.confidence
+            and m["saving_per_trace"] > 0
+        ]
+
+        if not candidates:
+            evaluated = [m for m in models if m.get("p_non_inferior") is not None]
+            return {
+                "model": BASELINE,
+                "confidence": None,
+                "monthly_savings_usd": 0.0,
+                "reason": (
+                    "no cheaper model is non-inferior on quality"
+                    if evaluated else
+                    f"fewer than {self.min_paired_traces} paired traces per model"
+                ),
+            }
+
+        best = max(candidates, key=lambda m: m["saving_per_trace"])
+        return {
+            "model": best["model"],
+            "confidence": best["p_non_inferior"],
+            "monthly_savings_usd": best.get("monthly_savings_usd"),
+            "quality_diff": best["quality_diff"],
+            "reason": (
+                f"quality within {self.quality_margin:.0%} of baseline "
+                f"({baseline['avg_quality'] or 0:.2f}) at lower cost"
+            ),
+        }
+
+    # ---------- HELPERS ----------
+
+    @staticmethod
+    def _nanmean(values: np.ndarray) -> Optional[float]:
+        values = values[~np.isnan(values)]
+        return float(values.mean()) if len(values) else None
+
+    @staticmethod
+    def _round(value: Optional[float], digits: int) -> Optional[float]:
+        if value is None or not np.isfinite(value):
+            return None
+        return round(float(value), digits)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Pareto frontier, bootstrap CIs and model recommendations per agent"
+    )
+    parser.add_argument("--db", default="metrics.db", help="Metric store path")
+    parser.add_argument("--config", help="config.yaml for the analysis section")
+    parser.add_argument("--agent", action="append", help="Limit to these agents")
+    parser.add_argument("--window-days", type=float, help="Days covered by the evaluations")
+    parser.add_argument("--run-id", help="Only evaluations written by this scheduler run")
+    parser.add_argument("--output", help="Write the JSON here instead of stdout")
+
+    args = parser.parse_args()
+
+    config: Dict[str, Any] = {}
+    if args.config:
+        import yaml
+        with open(args.config, "r") as f:
+            config = yaml.safe_load(f)
+
+    frame = EvaluationFrame.from_store(EvalMetricStore(args.db), args.agent, args.run_id)
+    result = ModelAnalyzer.from_config(config).analyze(frame, args.window_days)
+
+    payload = json.dumps(result, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(payload)
+        print(f"[ModelAnalyzer] Recommendations written to {args.output}")
+    else:
+        print(payload)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,152 @@
+import os
+import httpx
+import requests
+from requests.adapters import HTTPAdapter
+from typing import Any, Dict, Optional, Tuple
+from dotenv import load_dotenv
+from portkey_ai import Portkey
+
+from cassette import Cassette
+
+load_dotenv()
+
+DEFAULT_BASE_URL = "https://api.portkey.ai/v1"
+
+
+class PortkeyClientFactory:
+    """
+    Builds a single pooled Portkey client and a pooled HTTP session
+    (for signed-URL downloads) that every component shares.
+
+    Reads the optional `http` section of config.yaml:
+
+        http:
+          max_connections: 20
+          max_keepalive_connections: 10
+          keepalive_expiry: 30
+          connect_timeout: 10
+          read_timeout: 120
+
+    With a `cassette`, the client's transport and the session's adapter
+    record or replay every request (see cassette.py).
+    """
+
+    def __init__(
+        self,
+        http_cfg: Optional[Dict[str, Any]] = None,
+        api_key: Optional[str] = None,
+        base_url: Optional[str] = None,
+        cassette: Optional[Cassette] = None,
+    ):
+        cfg = http_cfg or {}
+
+        self.api_key = api_key or os.getenv("PORTKEY_API_KEY")
+        self.base_url = (
+            base_url
+            or cfg.get("base_url")
+            or os.getenv("PORTKEY_BASE_URL")
+            or DEFAULT_BASE_URL
+        )
+
+        self.max_connections: int = int(cfg.get("max_connections", 20))
+        self.max_keepalive_connections: int = int(
+            cfg.get("max_keepalive_connections", 10)
+        )
+        self.keepalive_expiry: float = float(cfg.get("keepalive_expiry", 30))
+        self.connect_timeout: float = float(cfg.get("connect_timeout", 10))
+        self.read_timeout: float = float(cfg.get("read_timeout", 120))
+
+        self.cassette = cassette
+
+        self._http_client: Optional[httpx.Client] = None
+        self._client: Optional[Portkey] = None
+        self._session: Optional[requests.Session] = None
+
+    @classmethod
+    def from_config(cls, config: Dict[str, Any]) -> "PortkeyClientFactory":
+        return cls(
+            http_cfg=config.get("http", {}),
+            cassette=Cassette.from_config(config),
+        )
+
+    # ---------- CLIENTS ----------
+
+    @property
+    def timeout(self) -> Tuple[float, float]:
+        """
+        (connect, read) timeout in seconds, as accepted by requests.
+        """
+        return (self.connect_timeout, self.read_timeout)
+
+    def get_client(self) -> Portkey:
+        """
+        Return the shared Portkey client, creating it on first use.
+        """
+        if self._client is None:
+            limits = httpx.Limits(
+                max_connections=self.max_connections,
+                max_keepalive_connections=self.max_keepalive_connections,
+                keepalive_expiry=self.keepalive_expiry,
+            )
+
+            ## A custom transport ignores Client(limits=...), so the pooled
+            ## transport is built explicitly and wrapped.
+            transport = None
+            if self.cassette is not None:
+                transport = self.cassette.transport(httpx.HTTPTransport(limits=limits))
+
+            self._http_client = httpx.Client(
+                base_url=self.base_url,
+                headers={"Accept": "application/json"},
+                limits=limits,
+                transport=transport,
+                timeout=httpx.Timeout(
+                    self.read_timeout,
+                    connect=self.connect_timeout,
+                ),
+            )
+
+            self._client = Portkey(
+                api_key=self.api_key,
+                base_url=self.base_url,
+                http_client=self._http_client,
+                request_timeout=int(self.read_timeout),
+            )
+
+            print(
+                f"[PortkeyClientFactory] Created pooled client "
+                f"max_connections={self.max_connections} "
+                f"keepalive={self.max_keepalive_connections}"
+            )
+
+        return self._client
+
+    def get_session(self) -> requests.Session:
+        """
+        Return the shared keep-alive session used for file downloads.
+        """
+        if self._session is None:
+            pool = {
+                "pool_connections": self.max_connections,
+                "pool_maxsize": self.max_connections,
+            }
+            adapter = (
+                self.cassette.adapter(**pool)
+                if self.cassette is not None
+                else HTTPAdapter(**pool)
+            )
+            self._session = requests.Session()
+            self._session.mount("https://", adapter)
+            self._session.mount("http://", adapter)
+
+        return self._session
+
+    def close(self) -> None:
+        if self._http_client is not None:
+            self._http_client.close()
+        if self._session is not None:
+            self._session.close()
+
+        self._http_client = None
+        self._client = None
+        self._session = None
@@ -0,0 +1,402 @@
+import json
+import os
+import sys
+import threading
+import time
+import tracemalloc
+from typing import Any, Dict, List, Optional, Tuple
+
+## Frames of this module (and what they call) are reported as overhead.
+_THIS_FILE = os.path.abspath(__file__)
+OVERHEAD_LABEL = "[profiler overhead]"
+
+## Allocations made by the profiler itself are not reported.
+_SNAPSHOT_FILTERS = [
+    tracemalloc.Filter(False, tracemalloc.__file__),
+    tracemalloc.Filter(False, _THIS_FILE),
+]
+
+
+class _Active:
+    """
+    One open span on one thread.
+    """
+
+    __slots__ = ("name", "depth", "wall", "cpu", "traced", "peak", "snapshot")
+
+    def __init__(self, name: str, depth: int):
+        self.name = name
+        self.depth = depth
+        self.wall = time.perf_counter()
+        self.cpu = time.thread_time()
+        self.traced = 0
+        ## Highest traced memory seen before the last tracemalloc peak reset.
+        self.peak = 0
+        self.snapshot: Optional[tracemalloc.Snapshot] = None
+
+
+class StageStats:
+    __slots__ = (
+        "calls", "wall_s", "cpu_s", "samples", "peak_traced", "net_traced",
+        "self_samples", "total_samples", "alloc_sites",
+    )
+
+    def __init__(self):
+        self.calls = 0
+        self.wall_s = 0.0
+        self.cpu_s = 0.0
+        self.samples = 0
+        self.peak_traced = 0
+        self.net_traced = 0
+        self.self_samples: Dict[str, int] = {}
+        self.total_samples: Dict[str, int] = {}
+        ## site -> [size_diff, count_diff]
+        self.alloc_sites: Dict[str, List[int]] = {}
+
+
+class Profiler:
+    """
+    Per-stage CPU and allocation profile of a run.
+
+    Stages are the Telemetry spans the pipeline already opens (export,
+    replay, judge, db.write, report, ...). A background thread samples
+    the stacks of every thread inside a span every `interval_ms`, so
+    nested spans and worker threads are attributed to the innermost
+    stage of the thread they run on. Each stage also gets the thread CPU
+    time spent inside it (vs wall time: CPU-bound or waiting) and, with
+    tracemalloc, the peak traced memory while it was open. Spans of the
+    run's thread nested at most `snapshot_depth` deep (run = 0) also get
+    the allocation sites that grew during them, for their first
+    `snapshots_per_stage` occurrences only (snapshots are too slow for
+    per-call spans). Allocation figures are process-wide, so concurrent
+    stages share them.
+
+    Reads the optional `profile` section of config.yaml:
+
+        profile:
+          interval_ms: 10
+          top_n: 25
+          tracemalloc: true
+          tracemalloc_frames: 1
+          snapshot_depth: 2
+          snapshots_per_stage: 2
+    """
+
+    def __init__(
+        self,
+        interval_ms: float = 10,
+        top_n: int = 25,
+        trace_memory: bool = True,
+        tracemalloc_frames: int = 1,
+        snapshot_depth: int = 2,
+        snapshots_per_stage: int = 2,
+    ):
+        self.interval = interval_ms / 1000
+        self.top_n = top_n
+        self.trace_memory = trace_memory
+        self.tracemalloc_frames = tracemalloc_frames
+        self.snapshot_depth = snapshot_depth
+        self.snapshots_per_stage = snapshots_per_stage
+
+        self._lock = threading.Lock()
+        ## thread id -> open spans, outermost first. Lists are only
+        ## appended/popped by their own thread; the sampler copies them.
+        ## Entries are added and removed under the lock, so threads that
+        ## finished their spans do not accumulate.
+        self._stacks: Dict[int, List[_Active]] = {}
+        self._labels: Dict[Any, str] = {}
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._started_tracemalloc = False
+        self._owner: Optional[int] = None
+        self.reset()
+
+    @classmethod
+    def from_config(cls, config: Dict[str, Any]) -> "Profiler":
+        cfg = config.get("profile") or {}
+        return cls(
+            interval_ms=float(cfg.get("interval_ms", 10)),
+            top_n=int(cfg.get("top_n", 25)),
+            trace_memory=bool(cfg.get("tracemalloc", True)),
+            tracemalloc_frames=int(cfg.get("tracemalloc_frames", 1)),
+            snapshot_depth=int(cfg.get("snapshot_depth", 2)),
+            snapshots_per_stage=int(cfg.get("snapshots_per_stage", 2)),
+        )
+
+    def reset(self) -> None:
+        with self._lock:
+            self.stages: Dict[str, StageStats] = {}
+            self.collapsed: Dict[Tuple[str, ...], int] = {}
+            self._snapshots: Dict[str, int] = {}
+            self.sample_rounds = 0
+            self.started_at = time.time()
+            self.duration_s = 0.0
+
+    # ---------- LIFECYCLE ----------
+
+    def start(self) -> None:
+        self.reset()
+        self._owner = threading.get_ident()
+
+        if self.trace_memory and not tracemalloc.is_tracing():
+            tracemalloc.start(self.tracemalloc_frames)
+            self._started_tracemalloc = True
+
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._sample_loop, name="profiler", daemon=True)
+        self._thread.start()
+
+        print(
+            f"[Profiler] Sampling every {self.interval * 1000:g}ms "
+            f"tracemalloc={tracemalloc.is_tracing()}"
+        )
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+        if self._started_tracemalloc:
+            tracemalloc.stop()
+            self._started_tracemalloc = False
+
+        self.duration_s = time.time() - self.started_at
+
+    # ---------- SPAN HOOKS ----------
+
+    def enter(self, name: str) -> _Active:
+        with self._lock:
+            stack = self._stacks.setdefault(threading.get_ident(), [])
+        active = _Active(name, len(stack))
+
+        if tracemalloc.is_tracing():
+            active.traced = tracemalloc.get_traced_memory()[0]
+            ## Snapshots are costly: only the run's own thread, shallow
+            ## spans, and the first few occurrences of each stage.
+            if (
+                active.depth <= self.snapshot_depth
+                and threading.get_ident() == self._owner
+                and self._snapshots.get(name, 0) < self.snapshots_per_stage
+            ):
+                self._snapshots[name] = self._snapshots.get(name, 0) + 1
+                active.snapshot = tracemalloc.take_snapshot().filter_traces(_SNAPSHOT_FILTERS)
+            ## After the snapshot, so building it is not part of the peak.
+            self._reset_peak()
+
+        stack.append(active)
+        return active
+
+    def exit(self, active: _Active) -> None:
+        thread_id = threading.get_ident()
+        stack = self._stacks.get(thread_id)
+        if stack and stack[-1] is active:
+            stack.pop()
+        if not stack:
+            with self._lock:
+                self._stacks.pop(thread_id, None)
+
+        wall = time.perf_counter() - active.wall
+        cpu = time.thread_time() - active.cpu
+
+        traced = 0
+        peak = 0
+        diff = None
+        if tracemalloc.is_tracing():
+            traced, peak = tracemalloc.get_traced_memory()
+            if active.snapshot is not None:
+                diff = (
+                    tracemalloc.take_snapshot()
+                    .filter_traces(_SNAPSHOT_FILTERS)
+                    .compare_to(active.snapshot, "lineno")
+                )
+
+        with self._lock:
+            stats = self.stages.setdefault(active.name, StageStats())
+            stats.calls += 1
+            stats.wall_s += wall
+            stats.cpu_s += cpu
+            stats.peak_traced = max(stats.peak_traced, peak, active.peak)
+            stats.net_traced += traced - active.traced
+
+            for entry in (diff or [])[: self.top_n * 4]:
+                if entry.size_diff <= 0:
+                    continue
+                frame = entry.traceback[0]
+                site = f"{self._short_path(frame.filename)}:{frame.lineno}"
+                totals = stats.alloc_sites.setdefault(site, [0, 0])
+                totals[0] += entry.size_diff
+                totals[1] += entry.count_diff
+
+    def _reset_peak(self) -> None:
+        """
+        Start a new tracemalloc peak for the span being entered. The peak
+        reached so far is first folded into every open span (on any
+        thread), so an outer span keeps the peak of its whole lifetime.
+        """
+        with self._lock:
+            peak = tracemalloc.get_traced_memory()[1]
+            for stack in self._stacks.values():
+                for active in list(stack):
+                    active.peak = max(active.peak, peak)
+            tracemalloc.reset_peak()
+
+    # ---------- SAMPLING ----------
+
+    @staticmethod
+    def _short_path(filename: str) -> str:
+        marker = "site-packages" + os.sep
+        if marker in filename:
+            return filename.split(marker, 1)[1]
+        return os.path.basename(filename)
+
+    def _label(self, code) -> str:
+        label = self._labels.get(code)
+        if label is None:
+            label = f"{self._short_path(code.co_filename)}:{code.co_name}:{code.co_firstlineno}"
+            self._labels[code] = label
+        return label
+
+    def _sample_loop(self) -> None:
+        me = threading.get_ident()
+
+        while not self._stop.wait(self.interval):
+            frames = sys._current_frames()
+            with self._lock:
+                stacks = list(self._stacks.items())
+
+            samples = []
+            for thread_id, stack in stacks:
+                if thread_id == me or not stack:
+                    continue
+                frame = frames.get(thread_id)
+                if frame is None:
+                    continue
+
+                stages = tuple(active.name for active in list(stack))
+                if not stages:
+                    continue
+
+                code_stack = []
+                while frame is not None:
+                    ## Inside the profiler's own hooks (snapshots): charge
+                    ## the time to a single overhead frame.
+                    if frame.f_code.co_filename == _THIS_FILE:
+                        code_stack.clear()
+                    code_stack.append(frame.f_code)
+                    frame = frame.f_back
+                code_stack.reverse()
+
+                labels = [
+                    OVERHEAD_LABEL if code.co_filename == _THIS_FILE else self._label(code)
+                    for code in code_stack
+                ]
+                samples.append((stages, labels))
+
+            with self._lock:
+                self.sample_rounds += 1
+
+                for stages, labels in samples:
+                    stats = self.stages.setdefault(stages[-1], StageStats())
+                    stats.samples += 1
+                    if labels:
+                        leaf = labels[-1]
+                        stats.self_samples[leaf] = stats.self_samples.get(leaf, 0) + 1
+                        for label in set(labels):
+                            stats.total_samples[label] = stats.total_samples.get(label, 0) + 1
+
+                    key = stages + tuple(labels)
+                    self.collapsed[key] = self.collapsed.get(key, 0) + 1
+
+    # ---------- OUTPUT ----------
+
+    def summary(self) -> Dict[str, Any]:
+        with self._lock:
+            stages = {}
+            for name, stats in sorted(
+                self.stages.items(), key=lambda item: item[1].wall_s, reverse=True
+            ):
+                hot = sorted(stats.self_samples.items(), key=lambda kv: kv[1], reverse=True)
+                cumulative = sorted(stats.total_samples.items(), key=lambda kv: kv[1], reverse=True)
+                sites = sorted(stats.alloc_sites.items(), key=lambda kv: kv[1][0], reverse=True)
+
+                stages[name] = {
+                    "calls": stats.calls,
+                    "wall_s": round(stats.wall_s, 4),
+                    "cpu_s": round(stats.cpu_s, 4),
+                    "samples": stats.samples,
+                    "peak_traced_mb": round(stats.peak_traced / 2**20, 3),
+                    "net_traced_mb": round(stats.net_traced / 2**20, 3),
+                    "hot_functions": [
+                        {
+                            "function": label,
+                            "self_s": round(count * self.interval, 4),
+                            "total_s": round(stats.total_samples.get(label, 0) * self.interval, 4),
+                        }
+                        for label, count in hot[: self.top_n]
+                    ],
+                    "cumulative_functions": [
+                        {"function": label, "total_s": round(count * self.interval, 4)}
+                        for label, count in cumulative[: self.top_n]
+                    ],
+                    "allocation_sites": [
+                        {"site": site, "size_kb": round(size / 1024, 1), "count": count}
+                        for site, (size, count) in sites[: self.top_n]
+                    ],
+                }
+
+            return {
+                "started_at": self.started_at,
+                "duration_s": round(self.duration_s, 3),
+                "interval_ms": self.interval * 1000,
+                "sample_rounds": self.sample_rounds,
+                "tracemalloc": self.trace_memory,
+                "stages": stages,
+            }
+
+    def write(self, output_dir: str) -> Dict[str, str]:
+        """
+        Write summary.json, stages.txt (top-N per stage) and collapsed.txt
+        (collapsed stacks, one "stage;...;frame count" line each, as read
+        by flamegraph.pl, speedscope and inferno).
+        """
+        os.makedirs(output_dir, exist_ok=True)
+        summary = self.summary()
+
+        paths = {
+            "summary": os.path.join(output_dir, "summary.json"),
+            "stages": os.path.join(output_dir, "stages.txt"),
+            "collapsed": os.path.join(output_dir, "collapsed.txt"),
+        }
+
+        with open(paths["summary"], "w", encoding="utf-8") as f:
+            json.dump(summary, f, indent=2)
+
+        with open(paths["stages"], "w", encoding="utf-8") as f:
+            f.write(
+                f"Profile: {summary['duration_s']}s, {summary['sample_rounds']} sample rounds "
+                f"every {summary['interval_ms']:g}ms\n"
+            )
+            for name, stage in summary["stages"].items():
+                f.write(
+                    f"\n== {name}  calls={stage['calls']} wall={stage['wall_s']}s "
+                    f"cpu={stage['cpu_s']}s peak={stage['peak_traced_mb']}MB "
+                    f"net={stage['net_traced_mb']}MB\n"
+                )
+                if stage["hot_functions"]:
+                    f.write(f"  {'self_s':>9} {'total_s':>9}  function\n")
+                    for fn in stage["hot_functions"]:
+                        f.write(f"  {fn['self_s']:>9} {fn['total_s']:>9}  {fn['function']}\n")
+                if stage["allocation_sites"]:
+                    f.write(f"  {'size_kb':>9} {'count':>9}  allocation site\n")
+                    for site in stage["allocation_sites"]:
+                        f.write(f"  {site['size_kb']:>9} {site['count']:>9}  {site['site']}\n")
+
+        with self._lock:
+            collapsed = sorted(self.collapsed.items())
+        with open(paths["collapsed"], "w", encoding="utf-8") as f:
+            for stack, count in collapsed:
+                f.write(";".join(part.replace(";", ":") for part in stack) + f" {count}\n")
+
+        print(f"[Profiler] Profile written to {output_dir} ({len(summary['stages'])} stages)")
+        return paths
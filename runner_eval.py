@@ -1,14 +1,88 @@
 from portkey_ai import Portkey
 import json
 import os
+import threading
+import time
 import yaml
 from dotenv import load_dotenv
 from pathlib import Path
-from typing import Dict, Any, List
+from datetime import datetime, timezone
+from typing import Callable, Dict, Any, List, Optional
+from portkey_client import PortkeyClientFactory
+from call_policy import CallPolicy
+from circuit_breaker import CircuitBreakerRegistry
+from batch_client import BatchClient
+from eval_metric_store import EvalMetricStore
+from telemetry import Telemetry
+from trace_batch import TraceBatch
 
 load_dotenv()
 
 
+class StreamedCompletion:
+    """
+    A fully consumed completion stream: usage (when the provider sends it)
+    and client-side timing. Content is not kept: judging reads the logged
+    output from the eval export, like non-streamed replays.
+    """
+
+    def __init__(self):
+        self.usage: Any = None
+        self.chunks = 0
+        self.ttft_seconds: Optional[float] = None
+        self.inter_token_seconds: Optional[float] = None
+        self.total_seconds = 0.0
+
+    @property
+    def tokens_per_second(self) -> Optional[float]:
+        """
+        Output throughput after the first token.
+        """
+        tokens = getattr(self.usage, "completion_tokens", None) or self.chunks
+        generating = self.total_seconds - (self.ttft_seconds or 0)
+        return tokens / generating if generating > 0 else None
+
+    @classmethod
+    def consume(cls, stream: Any, started: float) -> "StreamedCompletion":
+        """
+        Read `stream` to the end; `started` is perf_counter() taken just
+        before the request was sent.
+        """
+        result = cls()
+        last = None
+        gaps = 0.0
+
+        try:
+            for chunk in stream:
+                now = time.perf_counter()
+
+                if getattr(chunk, "usage", None):
+                    result.usage = chunk.usage
+
+                for choice in chunk.choices or []:
+                    piece = getattr(choice.delta, "content", None)
+                    if not piece:
+                        continue
+
+                    if last is None:
+                        result.ttft_seconds = now - started
+                    else:
+                        gaps += now - last
+                    last = now
+
+                    result.chunks += 1
+        finally:
+            close = getattr(stream, "close", None)
+            if callable(close):
+                close()
+
+        result.total_seconds = time.perf_counter() - started
+        if result.chunks > 1:
+            result.inter_token_seconds = gaps / (result.chunks - 1)
+
+        return result
+
+
 class EvalRunner:
     def __init__(
         self,
@@ -16,62 +90,75 @@ class EvalRunner:
         team_id: str,
         agent_id: str,
         log_file_path: str,
+        portkey: Optional[Portkey] = None,
+        call_policy: Optional[CallPolicy] = None,
+        breakers: Optional[CircuitBreakerRegistry] = None,
+        telemetry: Optional[Telemetry] = None,
+        models: Optional[List[str]] = None,
+        batch_client: Optional[BatchClient] = None,
+        metric_store: Optional[EvalMetricStore] = None,
+        config: Optional[Dict[str, Any]] = None,
+        batch_output_file: Optional[Callable[[str], str]] = None,
+        batch_cost: Optional[Callable[[str, float, float], float]] = None,
+        run_id: Optional[str] = None,
     ):
-        self.config = self._load_config(config_path)
+        ## An already parsed config (the scheduler's) skips re-reading the file.
+        self.config = config or self._load_config(config_path)
+        self.telemetry = telemetry or Telemetry()
 
         self.team_id = team_id
         self.agent_id = agent_id
         self.log_file_path = log_file_path
 
-        self.models: List[str] = self.config["models"]
+        ## Defaults to every configured model; the cost planner may pass fewer.
+        self.models: List[str] = models if models is not None else self.config["models"]
 
         ## This varies per agent.
         self.system_prompt: str = self.config["agents"][self.agent_id]["system_prompt_for_runners"]
 
-        # Placeholder for now (will be wired later)
-        ## Pick this from the logs. The request content.
-        ## This data is in file of jsonl and we need to extract the fields.
-        self.inputs: List[str] = self._extract_inputs_from_logs()
+        ## Loaded by run(); streaming callers pass chunks to run_batch().
+        self.traces: Optional[TraceBatch] = None
 
-        self.portkey = Portkey(
-            api_key=os.getenv("PORTKEY_API_KEY")
-        )
+        self.portkey = portkey or PortkeyClientFactory.from_config(
+            self.config
+        ).get_client()
+
+        self.call_policy = call_policy or CallPolicy.from_config(self.config)
+
+        self.breakers = breakers or CircuitBreakerRegistry.from_config(self.config)
+
+        ## When set, replays go through the offline batch API instead.
+        ## Their results are appended, as export rows paired with the
+        ## source trace, to batch_output_file(model); batch_cost(model,
+        ## prompt_tokens, completion_tokens) prices them.
+        self.batch_client = batch_client
+        self.batch_output_file = batch_output_file
+        self.batch_cost = batch_cost
+        self._batch_write_lock = threading.Lock()
+
+        ## Streaming replay: consume the completion stream and record
+        ## TTFT / inter-token latency / throughput per call.
+        self.stream: bool = (self.config.get("replay") or {}).get("stream", False)
+        self.metric_store = metric_store
+        ## Stamped on stored streaming metrics; queue workers pass it per task.
+        self.run_id = run_id
+        self.stream_metrics: List[Dict[str, Any]] = []
+        self._stream_lock = threading.Lock()
+
+        self.skipped: List[Dict[str, Any]] = []
 
 
 # ------------------------------ LOG PARSING --------------------
 
-    def _extract_inputs_from_logs(self) -> List[str]:
+    def _load_traces(self) -> TraceBatch:
         """
-        Extract request message content from JSONL logs.
+        Index traces from the export; request message content is read
+        lazily per input.
 
         Path:
         request -> messages -> [1] -> content
         """
-        inputs: List[str] = []
-
-        log_path = Path(self.log_file_path)
-        if not log_path.exists():
-            raise FileNotFoundError(f"Log file not found: {log_path}")
-
-        with log_path.open("r", encoding="utf-8") as f:
-            for line_no, line in enumerate(f, start=1):
-                try:
-                    entry = json.loads(line)
-                    content = (
-                        entry["request"]["messages"][1]["content"]
-                    )
-                    inputs.append(content)
-                except Exception as e:
-                    print(
-                        f"[EvalRunner] Skipping line {line_no}: {e}"
-                    )
-
-        print(
-            f"[EvalRunner] Extracted {len(inputs)} inputs"
-            f"from {self.log_file_path}"
-        )
-
-        return inputs
+        return TraceBatch.from_log_file(self.log_file_path)
 
 
     # ---------- CONFIG ----------
@@ -87,9 +174,11 @@ class EvalRunner:
 
     # ---------- CORE LOGIC ----------
 
-    def run(self) -> None:
+    def run(self) -> List[Dict[str, Any]]:
         """
         Run evals across all models.
+
+        Returns the inputs that were skipped, each with the reason.
         """
         print(
             f"[EvalRunner] team={self.team_id} "
@@ -97,46 +186,392 @@ class EvalRunner:
             f"models={len(self.models)}"
         )
 
-        for model in self.models:
-            self._run_for_model(model)
-        
+        # Placeholder for now (will be wired later)
+        ## Pick this from the logs. The request content.
+        ## This data is in file of jsonl and we need to extract the fields.
+        with self.telemetry.span("replay.parse", agent=self.agent_id) as span:
+            self.traces = self._load_traces()
+            span["rows"] = len(self.traces)
+
+        return self.run_batch(self.traces)
+
+    def run_batch(self, traces: TraceBatch) -> List[Dict[str, Any]]:
+        """
+        Replay one batch of traces (a whole export or a single chunk)
+        across all models. Skips accumulate over calls.
+        """
+        if self.batch_client is not None:
+            with traces:
+                self._run_batch_api(traces)
+            return self.skipped
+
+        ## Inputs held back while a breaker was open; retried after all
+        ## models. Kept per batch so chunks can be replayed concurrently.
+        deferred: List[Dict[str, Any]] = []
+
+        with traces:
+            for model in self.models:
+                self._run_for_model(model, traces, deferred)
 
+            self._run_deferred(traces, deferred)
 
-    def _run_for_model(self, model: str) -> None:
+        self._flush_stream_metrics()
+
+        return self.skipped
+
+    def _run_for_model(
+        self,
+        model: str,
+        traces: TraceBatch,
+        deferred: List[Dict[str, Any]],
+    ) -> None:
         print(f"[EvalRunner] Running model={model}")
 
-        for idx, input_data in enumerate(self.inputs, start=1):
-            self._process_input(model, idx, input_data)
+        for idx, trace in enumerate(traces, start=traces.start + 1):
+            allowed, reason = self.breakers.allow(model)
+            if not allowed:
+                deferred.append({"model": model, "index": idx})
+                continue
 
-    def _process_input(
+            self._guarded_process_input(model, idx, trace.input, trace.trace_id)
+
+    def _run_deferred(
+        self,
+        traces: TraceBatch,
+        deferred: List[Dict[str, Any]],
+    ) -> None:
+        """
+        Give deferred inputs one more chance once every other model has
+        run; by then an open breaker may have cooled down to half-open.
+        """
+        if not deferred:
+            return
+
+        print(f"[EvalRunner] Retrying {len(deferred)} deferred inputs")
+
+        for item in deferred:
+            model = item["model"]
+            allowed, reason = self.breakers.allow(model)
+            if not allowed:
+                self._skip(model, item["index"], reason)
+                continue
+
+            trace = traces[item["index"] - traces.start - 1]
+            self._guarded_process_input(
+                model, item["index"], trace.input, trace.trace_id
+            )
+
+    def _guarded_process_input(
         self,
         model: str,
         index: int,
         input_data: Dict[str, Any],
+        trace_id: Optional[str] = None,
     ) -> None:
-        payload = json.dumps(input_data)
+        if input_data is None:
+            self._skip(model, index, "missing input in export")
+            return
 
-        ##TODO: Fix this hack: As these are the Eval Logs, we don't want to mix this with team's agentic logs. 
-        ## So for now proceeding with team and agent as eval.
+        start = time.monotonic()
+        try:
+            self._process_input(model, index, input_data, trace_id)
+        except Exception as e:
+            self.breakers.record_failure(model, str(e))
+            self._skip(model, index, f"error: {e}")
+            return
 
-        response = self.portkey.with_options(
-            metadata={
-                "_user": "Rithvik",
-                "environment": "dev",
-                "feature": "eval",
-                "team": "portkey",
+        self.breakers.record_success(model, time.monotonic() - start)
+
+    def _skip(self, model: str, index: int, reason: str) -> None:
+        print(
+            f"[EvalRunner] Skipped model={model} input=#{index}: {reason}"
+        )
+        self.skipped.append(
+            {
                 "agent": self.agent_id,
                 "model": model,
+                "index": index,
+                "reason": reason,
             }
-        ).chat.completions.create(
-            messages=[
-                {"role": "system", "content": self.system_prompt},
-                {"role": "user", "content": payload},
-            ],
-            model=model,
         )
 
+    def _process_input(
+        self,
+        model: str,
+        index: int,
+        input_data: Dict[str, Any],
+        trace_id: Optional[str] = None,
+        run_id: Optional[str] = None,
+    ) -> Any:
+        payload = json.dumps(input_data)
+
+        options: Dict[str, Any] = {"metadata": self._eval_metadata(model, trace_id)}
+        if trace_id:
+            ## Reuse the production trace id so the judged export row, the
+            ## baseline it replays and the streaming metrics below land on
+            ## the same trace.
+            options["trace_id"] = trace_id
+
+        client = self.portkey.with_options(**options)
+
+        with self.telemetry.span(
+            "replay.completion", agent=self.agent_id, model=model, index=index
+        ):
+            start = time.perf_counter()
+            if self.stream:
+                response = self.call_policy.call(
+                    model,
+                    lambda timeout: self._stream_completion(
+                        client, model, payload, timeout
+                    ),
+                )
+            else:
+                response = self.call_policy.call(
+                    model,
+                    lambda timeout: client.chat.completions.create(
+                        messages=self._messages(payload),
+                        model=model,
+                        timeout=timeout,
+                    ),
+                )
+
+        self.telemetry.record_llm_call(
+            "replay", model, response, time.perf_counter() - start,
+            agent=self.agent_id,
+        )
+
+        if self.stream:
+            self._record_stream(model, trace_id, response, run_id or self.run_id)
+
         self._handle_response(model, index, response)
+        return response
+
+    def replay_one(
+        self,
+        model: str,
+        input_data: Optional[str],
+        trace_id: Optional[str] = None,
+        index: int = 0,
+        run_id: Optional[str] = None,
+    ) -> Any:
+        """
+        Replay a single input on `model`, as a queue worker does. Errors
+        propagate so the queue can retry; returns the call's usage.
+        """
+        if input_data is None:
+            raise ValueError("missing input in export")
+
+        response = self._process_input(model, index, input_data, trace_id, run_id)
+        self._flush_stream_metrics()
+        return getattr(response, "usage", None)
+
+    # ---------- STREAMING ----------
+
+    def _stream_completion(
+        self,
+        client: Portkey,
+        model: str,
+        payload: str,
+        timeout: float,
+    ) -> StreamedCompletion:
+        started = time.perf_counter()
+        stream = client.chat.completions.create(
+            messages=self._messages(payload),
+            model=model,
+            stream=True,
+            stream_options={"include_usage": True},
+            timeout=timeout,
+        )
+        return StreamedCompletion.consume(stream, started)
+
+    def _record_stream(
+        self,
+        model: str,
+        trace_id: Optional[str],
+        result: StreamedCompletion,
+        run_id: Optional[str] = None,
+    ) -> None:
+        labels = {"stage": "replay", "model": model}
+        if result.ttft_seconds is not None:
+            self.telemetry.observe("llm_ttft_seconds", result.ttft_seconds, **labels)
+        if result.inter_token_seconds is not None:
+            self.telemetry.observe(
+                "llm_inter_token_seconds", result.inter_token_seconds, **labels
+            )
+
+        if not trace_id:
+            return
+
+        def ms(seconds: Optional[float]) -> Optional[float]:
+            return seconds * 1000 if seconds is not None else None
+
+        with self._stream_lock:
+            self.stream_metrics.append({
+                "trace_id": trace_id,
+                "agent": self.agent_id,
+                "model": model,
+                "ttft_ms": ms(result.ttft_seconds),
+                "inter_token_ms": ms(result.inter_token_seconds),
+                "tokens_per_second": result.tokens_per_second,
+                "run_id": run_id,
+            })
+
+    def _flush_stream_metrics(self) -> None:
+        """
+        Write collected streaming metrics when a metric store was given;
+        otherwise they stay on `stream_metrics`.
+        """
+        if self.metric_store is None:
+            return
+
+        with self._stream_lock:
+            rows, self.stream_metrics = self.stream_metrics, []
+
+        if rows:
+            self.metric_store.upsert_stream_metrics(rows)
+
+    def _eval_metadata(
+        self,
+        model: Optional[str] = None,
+        source_trace_id: Optional[str] = None,
+    ) -> Dict[str, Any]:
+        ##TODO: Fix this hack: As these are the Eval Logs, we don't want to mix this with team's agentic logs. 
+        ## So for now proceeding with team and agent as eval.
+        metadata = {
+            "_user": "Rithvik",
+            "environment": "dev",
+            "feature": "eval",
+            "team": "portkey",
+            "agent": self.agent_id,
+        }
+        if model is not None:
+            metadata["model"] = model
+        if source_trace_id:
+            ## Read back from the export (TraceBatch.source_trace_ids) to pair
+            ## the replay with its baseline trace.
+            metadata["source_trace_id"] = source_trace_id
+        return metadata
+
+    def _messages(self, payload: str) -> List[Dict[str, str]]:
+        return [
+            {"role": "system", "content": self.system_prompt},
+            {"role": "user", "content": payload},
+        ]
+
+    # ---------- BATCH API ----------
+
+    @staticmethod
+    def _batch_custom_id(index: int, model: str, trace_id: str) -> str:
+        ## Models may contain ":" but not "|"; the trace id goes last.
+        return f"{index}:{model}|{trace_id}"
+
+    @staticmethod
+    def _parse_batch_custom_id(custom_id: str) -> tuple:
+        head, _, trace_id = custom_id.partition("|")
+        index, model = head.split(":", 1)
+        return int(index), model, trace_id
+
+    def _run_batch_api(self, traces: TraceBatch) -> None:
+        """
+        Submit every (input, model) pair of this batch as one offline job.
+        Breakers and retries do not apply; failed requests are skipped.
+
+        Portkey log metadata is per job (headers), so the logs cannot tell
+        which baseline trace a request replayed. The source trace id
+        travels in each custom_id instead and the replays are written from
+        the batch output (see batch_output_file).
+        """
+        requests = []
+
+        for idx, trace in enumerate(traces, start=traces.start + 1):
+            input_data = trace.input
+            if input_data is None:
+                for model in self.models:
+                    self._skip(model, idx, "missing input in export")
+                continue
+
+            messages = self._messages(json.dumps(input_data))
+            for model in self.models:
+                requests.append(BatchClient.request(
+                    self._batch_custom_id(idx, model, trace.trace_id), model, messages,
+                ))
+
+        print(
+            f"[EvalRunner] Submitting {len(requests)} replays "
+            f"agent={self.agent_id} via batch API"
+        )
+
+        ## Model is left out of the metadata: one job spans many models and
+        ## exports already filter on ai_model.
+        results = self.batch_client.run(
+            f"replay-{self.agent_id}-{traces.start}",
+            requests,
+            metadata=self._eval_metadata(),
+            stage="replay",
+        )
+
+        replayed: Dict[str, List[Dict[str, Any]]] = {}
+
+        for req in requests:
+            result = results[req["custom_id"]]
+            index, model, trace_id = self._parse_batch_custom_id(req["custom_id"])
+
+            if result.error:
+                self._skip(model, index, f"batch error: {result.error}")
+                continue
+
+            usage = result.body.get("usage") or {}
+            self.telemetry.inc("llm_calls_total", stage="replay", model=model)
+            self.telemetry.record_tokens("replay", model, usage, agent=self.agent_id)
+
+            replayed.setdefault(model, []).append(
+                self._batch_export_row(model, trace_id, req["body"], result.body, usage)
+            )
+            self._handle_response(model, index, result.body)
+
+        self._write_batch_replays(replayed)
+
+    def _batch_export_row(
+        self,
+        model: str,
+        source_trace_id: str,
+        request: Dict[str, Any],
+        response: Dict[str, Any],
+        usage: Dict[str, Any],
+    ) -> Dict[str, Any]:
+        """
+        A replay in the shape of a Portkey export row. Batch output has
+        no per-request latency, so response_time is left out.
+        """
+        prompt = usage.get("prompt_tokens") or 0
+        completion = usage.get("completion_tokens") or 0
+
+        return {
+            "trace_id": response.get("id") or source_trace_id,
+            "created_at": datetime.now(timezone.utc).isoformat(),
+            "request": dict(request, model=model),
+            "response": response,
+            "ai_model": model.split("/")[-1],
+            "req_units": prompt,
+            "res_units": completion,
+            "total_units": prompt + completion,
+            "cost": self.batch_cost(model, prompt, completion) if self.batch_cost else None,
+            "metadata": self._eval_metadata(model, source_trace_id),
+        }
+
+    def _write_batch_replays(self, replayed: Dict[str, List[Dict[str, Any]]]) -> None:
+        if self.batch_output_file is None:
+            return
+
+        ## Appended: streaming mode replays one chunk per call, possibly
+        ## from several replay workers.
+        with self._batch_write_lock:
+            for model, rows in replayed.items():
+                path = self.batch_output_file(model)
+                os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+                with open(path, "a", encoding="utf-8") as f:
+                    for row in rows:
+                        f.write(json.dumps(row) + "\n")
 
     # ---------- RESPONSE HANDLING ----------
 
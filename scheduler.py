@@ -1,45 +1,302 @@
-from ast import List
+from contextlib import contextmanager
+from typing import Iterator, Optional
+import itertools
+import json
+import threading
 import time
+import uuid
 import yaml
 import os
 from eval_metric_store import EvalMetricStore
 from llm_judge import LLMJudge
-from log_extractor import LogExtractor
+from log_extractor import BASELINE_REQUESTED_DATA, EVAL_REQUESTED_DATA, LogExtractor
+from portkey_client import PortkeyClientFactory
+from call_policy import CallPolicy
+from circuit_breaker import CircuitBreakerRegistry
+from chunked_pipeline import ChunkedPipeline
+from cost_planner import CostPlan, CostPlanner
+from batch_client import BatchClient
+from task_queue import JUDGE, REPLAY, Task, TaskQueueBackend, default_worker_id
+from schedules import LATEST, Schedule, format_time, parse_time
+from telemetry import Telemetry
+from profiler import Profiler
 import shutil
 import argparse
 
 from runner_eval import EvalRunner
+from trace_batch import EvaluationBatch, TraceBatch
+from trace_store import TraceStore
 from html_reporter import HTMLReporter
-from datetime import datetime, timezone
+from model_analysis import EvaluationFrame, ModelAnalyzer
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
 
 
 
 class Scheduler:
-    def __init__(self, config_path: str):
-        self.config = self._load_config(config_path)
-        self.interval = self.config["scheduler"]["interval_seconds"]
+    def __init__(self, config_path: str, profile: bool = False):
+        self.config_path = config_path
+        self.config: dict = {}
+        ## --profile; profile.enabled in config turns it on as well.
+        self._profile = profile
+        self._configure(self._load_config(config_path))
+        self._config_stamp = self._config_file_stamp()
+
+        self.plans: dict[str, CostPlan] = {}
+        self.run_id = None
+
+        ## Run lease in the metric store: one run per team at a time across
+        ## every scheduler sharing the database.
+        self.lease_owner = default_worker_id()
+        self._lease_depth = 0
+        self._lease_stop: Optional[threading.Event] = None
+        ## Set by the heartbeat when renewal fails; the run stops at the
+        ## next agent or stage boundary (_check_lease).
+        self._lease_lost = threading.Event()
+
+    def _configure(self, config: dict) -> None:
+        """
+        Build components from `config`. On a reload only components whose
+        config sections changed are rebuilt; pooled clients, observed
+        latencies, breaker state and caches are otherwise kept warm.
+        """
+        self._validate(config)
+        previous = self.config
+
+        def changed(*sections: str) -> bool:
+            return not previous or any(previous.get(k) != config.get(k) for k in sections)
+
+        self.config = config
+        self.interval = self.config["scheduler"].get("interval_seconds", 86400)
         self.workspace_id = self.config["workspace"]["id"]
         self.team_id = self.config["team"]["id"]
         self.output_dir = self.config["export"]["output_dir"]
 
-        # ---- Clean start: delete output directory if exists ----
-        if os.path.exists(self.output_dir):
-            print(f"[Scheduler] Removing existing directory: {self.output_dir}")
-            shutil.rmtree(self.output_dir)
-
-        # ---- Recreate output directory ----
         os.makedirs(self.output_dir, exist_ok=True)
 
-        self.log_extractor = LogExtractor(
-            workspace_id=self.workspace_id,
-            poll_interval=5,  ## This is the time between the download status checks.
-        )
+        ## One pooled client/session shared by every component.
+        clients_changed = changed("http", "cassette")
+        if clients_changed:
+            if previous:
+                self.client_factory.close()
+            self.client_factory = PortkeyClientFactory.from_config(self.config)
+            self.portkey = self.client_factory.get_client()
+
+        if not previous:
+            self.telemetry = Telemetry.from_config(self.config)
+
+            metrics_port = (self.config.get("telemetry") or {}).get("http_port")
+            if metrics_port:
+                self.telemetry.serve(int(metrics_port))
+        elif changed("telemetry"):
+            print("[Scheduler] telemetry changes apply after a restart")
+
+        ## Shared so observed latencies (for hedging) span agents and runs.
+        if changed("call_policy"):
+            if previous:
+                self.call_policy.close()
+            self.call_policy = CallPolicy.from_config(self.config, telemetry=self.telemetry)
+
+        ## Provider/model health is shared across agents.
+        if changed("circuit_breaker"):
+            self.breakers = CircuitBreakerRegistry.from_config(self.config)
+
+        ## None unless batch_api.enabled: replay/judge via offline batch jobs.
+        if clients_changed or changed("batch_api", "task_queue"):
+            self.batch_client = BatchClient.from_config(
+                self.config, self.portkey, telemetry=self.telemetry
+            )
+
+        ## Streaming mode: read -> replay -> judge -> write per chunk.
+        self.streaming = (self.config.get("pipeline") or {}).get("streaming", False)
+        if changed("pipeline"):
+            self.pipeline = ChunkedPipeline.from_config(self.config, telemetry=self.telemetry)
+
+        ## None unless task_queue.enabled: replay and judge calls become
+        ## queued tasks run by worker.py processes; this process only
+        ## plans, waits and reports.
+        if changed("task_queue"):
+            self.task_queue = TaskQueueBackend.from_config(self.config)
+        if self.task_queue is not None:
+            print("[Scheduler] Task queue enabled: replay/judge run on workers")
+
+        ## Pre-flight spend estimate and budget enforcement per agent.
+        if changed("budget"):
+            self.cost_planner = CostPlanner.from_config(self.config)
+
+        ## Pareto / bootstrap analysis behind the per-agent recommendation.
+        if changed("analysis"):
+            self.analyzer = ModelAnalyzer.from_config(self.config)
+
+        if clients_changed or changed("export", "workspace"):
+            self.log_extractor = LogExtractor(
+                workspace_id=self.workspace_id,
+                ## This is the time between the download status checks.
+                poll_interval=self.config["export"].get("poll_interval", 5),
+                portkey=self.portkey,
+                session=self.client_factory.get_session(),
+                download_timeout=self.client_factory.timeout,
+                telemetry=self.telemetry,
+                columnar=self.config["export"].get("columnar", True),
+            )
+            ## Projected export fields per kind, optionally overridden as
+            ## export.requested_data.{baseline,eval}.
+            self.requested_data = {
+                "baseline": BASELINE_REQUESTED_DATA,
+                "eval": EVAL_REQUESTED_DATA,
+                **(self.config["export"].get("requested_data") or {}),
+            }
+
+        db_path = self.config["scheduler"].get("db_path", "metrics.db")
+        store_changed = not previous or Path(db_path) != self.EvalMetricStore.db_path
+        if store_changed:
+            self.EvalMetricStore = EvalMetricStore(db_path=db_path)
+
+        ## Re-renders only report sections whose data changed.
+        if store_changed or changed("report", "export"):
+            self.reporter = HTMLReporter.from_config(self.config, self.EvalMetricStore)
+
+        ## Per-stage CPU / allocation profile written next to the report.
+        if changed("profile"):
+            profile_cfg = self.config.get("profile") or {}
+            self.profiler = (
+                Profiler.from_config(self.config)
+                if self._profile or profile_cfg.get("enabled", False)
+                else None
+            )
+
+        self.schedules = Schedule.from_config(self.config, self.team_id)
+
+    @staticmethod
+    def _validate(config: dict) -> None:
+        """
+        Reject settings that cannot be combined.
+        """
+        if not (config.get("task_queue") or {}).get("enabled", False):
+            return
+
+        ## Workers run replay/judge one task at a time; the streaming
+        ## pipeline and batch jobs would bypass the queue.
+        if (config.get("pipeline") or {}).get("streaming", False):
+            raise ValueError("task_queue.enabled cannot be combined with pipeline.streaming")
+        if (config.get("batch_api") or {}).get("enabled", False):
+            raise ValueError("task_queue.enabled cannot be combined with batch_api.enabled")
 
-        self.EvalMetricStore = EvalMetricStore(
-            db_path="metrics.db"
+    # ---------- CONFIG RELOAD ----------
+
+    def _config_file_stamp(self) -> Optional[tuple]:
+        try:
+            stat = os.stat(self.config_path)
+        except OSError:
+            return None
+        return (stat.st_mtime_ns, stat.st_size)
+
+    def reload_config_if_changed(self) -> bool:
+        """
+        Re-read config.yaml when the file changed and apply the sections
+        that differ. An unreadable or invalid file keeps the running
+        config.
+        """
+        stamp = self._config_file_stamp()
+        if stamp is None or stamp == self._config_stamp:
+            return False
+
+        self._config_stamp = stamp
+
+        try:
+            config = self._load_config(self.config_path)
+            ## Fail before touching any component on a broken file.
+            for section in ("scheduler", "workspace", "team", "export"):
+                config[section]
+            self._validate(config)
+            Schedule.from_config(config, config["team"]["id"])
+        except Exception as e:
+            print(f"[Scheduler][ERROR] Keeping current config, reload failed: {e!r}")
+            return False
+
+        if config == self.config:
+            return False
+
+        sections = sorted(
+            k for k in set(config) | set(self.config) if config.get(k) != self.config.get(k)
         )
 
-        self.EvalMetricStore.drop_evaluations_table()
+        self._configure(config)
+
+        print(f"[Scheduler] Reloaded {self.config_path}: changed {sections}")
+        return True
+
+    # ---------- RUN LEASE ----------
+
+    def _lease_name(self) -> str:
+        return f"scheduler:{self.team_id}"
+
+    def _lease_ttl(self) -> float:
+        return float(self.config["scheduler"].get("lease_ttl_seconds", 300))
+
+    def _acquire_lease(self) -> bool:
+        """
+        Take the team's run lease (re-entrant within this process) and
+        keep it alive from a heartbeat thread until released.
+        """
+        if self._lease_depth:
+            self._lease_depth += 1
+            return True
+
+        if not self.EvalMetricStore.acquire_lease(
+            self._lease_name(), self.lease_owner, self._lease_ttl()
+        ):
+            holder = self.EvalMetricStore.lease_holder(self._lease_name())
+            print(
+                f"[Scheduler] Another run holds {self._lease_name()} "
+                f"(owner={holder and holder['owner']}), skipping"
+            )
+            return False
+
+        self._lease_depth = 1
+        self._lease_stop = threading.Event()
+        self._lease_lost.clear()
+        threading.Thread(
+            target=self._renew_lease,
+            args=(self._lease_stop, self._lease_name(), self._lease_ttl()),
+            name="scheduler-lease",
+            daemon=True,
+        ).start()
+        return True
+
+    def _renew_lease(self, stop: threading.Event, name: str, ttl: float) -> None:
+        while not stop.wait(ttl / 3):
+            if not self.EvalMetricStore.renew_lease(name, self.lease_owner, ttl):
+                print(f"[Scheduler][ERROR] Lost run lease {name}")
+                self._lease_lost.set()
+                return
+
+    def _check_lease(self) -> None:
+        """
+        Abort the run once its lease is gone: another instance may already
+        be running the same slot.
+        """
+        if self._lease_lost.is_set():
+            raise RuntimeError(f"Lost run lease {self._lease_name()}, aborting run {self.run_id}")
+
+    def _release_lease(self) -> None:
+        self._lease_depth -= 1
+        if self._lease_depth:
+            return
+
+        self._lease_stop.set()
+        ## A lost lease may belong to another instance by now.
+        if not self._lease_lost.is_set():
+            self.EvalMetricStore.release_lease(self._lease_name(), self.lease_owner)
+
+    def _clean_agent_dir(self, agent: str) -> None:
+        """
+        Drop an agent's exports from earlier runs: batched mode treats any
+        existing per-model file as this run's traffic.
+        """
+        agent_dir = os.path.join(self.output_dir, agent)
+        if os.path.exists(agent_dir):
+            shutil.rmtree(agent_dir)
 
     @staticmethod
     def _load_config(path: str) -> dict:
@@ -55,6 +312,10 @@ class Scheduler:
         with open(yaml_file, "r") as file:
             data = yaml.safe_load(file)
 
+        return Scheduler._team_agents(data, target_team_id, yaml_file)
+
+    @staticmethod
+    def _team_agents(data: dict, target_team_id: str, source: str = "config") -> list[str]:
         if "team" in data and data["team"]["id"] == target_team_id:
             return [agent["name"] for agent in data["team"]["agents"]]
 
@@ -63,146 +324,817 @@ class Scheduler:
                 if team["id"] == target_team_id:
                     return [agent["name"] for agent in team["agents"]]
 
-        raise ValueError(f"Team '{target_team_id}' not found in {yaml_file}")
+        raise ValueError(f"Team '{target_team_id}' not found in {source}")
 
-    def run_once(self):
+    def run_once(
+        self,
+        agents: Optional[list[str]] = None,
+        time_window: Optional[tuple[str, str]] = None,
+    ) -> bool:
         """
-        Execute a single scheduled run.
+        Execute a single scheduled run, optionally for some of the team's
+        agents and an explicit (from, to) window instead of
+        export.time_window. Returns False when another run holds the
+        team's lease.
         """
-        time_from = self.config["export"]["time_window"]["from"]
-        time_to = self.config["export"]["time_window"]["to"]
+        if not self._acquire_lease():
+            return False
 
-        agents = self.get_team_agents(
-            yaml_file="config.yaml",
-            target_team_id=self.team_id,
-        ) # agent2 , agent3
+        try:
+            self._run(agents, time_window)
+        finally:
+            self._release_lease()
 
-        print(f"[Scheduler] Found agents: {agents}")
+        return True
+
+    def _run(
+        self,
+        only_agents: Optional[list[str]],
+        time_window: Optional[tuple[str, str]],
+    ) -> None:
+        time_from, time_to = time_window or (
+            self.config["export"]["time_window"]["from"],
+            self.config["export"]["time_window"]["to"],
+        )
+
+        agents = self._team_agents(self.config, self.team_id, self.config_path) # agent2 , agent3
+        if only_agents is not None:
+            agents = [agent for agent in agents if agent in only_agents]
+
+        print(f"[Scheduler] Found agents: {agents} window={time_from}..{time_to}")
+
+        ## Nothing outside this team's agent directories is cleared: other
+        ## teams may share output_dir and the metric store, and run_id
+        ## already keeps earlier runs out of the analysis.
+        os.makedirs(self.output_dir, exist_ok=True)
+
+        self.call_policy.reset_stats()
+        self.telemetry.reset(spans_path=self._spans_path())
+        if self.client_factory.cassette is not None:
+            self.client_factory.cassette.reset()
+        self.cost_planner.reset(agents)
+        self.plans = {}
+        ## Keys task uniqueness and _await_tasks: must differ between runs
+        ## started within the same second.
+        self.run_id = uuid.uuid4().hex
 
         for agent in agents:
+            self._clean_agent_dir(agent)
+
+        try:
+            with self._profiling(), self.telemetry.span("run", agents=len(agents)):
+                if self.config["export"].get("batch", False):
+                    self._run_batched(agents, time_from, time_to)
+                else:
+                    for agent in agents:
+                        self._check_lease()
+                        with self.telemetry.span("agent", agent=agent):
+                            self._run_agent(agent, time_from, time_to)
+
+                self._await_tasks()
+                self._record_actual_spend()
+                self._check_lease()
+
+                ## Reporting the data.
+
+                with self.telemetry.span("analysis"):
+                    recommendations = self._analyze(agents, time_from, time_to)
+
+                with self.telemetry.span("report"):
+                    self.reporter.write_html_report(
+                        exports=self._report_exports(agents),
+                        recommendations=recommendations,
+                        run_id=self.run_id,
+                    )
+        finally:
+            ## Also on failure: spans.jsonl shows where the run stopped.
+            self.telemetry.close_spans()
+
+        self._write_telemetry()
+
+        print(f"[Scheduler] Call policy stats: {self.call_policy.stats}")
+        print(f"[Scheduler] Circuit breakers: {self.breakers.snapshot()}")
+
+        cassette = self.client_factory.cassette
+        if cassette is not None:
+            print(f"[Scheduler] Cassette: {cassette.summary()}")
+            if cassette.offline and cassette.missed:
+                raise RuntimeError(
+                    f"{len(cassette.missed)} requests not in cassette {cassette.path}, "
+                    f"first: {cassette.missed[0]}"
+                )
+
+    @contextmanager
+    def _profiling(self) -> Iterator[None]:
+        """
+        Profile every telemetry span of the block when profiling is on.
+        """
+        if self.profiler is None:
+            yield
+            return
+
+        self.profiler.start()
+        self.telemetry.profiler = self.profiler
+        try:
+            yield
+        finally:
+            self.telemetry.profiler = None
+            self.profiler.stop()
+            self.profiler.write(os.path.join(self.output_dir, "profile"))
+
+    # ---------- PIPELINE STEPS ----------
+
+    def _baseline_file(self, agent: str) -> str:
+        return os.path.join(self.output_dir, agent, "baseline.jsonl")
+
+    def _model_file(self, agent: str, model: str) -> str:
+        return os.path.join(
+            self.output_dir, agent, f"{model.split('/')[-1]}_logs.jsonl"
+        )
+
+    def _judge(self, agent: str, model_name: str, log_file: str) -> EvaluationBatch:
+        self._check_lease()
+        if self.task_queue is not None:
+            ## Workers write the evaluations; nothing to return here.
+            self._enqueue_judge(agent, model_name, log_file)
+            return EvaluationBatch(agent, model_name)
+
+        return LLMJudge(
+            agent_name=agent,
+            model_name=model_name,
+            config_path=self.config_path,
+            log_file_path=log_file,
+            portkey=self.portkey,
+            call_policy=self.call_policy,
+            telemetry=self.telemetry,
+            batch_client=self.batch_client,
+            config=self.config,
+        ).run()
+
+    def _runner(self, agent: str, log_file: str, models: Optional[list[str]]) -> EvalRunner:
+        return EvalRunner(
+            config_path=self.config_path,
+            team_id="portkey",
+            agent_id=agent,
+            log_file_path=log_file,
+            portkey=self.portkey,
+            call_policy=self.call_policy,
+            breakers=self.breakers,
+            telemetry=self.telemetry,
+            models=models,
+            batch_client=self.batch_client,
+            metric_store=self.EvalMetricStore,
+            config=self.config,
+            ## Batch API replays are written from the batch output, not
+            ## exported back (see _batch_replay_files).
+            batch_output_file=lambda model: self._model_file(agent, model),
+            batch_cost=self.cost_planner.usd,
+            run_id=self.run_id,
+        )
+
+    def _batch_replay_files(self, agent: str, models: list[str]) -> list[str]:
+        """
+        Model files the batch API runner wrote for `agent`, ingested like
+        exports. Models whose every request failed have none.
+        """
+        files = [self._model_file(agent, m) for m in models]
+        files = [f for f in files if os.path.exists(f)]
 
-            print(f"[Scheduler] Creating output directory for agent: {agent}")
+        if self.config["export"].get("columnar", True):
+            for path in files:
+                TraceStore.ingest(path)
 
-            os.mkdir(os.path.join(self.output_dir, agent))
-            output_file = os.path.join(
-                self.output_dir, agent, f"baseline.jsonl"
+        return files
+
+    def _replay(self, agent: str, baseline_file: str, models: list[str]) -> None:
+        self._check_lease()
+        if self.task_queue is not None:
+            self._enqueue_replay(agent, baseline_file, models)
+            return
+
+        ## Every planned model in one runner; for parallel replay use
+        ## pipeline.streaming, the task queue or batch_api.
+        with self.telemetry.span("replay", agent=agent):
+            skipped = self._runner(agent, baseline_file, models).run()
+
+        if skipped:
+            self._write_skipped(agent, skipped)
+
+    def _write_results(self, agent: str, results: list[EvaluationBatch]) -> int:
+        self._check_lease()
+
+        ## One compact EvaluationBatch per model; chained at write time
+        ## instead of re-concatenating lists.
+        with self.telemetry.span("db.write", agent=agent) as span:
+            span["rows"] = self.EvalMetricStore.upsert_evaluations(
+                itertools.chain.from_iterable(results), run_id=self.run_id
             )
 
-            print(f"[Scheduler] Created output file: {output_file}")
+        self.telemetry.inc("db_rows_written_total", span["rows"], agent=agent)
+        return span["rows"]
 
-            print(
-                f"[Scheduler] Exporting logs "
-                f"team={self.team_id} agent={agent}"
+    def _stream(
+        self,
+        agent: str,
+        model_name: str,
+        log_file: str,
+        replay: bool = False,
+        models: Optional[list[str]] = None,
+    ) -> None:
+        """
+        Streaming variant of replay + judge + write for one export: traces
+        flow through in chunks, so memory does not grow with the window.
+        """
+        self._check_lease()
+        judge = LLMJudge(
+            agent_name=agent,
+            model_name=model_name,
+            config_path=self.config_path,
+            log_file_path=log_file,
+            portkey=self.portkey,
+            call_policy=self.call_policy,
+            telemetry=self.telemetry,
+            batch_client=self.batch_client,
+            config=self.config,
+        )
+
+        stages = []
+        runner = None
+
+        if replay:
+            runner = self._runner(agent, log_file, models)
+
+            def replay_chunk(traces: TraceBatch) -> TraceBatch:
+                runner.run_batch(traces)
+                return traces
+
+            stages.append(self.pipeline.stage("replay", replay_chunk))
+
+        stages.append(self.pipeline.stage("judge", judge.judge_batch))
+        stages.append(
+            self.pipeline.stage("write", lambda evals: self._write_results(agent, [evals]))
+        )
+
+        with self.telemetry.span("stream", agent=agent, model=model_name) as span:
+            span["chunks"] = self.pipeline.run(
+                TraceBatch.iter_chunks(log_file, self.pipeline.chunk_size),
+                stages,
+            )
+
+        if runner is not None and runner.skipped:
+            self._write_skipped(agent, runner.skipped)
+
+    # ---------- TASK QUEUE ----------
+
+    def _enqueue(self, kind: str, agent: str, tasks) -> int:
+        added = self.task_queue.enqueue(tasks)
+        self.telemetry.inc("tasks_enqueued_total", added, kind=kind, agent=agent)
+        return added
+
+    def _enqueue_judge(self, agent: str, model_name: str, log_file: str) -> None:
+        """
+        One judge task per exported trace, carrying its input and output.
+        """
+        added = 0
+        for chunk in TraceBatch.iter_chunks(log_file, self.pipeline.chunk_size):
+            with chunk:
+                tasks = []
+                for trace in chunk:
+                    input_data, output_data = trace.bodies()
+                    if input_data is None or output_data is None:
+                        continue
+                    tasks.append(Task(
+                        kind=JUDGE, agent=agent, model=model_name,
+                        trace_id=trace.source_trace_id, run_id=self.run_id,
+                        payload={
+                            "input": input_data,
+                            "output": output_data,
+                            "cost": trace.cost,
+                            "response_time": trace.response_time,
+                        },
+                    ))
+                added += self._enqueue(JUDGE, agent, tasks)
+
+        print(f"[Scheduler] Enqueued {added} judge tasks agent={agent} model={model_name}")
+
+    def _enqueue_replay(self, agent: str, baseline_file: str, models: list[str]) -> None:
+        """
+        One replay task per (baseline trace, model).
+        """
+        added = 0
+        for chunk in TraceBatch.iter_chunks(baseline_file, self.pipeline.chunk_size):
+            with chunk:
+                inputs = [
+                    (idx, trace.trace_id, trace.input)
+                    for idx, trace in enumerate(chunk, start=chunk.start + 1)
+                ]
+            added += self._enqueue(REPLAY, agent, [
+                Task(
+                    kind=REPLAY, agent=agent, model=model,
+                    trace_id=trace_id, run_id=self.run_id,
+                    payload={"input": input_data, "index": idx},
+                )
+                for model in models
+                for idx, trace_id, input_data in inputs
+            ])
+
+        print(f"[Scheduler] Enqueued {added} replay tasks agent={agent} models={len(models)}")
+
+    def _await_tasks(self, kind: Optional[str] = None) -> None:
+        """
+        Block until every task of this run (of `kind`, if given) is done
+        or failed. No-op without a task queue.
+        """
+        if self.task_queue is None:
+            return
+
+        cfg = self.config.get("task_queue") or {}
+        poll = float(cfg.get("poll_interval", 2))
+        log_every = float(cfg.get("wait_log_interval", 30))
+        deadline = time.monotonic() + float(cfg.get("max_wait_seconds", 24 * 3600))
+        last_log = 0.0
+
+        with self.telemetry.span("tasks.wait", kind=kind or "all"):
+            while True:
+                counts = self.task_queue.counts(self.run_id, kind=kind)
+                open_tasks = counts["pending"] + counts["leased"]
+
+                if time.monotonic() - last_log >= log_every or not open_tasks:
+                    print(f"[Scheduler] Tasks kind={kind or 'all'}: {counts}")
+                    last_log = time.monotonic()
+
+                if not open_tasks:
+                    break
+
+                self._check_lease()
+
+                if time.monotonic() > deadline:
+                    raise TimeoutError(
+                        f"{open_tasks} {kind or ''} tasks still open for run {self.run_id}"
+                    )
+
+                time.sleep(poll)
+
+        if kind is None:
+            failed: dict[str, list[dict]] = {}
+            for row in self.task_queue.failures(self.run_id):
+                failed.setdefault(row["agent"], []).append({
+                    "agent": row["agent"],
+                    "model": row["model"],
+                    "kind": row["kind"],
+                    "trace_id": row["trace_id"],
+                    "reason": f"failed after {row['attempts']} attempts: {row['last_error']}",
+                })
+            for agent, items in failed.items():
+                self._write_skipped(agent, items)
+
+    # ---------- BUDGET ----------
+
+    def _plan(self, agent: str, baseline_file: str) -> CostPlan:
+        """
+        Estimate this agent's spend and fit it into the remaining budget.
+        Downsamples the baseline export in place when the plan asks for it.
+        """
+        with self.telemetry.span("plan", agent=agent) as span:
+            plan = self.cost_planner.plan(agent, baseline_file, self.config["models"])
+            span["planned_usd"] = plan.cost()
+
+            if 0 < plan.sample_fraction < 1:
+                CostPlanner.downsample_export(baseline_file, plan.sample_fraction)
+
+        self.plans[agent] = plan
+
+        self.EvalMetricStore.record_spend(
+            self.run_id,
+            [dict(row, sample_fraction=plan.sample_fraction) for row in plan.rows()],
+        )
+        self.telemetry.inc("planned_spend_usd_total", plan.cost(), agent=agent)
+
+        if not plan.sample_fraction:
+            print(f"[Scheduler] Budget exhausted, skipping agent={agent}")
+
+        return plan
+
+    def _record_actual_spend(self) -> None:
+        """
+        Price the tokens each agent actually used and store them next to
+        the plan.
+        """
+        tokens: dict[str, dict[tuple, float]] = {}
+        for item in self.telemetry.counter("llm_tokens_total"):
+            labels = item["labels"]
+            if "agent" not in labels:
+                continue
+            key = (labels["stage"], labels["model"], labels["kind"])
+            by_agent = tokens.setdefault(labels["agent"], {})
+            by_agent[key] = by_agent.get(key, 0) + item["value"]
+
+        ## Calls made by queue workers are reported on their tasks.
+        if self.task_queue is not None:
+            for row in self.task_queue.usage(self.run_id):
+                by_agent = tokens.setdefault(row["agent"], {})
+                for kind in ("prompt", "completion"):
+                    key = (row["stage"], row["model"], kind)
+                    by_agent[key] = by_agent.get(key, 0) + row[f"{kind}_tokens"]
+
+        for agent, usage in tokens.items():
+            rows = self.cost_planner.actual_rows(agent, usage)
+            self.EvalMetricStore.record_spend(self.run_id, rows)
+            self.telemetry.inc(
+                "actual_spend_usd_total",
+                sum(row["actual_usd"] for row in rows),
+                agent=agent,
             )
 
-            self.log_extractor.export_logs_for_agent(
-                team_id=self.team_id,
-                agent_id=agent,
-                time_min=time_from,
-                time_max=time_to,
-                output_file=output_file,
-                model_id=None
+        for row in self.EvalMetricStore.spend_by_agent(self.run_id):
+            print(
+                f"[Scheduler] Spend agent={row['agent']} "
+                f"planned=${row['planned_usd'] or 0:.4f} "
+                f"actual=${row['actual_usd'] or 0:.4f}"
             )
 
+    @staticmethod
+    def _generation_time(round_up: bool = False) -> str:
+        # Result: "2026-01-18T14:23:45Z"
+        now = datetime.now(timezone.utc)
+        if round_up:
+            ## Second resolution: an upper bound must not cut off the
+            ## replays logged earlier in the current second.
+            now += timedelta(seconds=1)
+        return now.strftime('%Y-%m-%dT%H:%M:%SZ')
 
-            ### LLM Judge for baseline of this specific agent
-            eval_result = LLMJudge(
-                agent_name=agent,
-                model_name="baseline",
-                config_path="config.yaml",
-                log_file_path=output_file
-            ).run()
+    def _rate_limit_pause(self) -> None:
+        ## Nothing to rate limit when every call is served from a cassette.
+        if self.client_factory.cassette is not None and self.client_factory.cassette.offline:
+            return
 
-            results = eval_result
+        ## Small sleep to avoid rate limits.
+        time.sleep(self.config["scheduler"].get("rate_limit_sleep_seconds", 15))
 
-            time_of_generation_min = datetime.now(timezone.utc).isoformat()
-            # Result: "2026-01-18T14:23:45.678901+00:00"
+    # ---------- PER-AGENT MODE ----------
 
-            # Or with 'Z' suffix:
-            time_of_generation_min = datetime.now(timezone.utc).strftime('%Y-%m-%dT%H:%M:%SZ')
-            # Result: "2026-01-18T14:23:45Z"
+    def _run_agent(self, agent: str, time_from: str, time_to: str) -> None:
+        """
+        Export, replay, judge and store evaluations for one agent.
+        """
+        print(f"[Scheduler] Creating output directory for agent: {agent}")
 
+        os.makedirs(os.path.join(self.output_dir, agent), exist_ok=True)
+        output_file = self._baseline_file(agent)
 
-            ## Run on differnt models mentioned in config.yaml and
-            ## TODO: here we can achieve parallelism.
-            EvalRunner(
-                config_path="config.yaml",
-                team_id="portkey",
-                agent_id=agent,
-                log_file_path=output_file
-            ).run()
+        print(f"[Scheduler] Created output file: {output_file}")
 
-            time.sleep(15)  ## Small sleep to avoid rate limits.
+        print(
+            f"[Scheduler] Exporting logs "
+            f"team={self.team_id} agent={agent}"
+        )
 
-            ## export_logs for all the models on this agent.
-            for model in self.config["models"]:
-                output_file = os.path.join(
-                    self.output_dir, agent, f"{model.split('/')[-1]}_logs.jsonl"
-                )
+        self.log_extractor.export_logs_for_agent(
+            team_id=self.team_id,
+            agent_id=agent,
+            time_min=time_from,
+            time_max=time_to,
+            output_file=output_file,
+            model_id=None,
+            requested_data=self.requested_data["baseline"],
+        )
+
+        plan = self._plan(agent, output_file)
+        if not plan.sample_fraction:
+            return
+
+        if self.streaming:
+            time_of_generation_min = self._generation_time()
+            self._stream(agent, "baseline", output_file, replay=True, models=plan.models)
+        else:
+            ### LLM Judge for baseline of this specific agent
+            ## Upsert Evaluations : For Baseline file write model as "baseline".
+            results = [self._judge(agent, "baseline", output_file)]
 
+            time_of_generation_min = self._generation_time()
+
+            self._replay(agent, output_file, plan.models)
+            self._await_tasks(REPLAY)
+
+        ## Replays are logged when they run, not inside the production
+        ## window (which ends at or before now in daemon mode).
+        time_of_generation_max = self._generation_time(round_up=True)
+
+        self._rate_limit_pause()
+
+        if self.batch_client is not None:
+            written = self._batch_replay_files(agent, plan.models)
+
+        ## export_logs for all the (budgeted) models on this agent.
+        for model in plan.models:
+            output_file = self._model_file(agent, model)
+
+            if self.batch_client is None:
                 self.log_extractor.export_logs_for_agent(
                     team_id="portkey",
                     agent_id=agent,
                     model_id=model.split('/')[-1],
                     time_min=time_of_generation_min,
-                    time_max=time_to,
+                    time_max=time_of_generation_max,
                     output_file=output_file,
+                    requested_data=self.requested_data["eval"],
                 )
-            
-            ##TODO: LLM Judge task for eval models
-            ## Upsert Evaluations : For Baseline file write model as "baseline".
-                result = LLMJudge(
-                    agent_name=agent,
-                    model_name=model,
-                    log_file_path=output_file,
-                    config_path="config.yaml",
-                ).run()
-
-                results = results + result
-            
-
-            for res in results:
-                self.EvalMetricStore.upsert_evaluation(
-                    trace_id=res["trace_id"],
-                    model=res["model"],
-                    agent=res["agent"],
-                    quality_score=res["quality_score"],
-                    response_time_ms=res["response_time_ms"],
-                    cost=res["cost"]
+            elif output_file not in written:
+                continue
+
+            if self.streaming:
+                self._stream(agent, model, output_file)
+            else:
+                results.append(self._judge(agent, model, output_file))
+
+        if not self.streaming:
+            self._write_results(agent, results)
+
+    # ---------- BATCHED MODE ----------
+
+    def _run_batched(self, agents: list[str], time_from: str, time_to: str) -> None:
+        """
+        Two exports per window instead of one per (agent, model): one for
+        the team's production logs and one for all eval replays, each split
+        locally into the usual per-agent / per-model files.
+        """
+        agent_set = set(agents)
+        models = self.config["models"]
+        model_by_id = {model.split('/')[-1]: model for model in models}
+
+        for agent in agents:
+            os.makedirs(os.path.join(self.output_dir, agent), exist_ok=True)
+
+        def route_baseline(entry: dict):
+            agent = (entry.get("metadata") or {}).get("agent")
+            return self._baseline_file(agent) if agent in agent_set else None
+
+        def route_models(entry: dict):
+            agent = (entry.get("metadata") or {}).get("agent")
+            model = model_by_id.get(entry.get("ai_model"))
+            if agent not in agent_set or model not in self.plans[agent].models:
+                return None
+            return self._model_file(agent, model)
+
+        self.log_extractor.export_logs_for_team(
+            team_id=self.team_id,
+            time_min=time_from,
+            time_max=time_to,
+            output_file=os.path.join(self.output_dir, "baseline_all.jsonl"),
+            route=route_baseline,
+            requested_data=self.requested_data["baseline"],
+        )
+
+        ## Agents with no production traces in the window are skipped.
+        active = [a for a in agents if os.path.exists(self._baseline_file(a))]
+        for agent in agent_set.difference(active):
+            print(f"[Scheduler] No baseline traces for agent={agent}, skipping")
+
+        active = [a for a in active if self._plan(a, self._baseline_file(a)).sample_fraction]
+        agent_set = set(active)
+
+        results: dict[str, list[EvaluationBatch]] = {agent: [] for agent in active}
+
+        if self.streaming:
+            time_of_generation_min = self._generation_time()
+
+            for agent in active:
+                with self.telemetry.span("agent", agent=agent):
+                    self._stream(
+                        agent, "baseline", self._baseline_file(agent),
+                        replay=True, models=self.plans[agent].models,
+                    )
+        else:
+            for agent in active:
+                with self.telemetry.span("agent", agent=agent):
+                    results[agent].append(
+                        self._judge(agent, "baseline", self._baseline_file(agent))
+                    )
+
+            time_of_generation_min = self._generation_time()
+
+            for agent in active:
+                self._replay(
+                    agent, self._baseline_file(agent), self.plans[agent].models
                 )
 
-        ## Reporting the data.
+            self._await_tasks(REPLAY)
+
+        time_of_generation_max = self._generation_time(round_up=True)
+
+        self._rate_limit_pause()
+
+        if self.batch_client is None:
+            self.log_extractor.export_logs_for_team(
+                team_id="portkey",
+                time_min=time_of_generation_min,
+                time_max=time_of_generation_max,
+                output_file=os.path.join(self.output_dir, "models_all.jsonl"),
+                route=route_models,
+                requested_data=self.requested_data["eval"],
+            )
+        else:
+            for agent in active:
+                self._batch_replay_files(agent, self.plans[agent].models)
+
+        for agent in active:
+            with self.telemetry.span("agent", agent=agent):
+                for model in self.plans[agent].models:
+                    output_file = self._model_file(agent, model)
+                    if not os.path.exists(output_file):
+                        continue
+                    if self.streaming:
+                        self._stream(agent, model, output_file)
+                    else:
+                        results[agent].append(
+                            self._judge(agent, model, output_file)
+                        )
 
-        metrics = self.EvalMetricStore.aggregate_model_metrics()
+                if not self.streaming:
+                    self._write_results(agent, results[agent])
+
+    def _report_exports(self, agents: list[str]) -> dict[str, dict[str, str]]:
+        """
+        Export files backing the per-trace report table, per agent.
+        """
+        exports = {}
+        for agent in agents:
+            plan = self.plans.get(agent)
+            models = plan.models if plan else self.config["models"]
+            files = {"baseline": self._baseline_file(agent)}
+            files.update({m: self._model_file(agent, m) for m in models})
+            exports[agent] = {m: f for m, f in files.items() if os.path.exists(f)}
+        return exports
 
-        report_path = os.path.join(
-            self.output_dir, "evaluation_report.html"
+    def _analyze(self, agents: list[str], time_from: str, time_to: str) -> dict:
+        """
+        Per-agent Pareto frontier, bootstrap CIs and recommended model,
+        written to recommendations.json and served at /recommendations.
+        """
+        window_days = (
+            datetime.fromisoformat(time_to) - datetime.fromisoformat(time_from)
+        ).total_seconds() / 86400
+
+        ## Only this run's rows: window_days is this run's window.
+        frame = EvaluationFrame.from_store(self.EvalMetricStore, agents, self.run_id)
+        result = self.analyzer.analyze(
+            frame,
+            window_days=window_days or None,
+            sample_fractions={a: p.sample_fraction for a, p in self.plans.items()},
         )
 
-        HTMLReporter.write_html_report(
-            metrics=metrics,
-            output_path=report_path,
+        path = os.path.join(self.output_dir, "recommendations.json")
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(result, f, indent=2)
+
+        self.telemetry.publish("recommendations", result)
+        for agent, analysis in result["agents"].items():
+            self.telemetry.publish(f"recommendations/{agent}", analysis)
+
+            pick = analysis["recommendation"]
+            if pick:
+                print(
+                    f"[Scheduler] Recommendation agent={agent}: {pick['model']} "
+                    f"confidence={pick['confidence']} "
+                    f"monthly_savings_usd={pick['monthly_savings_usd']}"
+                )
+
+        return result
+
+    def _spans_path(self) -> Optional[str]:
+        """
+        Raw spans are streamed here during the run (Telemetry.reset).
+        """
+        cfg = self.config.get("telemetry") or {}
+        if not cfg.get("write_spans", True):
+            return None
+        return os.path.join(self.output_dir, "spans.jsonl")
+
+    def _write_telemetry(self) -> None:
+        """
+        Write the Prometheus textfile and JSON run summary next to the
+        HTML report (spans.jsonl is written while the run goes).
+        """
+        cfg = self.config.get("telemetry") or {}
+
+        if cfg.get("prometheus_textfile", True):
+            self.telemetry.write_prometheus(
+                os.path.join(self.output_dir, "metrics.prom")
+            )
+
+        self.telemetry.write_summary(
+            os.path.join(self.output_dir, "run_summary.json")
         )
 
+        print(f"[Scheduler] Telemetry written to {self.output_dir}")
+
+    def _write_skipped(self, agent: str, skipped: list[dict]) -> None:
+        """
+        Record replays skipped by open circuit breakers or errors.
+        """
+        path = os.path.join(self.output_dir, agent, "skipped.jsonl")
+
+        with open(path, "w", encoding="utf-8") as f:
+            for item in skipped:
+                f.write(json.dumps(item) + "\n")
+
+        print(
+            f"[Scheduler] {len(skipped)} replays skipped for agent={agent}, "
+            f"see {path}"
+        )
 
     def run_forever(self):
         """
-        Run scheduler at a fixed interval.
+        Daemon mode: run each schedule at its wall-clock slots (start
+        times do not drift with run duration), catch up on missed slots
+        per scheduler.catch_up and reload config.yaml when it changes.
         """
         print(
-            f"[Scheduler] Started | interval={self.interval}s"
+            f"[Scheduler] Started | owner={self.lease_owner} schedules: "
+            + "; ".join(str(schedule) for schedule in self.schedules)
         )
 
+        announced = None
+
         while True:
             try:
-                self.run_once()
+                self.reload_config_if_changed()
+                self._run_due()
             except Exception as e:
                 print(f"[Scheduler][ERROR] {e}")
 
-            print(
-                f"[Scheduler] Sleeping for {self.interval}s\n"
+            now = datetime.now(timezone.utc)
+            tick = float(self.config["scheduler"].get("tick_seconds", 30))
+            wait = tick
+
+            if self.schedules:
+                next_run = min(schedule.next_after(now) for schedule in self.schedules)
+                wait = min(tick, (next_run - now).total_seconds())
+
+                if next_run != announced:
+                    print(f"[Scheduler] Next run at {format_time(next_run)}\n")
+                    announced = next_run
+
+            ## Short ticks keep config reloads and lease hand-overs prompt.
+            time.sleep(max(0.0, wait))
+
+    def _run_due(self) -> None:
+        """
+        Run every schedule with a due slot and record the slot as done.
+        """
+        cfg = self.config["scheduler"]
+        catch_up = cfg.get("catch_up", LATEST)
+        max_catch_up = int(cfg.get("max_catch_up", 3))
+        grace = float(cfg.get("misfire_grace_seconds", 300))
+
+        def due(schedule: Schedule, now: datetime):
+            last = self.EvalMetricStore.schedule_slot(self.team_id, schedule.name)
+            return schedule.due(
+                parse_time(last) if last else None, now, catch_up, max_catch_up, grace,
             )
-            time.sleep(self.interval)
+
+        now = datetime.now(timezone.utc)
+        if all(due(schedule, now)[1] is None for schedule in self.schedules):
+            return
+
+        if not self._acquire_lease():
+            return
+
+        try:
+            ## Re-read under the lease: another instance may have just run
+            ## these slots.
+            for schedule in self.schedules:
+                windows, slot = due(schedule, now)
+                if slot is None:
+                    continue
+
+                status = "ok" if windows else "skipped"
+                if not windows:
+                    print(
+                        f"[Scheduler] Schedule {schedule.name}: skipping missed "
+                        f"slots up to {format_time(slot)} (catch_up={catch_up})"
+                    )
+
+                for start, end in windows:
+                    self._check_lease()
+                    print(
+                        f"[Scheduler] Schedule {schedule.name}: slot {format_time(end)} "
+                        f"window {format_time(start)}..{format_time(end)}"
+                    )
+                    try:
+                        self.run_once(schedule.agents, (format_time(start), format_time(end)))
+                    except Exception as e:
+                        ## Recorded, not retried: the next slot runs on time.
+                        status = "failed"
+                        print(f"[Scheduler][ERROR] Schedule {schedule.name}: {e}")
+
+                ## The slot belongs to whoever holds the lease now.
+                self._check_lease()
+                self.EvalMetricStore.record_schedule_slot(
+                    self.team_id, schedule.name, format_time(slot), status
+                )
+        finally:
+            self._release_lease()
 
 
 # ---------- ENTRY POINT ----------
@@ -221,9 +1153,24 @@ if __name__ == "__main__":
         help="Run scheduler once and exit",
     )
 
+    parser.add_argument(
+        "--cassette",
+        choices=["record", "replay", "off"],
+        help="Record or replay all HTTP traffic (overrides cassette.mode)",
+    )
+
+    parser.add_argument(
+        "--profile",
+        action="store_true",
+        help="Write a per-stage CPU/allocation profile to <output_dir>/profile",
+    )
+
     args = parser.parse_args()
 
-    scheduler = Scheduler(args.config)
+    if args.cassette:
+        os.environ["CASSETTE_MODE"] = args.cassette
+
+    scheduler = Scheduler(args.config, profile=args.profile)
 
     if args.once:
         print("[Scheduler] Running once")
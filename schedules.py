@@ -0,0 +1,317 @@
+import re
+from datetime import date, datetime, timedelta, timezone
+from typing import Any, Dict, List, Optional, Tuple
+from zoneinfo import ZoneInfo
+
+SKIP = "skip"
+LATEST = "latest"
+ALL = "all"
+
+CATCH_UP_POLICIES = (SKIP, LATEST, ALL)
+
+CRON_MACROS = {
+    "@yearly": "0 0 1 1 *",
+    "@annually": "0 0 1 1 *",
+    "@monthly": "0 0 1 * *",
+    "@weekly": "0 0 * * 0",
+    "@daily": "0 0 * * *",
+    "@midnight": "0 0 * * *",
+    "@hourly": "0 * * * *",
+}
+
+## (min, max) per cron field: minute hour day-of-month month day-of-week.
+CRON_FIELDS = [(0, 59), (0, 23), (1, 31), (1, 12), (0, 7)]
+
+## Days searched for the next/previous cron match (covers leap days).
+CRON_SEARCH_DAYS = 366 * 8
+
+DURATION_UNITS = {"s": 1, "m": 60, "h": 3600, "d": 86400, "w": 604800}
+
+
+def parse_duration(value: Any) -> float:
+    """
+    Seconds from a number or a string like "90s", "15m", "6h", "1d12h".
+    """
+    if isinstance(value, (int, float)):
+        return float(value)
+
+    text = str(value).strip().lower()
+    parts = re.findall(r"(\d+(?:\.\d+)?)\s*([smhdw])", text)
+    if not parts or "".join(n + u for n, u in parts) != text.replace(" ", ""):
+        raise ValueError(f"Invalid duration: {value!r}")
+
+    return sum(float(n) * DURATION_UNITS[u] for n, u in parts)
+
+
+def format_time(value: datetime) -> str:
+    # Result: "2026-01-18T14:23:45Z", like Scheduler._generation_time
+    return value.astimezone(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")
+
+
+def parse_time(value: str) -> datetime:
+    return datetime.fromisoformat(value.replace("Z", "+00:00")).astimezone(timezone.utc)
+
+
+class CronTrigger:
+    """
+    Standard 5-field cron expression (minute hour dom month dow) with
+    *, lists, ranges and steps, evaluated in a timezone. As in cron, when
+    both day-of-month and day-of-week are restricted either may match.
+    """
+
+    def __init__(self, expression: str, tz: str = "UTC"):
+        self.expression = expression
+        self.tz = ZoneInfo(tz)
+
+        fields = CRON_MACROS.get(expression.strip(), expression).split()
+        if len(fields) != 5:
+            raise ValueError(f"Cron expression needs 5 fields: {expression!r}")
+
+        parsed = [self._parse_field(f, lo, hi) for f, (lo, hi) in zip(fields, CRON_FIELDS)]
+        self.minutes, self.hours, self.days, self.months, weekdays = parsed
+
+        ## 7 is Sunday too.
+        self.weekdays = {d % 7 for d in weekdays}
+        self.dom_any = fields[2] == "*"
+        self.dow_any = fields[4] == "*"
+
+    @staticmethod
+    def _parse_field(field: str, lo: int, hi: int) -> List[int]:
+        values = set()
+
+        for part in field.split(","):
+            step = 1
+            if "/" in part:
+                part, step_text = part.split("/", 1)
+                step = int(step_text)
+                if step < 1:
+                    raise ValueError(f"Invalid cron step: {field!r}")
+
+            if part == "*":
+                start, end = lo, hi
+            elif "-" in part:
+                start, end = (int(x) for x in part.split("-", 1))
+            else:
+                start = int(part)
+                ## "5/15" means every 15 starting at 5.
+                end = hi if step > 1 else start
+
+            if not lo <= start <= end <= hi:
+                raise ValueError(f"Cron field {field!r} out of range {lo}-{hi}")
+
+            values.update(range(start, end + 1, step))
+
+        return sorted(values)
+
+    def _day_matches(self, day: date) -> bool:
+        if day.month not in self.months:
+            return False
+
+        dom = day.day in self.days
+        dow = (day.weekday() + 1) % 7 in self.weekdays
+
+        if self.dom_any or self.dow_any:
+            return (self.dom_any or dom) and (self.dow_any or dow)
+        return dom or dow
+
+    def _localize(self, day: date, hour: int, minute: int) -> datetime:
+        local = datetime(day.year, day.month, day.day, hour, minute, tzinfo=self.tz)
+        return local.astimezone(timezone.utc)
+
+    def next_after(self, moment: datetime) -> datetime:
+        """
+        First fire time strictly after `moment`.
+        """
+        local = moment.astimezone(self.tz).replace(tzinfo=None, second=0, microsecond=0)
+        local += timedelta(minutes=1)
+
+        for offset in range(CRON_SEARCH_DAYS):
+            day = local.date() + timedelta(days=offset)
+            if not self._day_matches(day):
+                continue
+
+            for hour in self.hours:
+                if offset == 0 and hour < local.hour:
+                    continue
+                for minute in self.minutes:
+                    if offset == 0 and hour == local.hour and minute < local.minute:
+                        continue
+                    fire = self._localize(day, hour, minute)
+                    if fire > moment:
+                        return fire
+
+        raise ValueError(f"Cron expression never fires: {self.expression!r}")
+
+    def latest_at_or_before(self, moment: datetime) -> datetime:
+        """
+        Last fire time at or before `moment`.
+        """
+        local = moment.astimezone(self.tz).replace(tzinfo=None, second=0, microsecond=0)
+
+        for offset in range(CRON_SEARCH_DAYS):
+            day = local.date() - timedelta(days=offset)
+            if not self._day_matches(day):
+                continue
+
+            for hour in reversed(self.hours):
+                if offset == 0 and hour > local.hour:
+                    continue
+                for minute in reversed(self.minutes):
+                    if offset == 0 and hour == local.hour and minute > local.minute:
+                        continue
+                    fire = self._localize(day, hour, minute)
+                    if fire <= moment:
+                        return fire
+
+        raise ValueError(f"Cron expression never fired: {self.expression!r}")
+
+    def __str__(self) -> str:
+        return f"cron '{self.expression}' {self.tz.key}"
+
+
+class IntervalTrigger:
+    """
+    Fires every `seconds` on a fixed wall-clock grid starting at `anchor`
+    (default: the Unix epoch, so "1d" is midnight UTC), independent of
+    how long runs take.
+    """
+
+    def __init__(self, seconds: float, anchor: Optional[datetime] = None):
+        if seconds <= 0:
+            raise ValueError("Interval must be positive")
+
+        self.seconds = seconds
+        self.anchor = anchor or datetime(1970, 1, 1, tzinfo=timezone.utc)
+
+    def _slot(self, index: int) -> datetime:
+        return self.anchor + timedelta(seconds=index * self.seconds)
+
+    def _index(self, moment: datetime) -> int:
+        return int((moment - self.anchor).total_seconds() // self.seconds)
+
+    def next_after(self, moment: datetime) -> datetime:
+        return self._slot(self._index(moment) + 1)
+
+    def latest_at_or_before(self, moment: datetime) -> datetime:
+        return self._slot(self._index(moment))
+
+    def __str__(self) -> str:
+        return f"every {self.seconds:g}s from {format_time(self.anchor)}"
+
+
+class Schedule:
+    """
+    One named trigger for some (or all) agents of a team.
+
+    Each fire time ("slot") evaluates the window since the previous slot
+    (or since the last completed slot when catching up).
+    """
+
+    def __init__(
+        self,
+        name: str,
+        trigger,
+        agents: Optional[List[str]] = None,
+    ):
+        self.name = name
+        self.trigger = trigger
+        self.agents = agents
+
+    @classmethod
+    def from_config(cls, config: Dict[str, Any], team_id: str) -> List["Schedule"]:
+        """
+        Schedules of `team_id` from scheduler.schedules; without any, a
+        single wall-clock schedule every `interval_seconds`.
+        """
+        cfg = config.get("scheduler") or {}
+        tz = cfg.get("timezone", "UTC")
+
+        entries = cfg.get("schedules") or [
+            {"name": "default", "every": cfg.get("interval_seconds", 86400)}
+        ]
+
+        schedules = []
+        for i, entry in enumerate(entries):
+            if entry.get("team", team_id) != team_id:
+                continue
+
+            if "cron" in entry:
+                trigger = CronTrigger(entry["cron"], entry.get("timezone", tz))
+            elif "every" in entry:
+                anchor = entry.get("anchor")
+                trigger = IntervalTrigger(
+                    parse_duration(entry["every"]),
+                    parse_time(str(anchor)) if anchor else None,
+                )
+            else:
+                raise ValueError(f"Schedule #{i} needs 'cron' or 'every'")
+
+            schedules.append(cls(
+                name=str(entry.get("name") or f"schedule-{i}"),
+                trigger=trigger,
+                agents=entry.get("agents"),
+            ))
+
+        return schedules
+
+    def next_after(self, moment: datetime) -> datetime:
+        return self.trigger.next_after(moment)
+
+    def due(
+        self,
+        last_slot: Optional[datetime],
+        now: datetime,
+        catch_up: str = LATEST,
+        max_catch_up: int = 3,
+        grace_seconds: float = 300,
+    ) -> Tuple[List[Tuple[datetime, datetime]], Optional[datetime]]:
+        """
+        Windows to run now and the slot to record as done afterwards.
+
+        A slot fired less than `grace_seconds` ago is on time and always
+        runs. Older unrun slots were missed (downtime, overrunning runs):
+        `skip` drops them, `latest` runs once over everything since the
+        last completed slot, `all` runs each missed slot's window, the
+        most recent `max_catch_up` of them.
+        """
+        if catch_up not in CATCH_UP_POLICIES:
+            raise ValueError(f"Unknown catch_up policy: {catch_up}")
+
+        latest = self.trigger.latest_at_or_before(now)
+        if last_slot is not None and latest <= last_slot:
+            return [], None
+
+        previous = self.trigger.latest_at_or_before(latest - timedelta(seconds=1))
+        on_time = (now - latest).total_seconds() <= grace_seconds
+        start = last_slot or previous
+
+        if on_time and (last_slot is None or previous <= last_slot):
+            return [(start, latest)], latest
+
+        if catch_up == SKIP:
+            return ([(previous, latest)] if on_time else []), latest
+
+        if catch_up == LATEST:
+            return [(start, latest)], latest
+
+        ## Without a completed slot there is no history to catch up on.
+        limit = max(1, max_catch_up) if last_slot is not None else 1
+
+        slots = [latest]
+        while len(slots) < limit:
+            slot = self.trigger.latest_at_or_before(slots[-1] - timedelta(seconds=1))
+            if slot <= last_slot:
+                break
+            slots.append(slot)
+
+        slots.reverse()
+        first_start = self.trigger.latest_at_or_before(slots[0] - timedelta(seconds=1))
+        if last_slot is not None:
+            first_start = max(first_start, last_slot)
+
+        starts = [first_start] + slots[:-1]
+        return list(zip(starts, slots)), latest
+
+    def __str__(self) -> str:
+        agents = ",".join(self.agents) if self.agents else "all agents"
+        return f"{self.name} ({self.trigger}; {agents})"
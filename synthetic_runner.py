@@ -1,15 +1,20 @@
-from portkey_ai import Portkey
+from portkey_client import PortkeyClientFactory
+import argparse
+import itertools
 import json
+import random
 import sys,os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 from types import SimpleNamespace
 from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional
 from dotenv import load_dotenv
 
 load_dotenv()
 
-portkey = Portkey(
-    api_key=os.getenv("PORTKEY_API_KEY")
-)
+DEFAULT_MODEL = "@openai/gpt-3.5-turbo"
 
 
 ## Gather all the inputs from the runner file that is passed while running this .
@@ -28,56 +33,328 @@ def load_config(config_path: str):
     return SimpleNamespace(**data)
 
 
-def main():
-    if len(sys.argv) < 2:
-        print("Usage: python runner.py <config.json>")
-        sys.exit(1)
-
-    config_path = sys.argv[1]
-    config = load_config(config_path)
-
-    # Expose commonly used variables
-    agent_id = config.agent_id
-    team_id = config.team_id
-    system_prompt = config.system_prompt
-    inputs = config.inputs
-
-    # Example usage
-    print(f"Agent ID: {agent_id}")
-    print(f"Team ID: {team_id}")
-    print(f"Total inputs: {len(inputs)}")
-
-    # ---- Your processing logic starts here ----
-    for input_data in inputs:
-        # Add metadata to track context
-        input = json.dumps(input_data)
-        print(f"Processing input: {input}")
-        response = portkey.with_options(
-            metadata={
-                "_user": "Rithvik",
-                "environment": "dev",
-                "feature": "summarization",
-                "team": team_id,
-                "agent": agent_id
+# ---------- INPUT EXPANSION ----------
+
+class TrafficStream:
+    """
+    One (team, agent) source of synthetic requests.
+
+    Inputs come from a literal `inputs` list and/or a `template`:
+
+        "template": {
+          "mode": "combinatorial",          # or "random"
+          "fields": {"tone": ["formal", "casual"], "segment": [...]},
+          "fixed": {"campaign_goal": "..."}
+        }
+
+    Combinatorial mode walks the cartesian product of the field values;
+    random mode draws each field independently. Both cycle forever and
+    are deterministic for a given seed.
+    """
+
+    def __init__(self, cfg: Dict[str, Any], defaults: Dict[str, Any], seed: int):
+        self.team_id: str = cfg.get("team_id", defaults.get("team_id"))
+        self.agent_id: str = cfg.get("agent_id", defaults.get("agent_id"))
+        self.model: str = cfg.get("model", defaults.get("model", DEFAULT_MODEL))
+        self.system_prompt: str = cfg.get(
+            "system_prompt", defaults.get("system_prompt", "")
+        )
+        self.weight: float = float(cfg.get("weight", 1))
+        self.metadata: Dict[str, Any] = {
+            "_user": "Rithvik",
+            "environment": "dev",
+            "feature": "summarization",
+            "team": self.team_id,
+            "agent": self.agent_id,
+            **(cfg.get("metadata") or defaults.get("metadata") or {}),
+        }
+
+        self.inputs: List[Dict[str, Any]] = list(cfg.get("inputs") or [])
+        self.template: Optional[Dict[str, Any]] = cfg.get("template")
+        self.rng = random.Random(f"{seed}:{self.team_id}:{self.agent_id}")
+
+        if not self.inputs and not self.template:
+            raise ValueError(
+                f"Stream team={self.team_id} agent={self.agent_id} "
+                f"has neither inputs nor template"
+            )
+
+    @property
+    def name(self) -> str:
+        return f"{self.team_id}/{self.agent_id}"
+
+    def distinct_inputs(self) -> Optional[int]:
+        """
+        Number of distinct inputs before cycling (None for random mode).
+        """
+        if not self.template:
+            return len(self.inputs)
+        if self.template.get("mode", "combinatorial") != "combinatorial":
+            return None
+
+        combos = 1
+        for values in self.template.get("fields", {}).values():
+            combos *= len(values)
+        return len(self.inputs) + combos
+
+    def iter_inputs(self) -> Iterator[Dict[str, Any]]:
+        if not self.template:
+            yield from itertools.cycle(self.inputs)
+            return
+
+        fixed = self.template.get("fixed") or {}
+        fields: Dict[str, List[Any]] = self.template.get("fields") or {}
+        names = list(fields)
+
+        if self.template.get("mode", "combinatorial") == "combinatorial":
+            while True:
+                yield from self.inputs
+                for values in itertools.product(*(fields[n] for n in names)):
+                    yield {**fixed, **dict(zip(names, values))}
+        else:
+            while True:
+                if self.inputs and self.rng.random() < 0.5:
+                    yield self.rng.choice(self.inputs)
+                else:
+                    yield {**fixed, **{n: self.rng.choice(fields[n]) for n in names}}
+
+
+def load_streams(data: Dict[str, Any], seed: int) -> List[TrafficStream]:
+    """
+    `streams` lists several (team, agent) sources; a config without it
+    (the original single-agent format) is one stream.
+    """
+    defaults = {k: v for k, v in data.items() if k != "streams"}
+    stream_cfgs = data.get("streams") or [defaults]
+    return [TrafficStream(cfg, defaults, seed) for cfg in stream_cfgs]
+
+
+def plan_requests(
+    streams: List[TrafficStream],
+    total: Optional[int],
+    seed: int,
+) -> Iterator[tuple]:
+    """
+    Deterministic (sequence, stream, input) schedule; streams are picked
+    by weight. Unbounded when `total` is None.
+    """
+    rng = random.Random(seed)
+    iterators = [s.iter_inputs() for s in streams]
+    weights = [s.weight for s in streams]
+    indexes = list(range(len(streams)))
+
+    counter = itertools.count() if total is None else range(total)
+    for seq in counter:
+        i = rng.choices(indexes, weights)[0] if len(streams) > 1 else 0
+        yield seq, streams[i], next(iterators[i])
+
+
+# ---------- TRAFFIC GENERATOR ----------
+
+class TrafficGenerator:
+    """
+    Open-loop load generator: request i is released at start + i / rps
+    (or immediately when no rate is set), with at most `concurrency`
+    requests in flight. Late releases are counted as schedule lag.
+    """
+
+    def __init__(
+        self,
+        streams: List[TrafficStream],
+        target_rps: Optional[float] = None,
+        concurrency: int = 8,
+        total_requests: Optional[int] = None,
+        duration_seconds: Optional[float] = None,
+        seed: int = 42,
+        client_factory: Optional[PortkeyClientFactory] = None,
+    ):
+        if total_requests is None and duration_seconds is None:
+            total_requests = sum(s.distinct_inputs() or 1 for s in streams)
+
+        self.streams = streams
+        self.target_rps = target_rps
+        self.concurrency = concurrency
+        self.total_requests = total_requests
+        self.duration_seconds = duration_seconds
+        self.seed = seed
+
+        self.client_factory = client_factory or PortkeyClientFactory(
+            http_cfg={
+                "max_connections": concurrency,
+                "max_keepalive_connections": concurrency,
             }
-        ).chat.completions.create(
-            messages = [
-                {"role": "system", "content": system_prompt},
-                {"role": "user", "content": str(input)}
-            ],
-            model="@openai/gpt-3.5-turbo"
         )
+        self._clients: Dict[str, Any] = {}
 
+        self._lock = threading.Lock()
+        self._slots = threading.BoundedSemaphore(concurrency)
+        self.latencies: List[float] = []
+        self.per_stream: Dict[str, Dict[str, int]] = {}
+        self.errors: Dict[str, int] = {}
+        self.max_lag = 0.0
 
+    def _build_clients(self) -> None:
+        ## One client per stream, all sharing the factory's connection pool.
+        portkey = self.client_factory.get_client()
+        for stream in self.streams:
+            self._clients[stream.name] = portkey.with_options(metadata=stream.metadata)
 
-if __name__ == "__main__":
-    main()
+    # ---------- SEND ----------
+
+    def _send(self, stream: TrafficStream, input_data: Dict[str, Any]) -> None:
+        start = time.perf_counter()
+        error = None
+
+        try:
+            self._clients[stream.name].chat.completions.create(
+                messages=[
+                    {"role": "system", "content": stream.system_prompt},
+                    {"role": "user", "content": json.dumps(input_data)},
+                ],
+                model=stream.model,
+            )
+        except Exception as e:
+            status = getattr(e, "status_code", None)
+            error = f"{type(e).__name__}" + (f"({status})" if status else "")
+        finally:
+            self._slots.release()
+
+        elapsed = time.perf_counter() - start
+
+        with self._lock:
+            counts = self.per_stream.setdefault(stream.name, {"ok": 0, "error": 0})
+            if error:
+                counts["error"] += 1
+                self.errors[error] = self.errors.get(error, 0) + 1
+            else:
+                counts["ok"] += 1
+                self.latencies.append(elapsed)
+
+    # ---------- RUN ----------
+
+    def run(self) -> Dict[str, Any]:
+        print(
+            f"[TrafficGenerator] streams={len(self.streams)} "
+            f"rps={self.target_rps or 'max'} concurrency={self.concurrency} "
+            f"requests={self.total_requests or '-'} "
+            f"duration={self.duration_seconds or '-'}s seed={self.seed}"
+        )
+
+        self._build_clients()
+
+        sent = 0
+        start = time.perf_counter()
+        deadline = start + self.duration_seconds if self.duration_seconds else None
+
+        with ThreadPoolExecutor(max_workers=self.concurrency) as pool:
+            for seq, stream, input_data in plan_requests(
+                self.streams, self.total_requests, self.seed
+            ):
+                if self.target_rps:
+                    release = start + seq / self.target_rps
+                    delay = release - time.perf_counter()
+                    if delay > 0:
+                        time.sleep(delay)
+
+                if deadline is None:
+                    self._slots.acquire()
+                ## A full pool must not hold the run past its deadline.
+                elif not self._slots.acquire(
+                    timeout=max(0.0, deadline - time.perf_counter())
+                ):
+                    break
 
+                if self.target_rps:
+                    lag = time.perf_counter() - (start + seq / self.target_rps)
+                    self.max_lag = max(self.max_lag, lag)
 
+                pool.submit(self._send, stream, input_data)
+                sent += 1
 
+        return self.report(sent, time.perf_counter() - start)
 
+    def report(self, sent: int, elapsed: float) -> Dict[str, Any]:
+        latencies = sorted(self.latencies)
 
+        def pct(q: float) -> Optional[float]:
+            if not latencies:
+                return None
+            return round(latencies[min(len(latencies) - 1, int(q * len(latencies)))] * 1000, 1)
 
+        ok = sum(c["ok"] for c in self.per_stream.values())
+        failed = sum(c["error"] for c in self.per_stream.values())
 
+        return {
+            "seed": self.seed,
+            "sent": sent,
+            "ok": ok,
+            "errors": failed,
+            "error_rate": round(failed / sent, 4) if sent else 0.0,
+            "elapsed_seconds": round(elapsed, 3),
+            "target_rps": self.target_rps,
+            "achieved_rps": round(sent / elapsed, 2) if elapsed else None,
+            "max_schedule_lag_seconds": round(self.max_lag, 3),
+            "latency_ms": {"p50": pct(0.5), "p95": pct(0.95), "p99": pct(0.99)},
+            "per_stream": self.per_stream,
+            "error_types": self.errors,
+        }
 
 
+def main():
+    parser = argparse.ArgumentParser(
+        description="Synthetic traffic generator for seeding agent logs"
+    )
+    parser.add_argument("config", help="JSON config (see data/input1.json)")
+    parser.add_argument("--rps", type=float, help="Target requests per second")
+    parser.add_argument("--concurrency", type=int, help="Max requests in flight")
+    parser.add_argument("--requests", type=int, help="Total requests to send")
+    parser.add_argument("--duration", type=float, help="Stop after N seconds")
+    parser.add_argument("--seed", type=int, help="Seed for input expansion")
+    parser.add_argument("--report", help="Write the JSON report here")
+    parser.add_argument(
+        "--dry-run", action="store_true",
+        help="Print the expanded inputs instead of sending them",
+    )
+
+    args = parser.parse_args()
+
+    config = load_config(args.config)
+    data = vars(config)
+
+    ## CLI flags override the JSON config.
+    seed = args.seed if args.seed is not None else data.get("seed", 42)
+    streams = load_streams(data, seed)
+
+    total = args.requests or data.get("total_requests")
+    duration = args.duration or data.get("duration_seconds")
+
+    for stream in streams:
+        print(
+            f"Stream {stream.name}: model={stream.model} "
+            f"distinct inputs={stream.distinct_inputs() or 'unbounded'}"
+        )
+
+    if args.dry_run:
+        for seq, stream, input_data in plan_requests(streams, total or 10, seed):
+            print(f"#{seq} {stream.name}: {json.dumps(input_data)}")
+        return
+
+    generator = TrafficGenerator(
+        streams,
+        target_rps=args.rps or data.get("target_rps"),
+        concurrency=args.concurrency or data.get("concurrency", 8),
+        total_requests=total,
+        duration_seconds=duration,
+        seed=seed,
+    )
+
+    report = json.dumps(generator.run(), indent=2)
+    print(report)
+
+    if args.report:
+        with open(args.report, "w", encoding="utf-8") as f:
+            f.write(report)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,449 @@
+import importlib
+import json
+import os
+import socket
+import sqlite3
+import time
+import uuid
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional
+
+## Task kinds: replay one trace on one model, judge one (trace, model) output.
+REPLAY = "replay"
+JUDGE = "judge"
+
+## Task states.
+PENDING = "pending"
+LEASED = "leased"
+DONE = "done"
+FAILED = "failed"
+
+
+class Task:
+    """
+    One (agent, model, trace) unit of replay or judge work. `payload`
+    carries everything a worker needs (input, output, cost, ...), so
+    workers never read the scheduler's export files.
+    """
+
+    __slots__ = (
+        "id", "run_id", "kind", "agent", "model", "trace_id",
+        "payload", "attempts", "lease_owner",
+    )
+
+    def __init__(
+        self,
+        kind: str,
+        agent: str,
+        model: str,
+        trace_id: str,
+        payload: Dict[str, Any],
+        run_id: str = "",
+        id: Optional[int] = None,
+        attempts: int = 0,
+        lease_owner: Optional[str] = None,
+    ):
+        self.id = id
+        self.run_id = run_id
+        self.kind = kind
+        self.agent = agent
+        self.model = model
+        self.trace_id = trace_id
+        self.payload = payload
+        self.attempts = attempts
+        self.lease_owner = lease_owner
+
+    def __repr__(self) -> str:
+        return (
+            f"Task(id={self.id}, kind={self.kind}, agent={self.agent}, "
+            f"model={self.model}, trace={self.trace_id}, attempt={self.attempts})"
+        )
+
+
+class TaskQueueBackend:
+    """
+    Durable queue interface. Delivery is at-least-once: a task whose lease
+    expires (worker died or stalled past the visibility timeout) becomes
+    visible again. Completion is fenced on (lease owner, attempt), so a
+    late worker cannot overwrite the outcome of the attempt that replaced
+    it, and results are written with idempotent upserts keyed on
+    (trace_id, agent, model).
+    """
+
+    @classmethod
+    def from_config(cls, config: Dict[str, Any]) -> Optional["TaskQueueBackend"]:
+        """
+        Build the queue from the task_queue section, or None when disabled.
+
+        `backend` is "sqlite" or "package.module:ClassName" for another
+        TaskQueueBackend, which receives the section's `options`.
+        """
+        cfg = config.get("task_queue") or {}
+        if not cfg.get("enabled", False):
+            return None
+
+        backend = cfg.get("backend", "sqlite")
+        if backend == "sqlite":
+            return SQLiteTaskQueue(
+                db_path=cfg.get("db_path", "tasks.db"),
+                visibility_timeout=float(cfg.get("visibility_timeout", 300)),
+                max_attempts=int(cfg.get("max_attempts", 3)),
+            )
+
+        module_name, _, class_name = backend.partition(":")
+        backend_cls = getattr(importlib.import_module(module_name), class_name)
+        return backend_cls(**(cfg.get("options") or {}))
+
+    def enqueue(self, tasks: Iterable[Task]) -> int:
+        """
+        Add tasks; ones already queued for the same run are ignored.
+        Returns the number of new tasks.
+        """
+        raise NotImplementedError
+
+    def lease(
+        self,
+        worker_id: str,
+        limit: int = 1,
+        kinds: Optional[List[str]] = None,
+    ) -> List[Task]:
+        """
+        Claim up to `limit` visible tasks for `visibility_timeout` seconds.
+        """
+        raise NotImplementedError
+
+    def extend(self, tasks: Iterable[Task]) -> int:
+        """
+        Push out the lease deadline of tasks still being worked on.
+        """
+        raise NotImplementedError
+
+    def complete(self, task: Task, usage: Optional[Dict[str, Any]] = None) -> bool:
+        """
+        Mark a leased task done. False if the lease was lost meanwhile.
+        """
+        raise NotImplementedError
+
+    def fail(self, task: Task, error: str, delay: float = 0) -> bool:
+        """
+        Record a failed attempt: retried after `delay` until
+        `max_attempts`, then failed for good.
+        """
+        raise NotImplementedError
+
+    def release(self, task: Task, delay: float = 0) -> bool:
+        """
+        Hand a task back without counting the attempt (e.g. its model's
+        circuit breaker is open).
+        """
+        raise NotImplementedError
+
+    def counts(
+        self,
+        run_id: str,
+        agent: Optional[str] = None,
+        kind: Optional[str] = None,
+    ) -> Dict[str, int]:
+        """
+        Number of tasks per state.
+        """
+        raise NotImplementedError
+
+    def usage(self, run_id: str) -> List[Dict[str, Any]]:
+        """
+        Token usage reported by completed tasks, per (agent, stage, model).
+        """
+        raise NotImplementedError
+
+    def failures(self, run_id: str) -> List[Dict[str, Any]]:
+        raise NotImplementedError
+
+
+class SQLiteTaskQueue(TaskQueueBackend):
+    """
+    Default backend: one SQLite file (WAL mode) shared by the scheduler
+    and any number of worker processes on hosts that can reach it.
+    Leasing runs in an IMMEDIATE transaction so two workers never claim
+    the same task.
+    """
+
+    def __init__(
+        self,
+        db_path: str = "tasks.db",
+        visibility_timeout: float = 300,
+        max_attempts: int = 3,
+    ):
+        self.db_path = Path(db_path)
+        self.visibility_timeout = visibility_timeout
+        self.max_attempts = max_attempts
+        self._init_db()
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA busy_timeout = 30000")
+        return conn
+
+    # ---------- INIT ----------
+
+    def _init_db(self) -> None:
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+
+        conn = self._connect()
+        try:
+            conn.execute("PRAGMA journal_mode = WAL")
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS tasks (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+
+                    run_id TEXT NOT NULL,
+                    kind TEXT NOT NULL,
+                    agent TEXT NOT NULL,
+                    model TEXT NOT NULL,
+                    trace_id TEXT NOT NULL,
+                    payload TEXT NOT NULL,
+
+                    status TEXT NOT NULL DEFAULT 'pending',
+                    attempts INTEGER NOT NULL DEFAULT 0,
+                    available_at REAL NOT NULL DEFAULT 0,
+                    lease_owner TEXT,
+                    lease_expires_at REAL,
+                    last_error TEXT,
+
+                    usage_model TEXT,
+                    prompt_tokens INTEGER,
+                    completion_tokens INTEGER,
+
+                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                    finished_at TIMESTAMP,
+
+                    UNIQUE(run_id, kind, trace_id, agent, model)
+                )
+            """)
+
+            conn.execute("""
+                CREATE INDEX IF NOT EXISTS idx_tasks_visible
+                ON tasks(status, available_at)
+            """)
+
+            conn.execute("""
+                CREATE INDEX IF NOT EXISTS idx_tasks_run
+                ON tasks(run_id, agent, kind, status)
+            """)
+        finally:
+            conn.close()
+
+    # ---------- PRODUCER ----------
+
+    def enqueue(self, tasks: Iterable[Task]) -> int:
+        params = [
+            (t.run_id, t.kind, t.agent, t.model, t.trace_id, json.dumps(t.payload))
+            for t in tasks
+        ]
+
+        conn = self._connect()
+        try:
+            conn.execute("BEGIN")
+            before = conn.total_changes
+            conn.executemany("""
+                INSERT OR IGNORE INTO tasks (
+                    run_id, kind, agent, model, trace_id, payload
+                )
+                VALUES (?, ?, ?, ?, ?, ?)
+            """, params)
+            added = conn.total_changes - before
+            conn.execute("COMMIT")
+        finally:
+            conn.close()
+
+        return added
+
+    # ---------- CONSUMER ----------
+
+    def lease(
+        self,
+        worker_id: str,
+        limit: int = 1,
+        kinds: Optional[List[str]] = None,
+    ) -> List[Task]:
+        now = time.time()
+        kind_filter = ""
+        params: List[Any] = [now, now, self.max_attempts]
+
+        if kinds:
+            kind_filter = f"AND kind IN ({','.join('?' * len(kinds))})"
+            params.extend(kinds)
+        params.append(limit)
+
+        conn = self._connect()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+
+            ## Expired leases are visible again; so are pending retries
+            ## once their backoff has passed.
+            rows = conn.execute(f"""
+                SELECT * FROM tasks
+                WHERE (
+                    (status = 'pending' AND available_at <= ?)
+                    OR (status = 'leased' AND lease_expires_at <= ?)
+                )
+                AND attempts < ?
+                {kind_filter}
+                ORDER BY id
+                LIMIT ?
+            """, params).fetchall()
+
+            conn.executemany("""
+                UPDATE tasks
+                SET status = 'leased',
+                    attempts = attempts + 1,
+                    lease_owner = ?,
+                    lease_expires_at = ?
+                WHERE id = ?
+            """, [(worker_id, now + self.visibility_timeout, row["id"]) for row in rows])
+
+            ## Tasks whose last lease expired on the final attempt.
+            conn.execute("""
+                UPDATE tasks
+                SET status = 'failed',
+                    last_error = COALESCE(last_error, 'lease expired'),
+                    finished_at = CURRENT_TIMESTAMP
+                WHERE status = 'leased' AND lease_expires_at <= ? AND attempts >= ?
+            """, (now, self.max_attempts))
+
+            conn.execute("COMMIT")
+        finally:
+            conn.close()
+
+        return [
+            Task(
+                kind=row["kind"],
+                agent=row["agent"],
+                model=row["model"],
+                trace_id=row["trace_id"],
+                payload=json.loads(row["payload"]),
+                run_id=row["run_id"],
+                id=row["id"],
+                attempts=row["attempts"] + 1,
+                lease_owner=worker_id,
+            )
+            for row in rows
+        ]
+
+    def extend(self, tasks: Iterable[Task]) -> int:
+        deadline = time.time() + self.visibility_timeout
+        return self._update("""
+            UPDATE tasks SET lease_expires_at = ?
+            WHERE id = ? AND status = 'leased' AND lease_owner = ? AND attempts = ?
+        """, [(deadline, t.id, t.lease_owner, t.attempts) for t in tasks])
+
+    def complete(self, task: Task, usage: Optional[Dict[str, Any]] = None) -> bool:
+        usage = usage or {}
+        return bool(self._update("""
+            UPDATE tasks
+            SET status = 'done',
+                usage_model = ?,
+                prompt_tokens = ?,
+                completion_tokens = ?,
+                last_error = NULL,
+                finished_at = CURRENT_TIMESTAMP
+            WHERE id = ? AND status = 'leased' AND lease_owner = ? AND attempts = ?
+        """, [(
+            usage.get("model"),
+            usage.get("prompt_tokens"),
+            usage.get("completion_tokens"),
+            task.id, task.lease_owner, task.attempts,
+        )]))
+
+    def fail(self, task: Task, error: str, delay: float = 0) -> bool:
+        return bool(self._update("""
+            UPDATE tasks
+            SET status = CASE WHEN attempts >= ? THEN 'failed' ELSE 'pending' END,
+                available_at = ?,
+                lease_owner = NULL,
+                lease_expires_at = NULL,
+                last_error = ?,
+                finished_at = CASE WHEN attempts >= ? THEN CURRENT_TIMESTAMP END
+            WHERE id = ? AND status = 'leased' AND lease_owner = ? AND attempts = ?
+        """, [(
+            self.max_attempts, time.time() + delay, error[:2000], self.max_attempts,
+            task.id, task.lease_owner, task.attempts,
+        )]))
+
+    def release(self, task: Task, delay: float = 0) -> bool:
+        return bool(self._update("""
+            UPDATE tasks
+            SET status = 'pending',
+                attempts = attempts - 1,
+                available_at = ?,
+                lease_owner = NULL,
+                lease_expires_at = NULL
+            WHERE id = ? AND status = 'leased' AND lease_owner = ? AND attempts = ?
+        """, [(time.time() + delay, task.id, task.lease_owner, task.attempts)]))
+
+    def _update(self, query: str, params: List[tuple]) -> int:
+        conn = self._connect()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            before = conn.total_changes
+            conn.executemany(query, params)
+            changed = conn.total_changes - before
+            conn.execute("COMMIT")
+        finally:
+            conn.close()
+        return changed
+
+    # ---------- MONITORING ----------
+
+    def counts(
+        self,
+        run_id: str,
+        agent: Optional[str] = None,
+        kind: Optional[str] = None,
+    ) -> Dict[str, int]:
+        query = "SELECT status, COUNT(*) AS n FROM tasks WHERE run_id = ?"
+        params: List[Any] = [run_id]
+
+        if agent is not None:
+            query += " AND agent = ?"
+            params.append(agent)
+        if kind is not None:
+            query += " AND kind = ?"
+            params.append(kind)
+
+        counts = {PENDING: 0, LEASED: 0, DONE: 0, FAILED: 0}
+        for row in self._fetch(query + " GROUP BY status", params):
+            counts[row["status"]] = row["n"]
+        return counts
+
+    def usage(self, run_id: str) -> List[Dict[str, Any]]:
+        return self._fetch("""
+            SELECT
+                agent,
+                kind AS stage,
+                usage_model AS model,
+                TOTAL(prompt_tokens) AS prompt_tokens,
+                TOTAL(completion_tokens) AS completion_tokens
+            FROM tasks
+            WHERE run_id = ? AND status = 'done' AND usage_model IS NOT NULL
+            GROUP BY agent, kind, usage_model
+        """, [run_id])
+
+    def failures(self, run_id: str) -> List[Dict[str, Any]]:
+        return self._fetch("""
+            SELECT agent, kind, model, trace_id, attempts, last_error
+            FROM tasks
+            WHERE run_id = ? AND status = 'failed'
+            ORDER BY id
+        """, [run_id])
+
+    def _fetch(self, query: str, params: List[Any]) -> List[Dict[str, Any]]:
+        conn = self._connect()
+        try:
+            return [dict(row) for row in conn.execute(query, params).fetchall()]
+        finally:
+            conn.close()
+
+
+def default_worker_id() -> str:
+    return f"{socket.gethostname()}-{os.getpid()}-{uuid.uuid4().hex[:6]}"
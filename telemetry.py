@@ -0,0 +1,350 @@
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import IO, Any, Dict, Iterator, List, Optional, Tuple
+
+DEFAULT_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+
+## Span tags promoted to metric labels; everything else stays on the span.
+LABEL_TAGS = ("agent", "model")
+
+LabelKey = Tuple[Tuple[str, str], ...]
+
+
+def _label_key(labels: Dict[str, Any]) -> LabelKey:
+    return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _fmt_labels(key: LabelKey, extra: Optional[Tuple[str, str]] = None) -> str:
+    pairs = list(key) + ([extra] if extra else [])
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in pairs) + "}"
+
+
+class Telemetry:
+    """
+    Timing spans, counters and latency histograms for one scheduler process.
+
+    Spans are folded into per-stage totals for the JSON run summary and,
+    when a spans file is open, streamed to it as they finish; nothing is
+    kept per span, so memory does not grow with the number of LLM calls.
+    Counters and histograms are exposed in Prometheus text format, either
+    as a textfile or over HTTP.
+    """
+
+    def __init__(self, buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        self.buckets = tuple(sorted(buckets))
+        self._lock = threading.Lock()
+        self._server: Optional[ThreadingHTTPServer] = None
+        ## JSON documents served next to /metrics (kept across runs).
+        self._documents: Dict[str, Any] = {}
+        ## Set while a run is profiled; notified of every span.
+        self.profiler = None
+        self._spans_file: Optional[IO[str]] = None
+        self.reset()
+
+    @classmethod
+    def from_config(cls, config: Dict[str, Any]) -> "Telemetry":
+        cfg = config.get("telemetry") or {}
+        buckets = cfg.get("latency_buckets")
+        return cls(tuple(buckets)) if buckets else cls()
+
+    def reset(self, spans_path: Optional[str] = None) -> None:
+        """
+        Clear everything recorded so far (called at the start of each run)
+        and stream this run's spans to `spans_path`, if given.
+        """
+        self.close_spans()
+
+        with self._lock:
+            ## name -> count, total, max, errors and duration buckets.
+            self.stages: Dict[str, Dict[str, Any]] = {}
+            self.counters: Dict[str, Dict[LabelKey, float]] = {}
+            self.histograms: Dict[str, Dict[LabelKey, Dict[str, Any]]] = {}
+            self.started_at = time.time()
+
+            if spans_path:
+                self._spans_file = open(spans_path, "w", encoding="utf-8")
+
+    def close_spans(self) -> None:
+        with self._lock:
+            if self._spans_file is not None:
+                self._spans_file.close()
+                self._spans_file = None
+
+    # ---------- SPANS ----------
+
+    @contextmanager
+    def span(self, name: str, **tags: Any) -> Iterator[Dict[str, Any]]:
+        """
+        Time a block. The yielded dict can be used to add tags (e.g. rows).
+        """
+        start_wall = time.time()
+        start = time.perf_counter()
+        error = None
+
+        profiler = self.profiler
+        active = profiler.enter(name) if profiler is not None else None
+
+        try:
+            yield tags
+        except BaseException as e:
+            error = type(e).__name__
+            raise
+        finally:
+            duration = time.perf_counter() - start
+
+            if active is not None:
+                profiler.exit(active)
+
+            with self._lock:
+                self._add_stage(name, duration, error)
+
+                if self._spans_file is not None:
+                    record = {
+                        "name": name,
+                        "start": start_wall,
+                        "duration_s": duration,
+                        "tags": tags,
+                    }
+                    if error:
+                        record["error"] = error
+                    self._spans_file.write(json.dumps(record, default=str) + "\n")
+
+            labels = {k: tags[k] for k in LABEL_TAGS if k in tags}
+            self.observe("stage_duration_seconds", duration, stage=name, **labels)
+
+    def _add_stage(self, name: str, duration: float, error: Optional[str]) -> None:
+        ## Called with the lock held.
+        stage = self.stages.get(name)
+        if stage is None:
+            stage = {
+                "count": 0, "total_s": 0.0, "max_s": 0.0, "errors": 0,
+                "buckets": [0] * len(self.buckets),
+            }
+            self.stages[name] = stage
+
+        stage["count"] += 1
+        stage["total_s"] += duration
+        stage["max_s"] = max(stage["max_s"], duration)
+        if error:
+            stage["errors"] += 1
+        for i, bound in enumerate(self.buckets):
+            if duration <= bound:
+                stage["buckets"][i] += 1
+                break
+
+    def _quantile(self, stage: Dict[str, Any], q: float) -> float:
+        """
+        Upper bound of the bucket holding the q-quantile, capped at the
+        stage's max (exact per-span durations are not kept).
+        """
+        rank = q * stage["count"]
+        seen = 0
+        for bound, count in zip(self.buckets, stage["buckets"]):
+            seen += count
+            if seen >= rank:
+                return min(bound, stage["max_s"])
+        return stage["max_s"]
+
+    # ---------- METRICS ----------
+
+    def inc(self, name: str, value: float = 1, **labels: Any) -> None:
+        key = _label_key(labels)
+        with self._lock:
+            series = self.counters.setdefault(name, {})
+            series[key] = series.get(key, 0) + value
+
+    def observe(self, name: str, value: float, **labels: Any) -> None:
+        key = _label_key(labels)
+        with self._lock:
+            series = self.histograms.setdefault(name, {})
+            hist = series.get(key)
+            if hist is None:
+                hist = {"buckets": [0] * len(self.buckets), "sum": 0.0, "count": 0}
+                series[key] = hist
+
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    hist["buckets"][i] += 1
+            hist["sum"] += value
+            hist["count"] += 1
+
+    def record_llm_call(
+        self,
+        stage: str,
+        model: str,
+        response: Any,
+        seconds: float,
+        agent: Optional[str] = None,
+    ) -> None:
+        """
+        Count one completion: call, latency, token usage and gateway cache hit.
+        Token counts also carry the agent so spend can be attributed.
+        """
+        self.inc("llm_calls_total", stage=stage, model=model)
+        self.observe("llm_call_latency_seconds", seconds, stage=stage, model=model)
+
+        usage = getattr(response, "usage", None)
+        if usage is not None:
+            self.record_tokens(
+                stage, model,
+                {kind: getattr(usage, kind, None) for kind in ("prompt_tokens", "completion_tokens")},
+                agent=agent,
+            )
+
+        get_headers = getattr(response, "get_headers", None)
+        headers = (get_headers() if callable(get_headers) else None) or {}
+        if str(headers.get("x-portkey-cache-status", "")).lower() in ("hit", "semantic hit"):
+            self.inc("cache_hits_total", stage=stage, model=model)
+
+    def record_tokens(
+        self,
+        stage: str,
+        model: str,
+        usage: Dict[str, Any],
+        agent: Optional[str] = None,
+    ) -> None:
+        """
+        Count prompt/completion tokens from a usage mapping (also used for
+        batch API results, which arrive as plain JSON).
+        """
+        labels = {"agent": agent} if agent else {}
+        for kind in ("prompt_tokens", "completion_tokens"):
+            tokens = usage.get(kind)
+            if tokens:
+                self.inc(
+                    "llm_tokens_total", tokens,
+                    stage=stage, model=model, kind=kind.split("_")[0],
+                    **labels,
+                )
+
+    def counter(self, name: str) -> List[Dict[str, Any]]:
+        """
+        Snapshot of one counter as [{"labels": {...}, "value": ...}].
+        """
+        with self._lock:
+            series = dict(self.counters.get(name, {}))
+        return [{"labels": dict(key), "value": value} for key, value in series.items()]
+
+    # ---------- EXPOSITION ----------
+
+    def render_prometheus(self) -> str:
+        lines: List[str] = []
+
+        with self._lock:
+            for name, series in sorted(self.counters.items()):
+                lines.append(f"# TYPE {name} counter")
+                for key, value in series.items():
+                    lines.append(f"{name}{_fmt_labels(key)} {value}")
+
+            for name, series in sorted(self.histograms.items()):
+                lines.append(f"# TYPE {name} histogram")
+                for key, hist in series.items():
+                    for bound, count in zip(self.buckets, hist["buckets"]):
+                        lines.append(
+                            f"{name}_bucket{_fmt_labels(key, ('le', str(bound)))} {count}"
+                        )
+                    lines.append(
+                        f"{name}_bucket{_fmt_labels(key, ('le', '+Inf'))} {hist['count']}"
+                    )
+                    lines.append(f"{name}_sum{_fmt_labels(key)} {hist['sum']}")
+                    lines.append(f"{name}_count{_fmt_labels(key)} {hist['count']}")
+
+        return "\n".join(lines) + "\n"
+
+    def write_prometheus(self, path: str) -> None:
+        """
+        Write a node_exporter textfile atomically.
+        """
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(self.render_prometheus())
+        os.replace(tmp_path, path)
+
+    def summary(self) -> Dict[str, Any]:
+        """
+        Per-stage span totals and counters. p50/p95 are bucket upper
+        bounds (see `buckets`), not exact percentiles.
+        """
+        with self._lock:
+            counters = {
+                name: [{"labels": dict(key), "value": value} for key, value in series.items()]
+                for name, series in self.counters.items()
+            }
+            stages = {
+                name: {
+                    "count": stage["count"],
+                    "total_s": stage["total_s"],
+                    "p50_s": self._quantile(stage, 0.5),
+                    "p95_s": self._quantile(stage, 0.95),
+                    "max_s": stage["max_s"],
+                    "errors": stage["errors"],
+                }
+                for name, stage in self.stages.items()
+            }
+
+        return {
+            "started_at": self.started_at,
+            "finished_at": time.time(),
+            "stages": stages,
+            "counters": counters,
+        }
+
+    def write_summary(self, path: str) -> None:
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(self.summary(), f, indent=2, default=str)
+
+    def publish(self, path: str, payload: Any) -> None:
+        """
+        Serve `payload` as JSON at `path` (e.g. /recommendations).
+        """
+        body = json.dumps(payload, indent=2, default=str).encode("utf-8")
+        with self._lock:
+            self._documents["/" + path.strip("/")] = body
+
+    def serve(self, port: int, host: str = "0.0.0.0") -> None:
+        """
+        Serve /metrics and any published JSON documents over HTTP from a
+        background thread.
+        """
+        telemetry = self
+
+        class MetricsHandler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                path = self.path.split("?", 1)[0].rstrip("/")
+                with telemetry._lock:
+                    document = telemetry._documents.get(path)
+
+                if document is not None:
+                    body, content_type = document, "application/json"
+                elif path == "/metrics":
+                    body = telemetry.render_prometheus().encode("utf-8")
+                    content_type = "text/plain; version=0.0.4"
+                else:
+                    self.send_error(404)
+                    return
+
+                self.send_response(200)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        self._server = ThreadingHTTPServer((host, port), MetricsHandler)
+        self._server.daemon_threads = True
+        threading.Thread(
+            target=self._server.serve_forever, name="metrics-http", daemon=True
+        ).start()
+        print(f"[Telemetry] Serving metrics on http://{host}:{port}/metrics")
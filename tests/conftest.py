@@ -0,0 +1,30 @@
+import os
+import sqlite3
+import sys
+
+import pytest
+
+## The modules live flat at the repository root.
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+@pytest.fixture
+def sqlite_connections(monkeypatch):
+    """
+    Every sqlite3 connection opened during the test, and those closed.
+    """
+    opened, closed = [], []
+    connect = sqlite3.connect
+
+    class Tracked(sqlite3.Connection):
+        def close(self):
+            closed.append(self)
+            super().close()
+
+    def tracked(*args, **kwargs):
+        conn = connect(*args, factory=Tracked, **kwargs)
+        opened.append(conn)
+        return conn
+
+    monkeypatch.setattr(sqlite3, "connect", tracked)
+    return opened, closed
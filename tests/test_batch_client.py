@@ -0,0 +1,60 @@
+import pytest
+from portkey_ai import Portkey
+
+from batch_client import BatchClient
+from mock_gateway import MockGateway
+
+MESSAGES = [{"role": "system", "content": "sys"}, {"role": "user", "content": "hi"}]
+
+
+@pytest.fixture
+def gateway():
+    with MockGateway(
+        seed=7, latency_ms=1, latency_jitter_ms=0, export_delay_ms=0,
+        failed_batch_providers=["@anthropic"],
+    ) as gateway:
+        yield gateway
+
+
+def _client(gateway, tmp_path, **kwargs) -> BatchClient:
+    portkey = Portkey(api_key="mock", base_url=gateway.base_url)
+    cfg = dict(work_dir=str(tmp_path), poll_interval=0.01)
+    cfg.update(kwargs)
+    return BatchClient(portkey, **cfg)
+
+
+def _requests(*models: str) -> list:
+    return [
+        BatchClient.request(f"{i}:{model}", model, MESSAGES)
+        for i, model in enumerate(models)
+    ]
+
+
+def test_results_map_back_by_custom_id(gateway, tmp_path):
+    results = _client(gateway, tmp_path).run("replay", _requests("@openai/gpt-4o", "@openai/gpt-4o-mini"))
+
+    assert sorted(results) == ["0:@openai/gpt-4o", "1:@openai/gpt-4o-mini"]
+    assert all(r.error is None and r.content for r in results.values())
+
+
+def test_failed_job_fails_only_its_own_requests(gateway, tmp_path):
+    results = _client(gateway, tmp_path).run(
+        "replay", _requests("@openai/gpt-4o", "@anthropic/claude-3-5-haiku", "@openai/gpt-4o-mini"),
+    )
+
+    assert results["0:@openai/gpt-4o"].content
+    assert results["2:@openai/gpt-4o-mini"].content
+
+    failed = results["1:@anthropic/claude-3-5-haiku"]
+    assert failed.body is None
+    assert "failed" in failed.error
+
+
+def test_timed_out_job_is_reported_per_request(gateway, tmp_path):
+    gateway.state.export_delay_ms = 60_000
+
+    results = _client(gateway, tmp_path, max_wait_seconds=0.05).run(
+        "judge", _requests("@openai/gpt-4o")
+    )
+
+    assert "still in_progress" in results["0:@openai/gpt-4o"].error
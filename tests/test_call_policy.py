@@ -0,0 +1,107 @@
+import threading
+import time
+
+import pytest
+
+from call_policy import CallPolicy
+
+
+class _Flaky:
+    def __init__(self, errors):
+        self.errors = list(errors)
+        self.calls = 0
+
+    def __call__(self, timeout):
+        self.calls += 1
+        if self.errors:
+            raise self.errors.pop(0)
+        return "ok"
+
+
+class _Status(Exception):
+    def __init__(self, status_code):
+        super().__init__(f"status {status_code}")
+        self.status_code = status_code
+
+
+def _policy(**hedge):
+    cfg = {"max_retries": 2, "backoff_base": 0, "timeout_seconds": 5}
+    if hedge:
+        cfg["hedge"] = dict(enabled=True, min_samples=1, **hedge)
+    return CallPolicy(cfg, seed=1)
+
+
+def test_retries_retryable_errors_up_to_max_retries():
+    policy = _policy()
+    fn = _Flaky([TimeoutError(), _Status(503)])
+
+    assert policy.call("m", fn) == "ok"
+    assert fn.calls == 3
+    assert policy.stats["retries"] == 2
+
+    with pytest.raises(_Status):
+        policy.call("m", _Flaky([_Status(429)] * 3))
+    assert policy.stats["failures"] == 1
+
+
+def test_client_errors_are_not_retried():
+    policy = _policy()
+    fn = _Flaky([_Status(400)])
+
+    with pytest.raises(_Status):
+        policy.call("m", fn)
+    assert fn.calls == 1
+    assert policy.stats["retries"] == 0
+
+
+def test_hedge_budget_respects_ratio_and_cap():
+    policy = _policy(max_ratio=0.5, max_hedges=2)
+
+    policy.stats["calls"] = 1
+    assert not policy._take_hedge_budget()
+
+    policy.stats["calls"] = 10
+    assert policy._take_hedge_budget()
+    assert policy._take_hedge_budget()
+    assert not policy._take_hedge_budget()
+    assert policy.stats["hedges"] == 2
+
+
+def test_slow_primary_is_hedged_and_hedge_wins():
+    policy = _policy(max_ratio=1.0, percentile=50)
+    policy._record_latency("m", 0.05)
+    calls = []
+
+    def fn(timeout):
+        calls.append(threading.current_thread().name)
+        if len(calls) == 1:
+            time.sleep(1.0)
+            return "primary"
+        return "hedge"
+
+    started = time.monotonic()
+    assert policy.call("m", fn) == "hedge"
+    assert time.monotonic() - started < 0.5
+    assert policy.stats["hedge_wins"] == 1
+    assert calls[1].startswith("hedge")
+    policy.close()
+
+
+def test_primaries_are_not_limited_by_the_hedge_pool():
+    policy = _policy(max_ratio=0.0, max_workers=1)
+    policy._record_latency("m", 10.0)
+
+    def fn(timeout):
+        time.sleep(0.2)
+        return "ok"
+
+    threads = [threading.Thread(target=policy.call, args=("m", fn)) for _ in range(4)]
+    started = time.monotonic()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    ## One pool worker would serialize these to ~0.8s.
+    assert time.monotonic() - started < 0.6
+    policy.close()
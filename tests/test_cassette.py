@@ -0,0 +1,147 @@
+import json
+
+import httpx
+import pytest
+
+from cassette import RECORD, REPLAY, Cassette
+
+URL = "https://api.portkey.ai/v1/logs/exports"
+
+
+def _key(cassette: Cassette, body=None, url=URL, method="POST", headers=None, content_type="application/json"):
+    raw = json.dumps(body).encode() if body is not None else b""
+    return cassette.key(method, url, raw, content_type, headers or {})
+
+
+@pytest.fixture
+def cassette(tmp_path) -> Cassette:
+    cassette = Cassette(path=str(tmp_path / "pipeline.db"), mode=RECORD)
+    yield cassette
+    cassette.close()
+
+
+def test_key_ignores_time_window_key_order_and_host(cassette):
+    body = {
+        "filters": {"time_of_generation_min": "2026-01-16T00:00:00Z", "metadata": {"team": "t"}},
+        "workspace_id": "w",
+    }
+    other_window = {
+        "workspace_id": "w",
+        "filters": {"metadata": {"team": "t"}, "time_of_generation_min": "2026-01-17T00:00:00Z"},
+    }
+
+    assert _key(cassette, body) == _key(cassette, other_window)
+    assert _key(cassette, body) == _key(cassette, body, url="http://127.0.0.1:8787/v1/logs/exports")
+    assert _key(cassette, body) != _key(cassette, {**body, "workspace_id": "x"})
+
+
+def test_key_ignores_signatures_and_query_order(cassette):
+    signed = "https://bucket.s3.amazonaws.com/export.jsonl?b=2&a=1&X-Amz-Signature=abc&X-Amz-Date=1"
+    resigned = "https://bucket.s3.amazonaws.com/export.jsonl?a=1&X-Amz-Signature=def&b=2"
+
+    assert _key(cassette, url=signed, method="GET") == _key(cassette, url=resigned, method="GET")
+    assert _key(cassette, url=signed, method="GET") != _key(
+        cassette, url=signed.replace("a=1", "a=2"), method="GET"
+    )
+
+
+def test_key_matches_routing_headers_and_multipart_boundaries(cassette):
+    body = {"messages": []}
+    assert _key(cassette, body, headers={"x-portkey-provider": "openai"}) != _key(
+        cassette, body, headers={"x-portkey-provider": "anthropic"}
+    )
+
+    def upload(boundary: str) -> str:
+        raw = f"--{boundary}\r\ncontent\r\n--{boundary}--\r\n".encode()
+        return cassette.key("POST", URL, raw, f"multipart/form-data; boundary={boundary}", {})
+
+    assert upload("aaa111") == upload("bbb222")
+
+
+def _client(cassette: Cassette, handler) -> httpx.Client:
+    return httpx.Client(transport=cassette.transport(httpx.MockTransport(handler)))
+
+
+def test_recorded_responses_replay_in_order(cassette):
+    calls = []
+
+    def live(request):
+        calls.append(request.method)
+        if request.method == "GET":
+            return httpx.Response(200, json={"status": ["started", "success"][calls.count("GET") - 1]})
+        if len(calls) == 3:
+            return httpx.Response(503, json={"error": "busy"})
+        return httpx.Response(200, json={"id": f"export-{len(calls)}"})
+
+    with _client(cassette, live) as client:
+        assert client.post(URL, json={}).json() == {"id": "export-1"}
+        assert client.post(URL, json={}).json() == {"id": "export-2"}
+        ## Transient failures are never recorded.
+        assert client.post(URL, json={}).status_code == 503
+        client.get(URL)
+        client.get(URL)
+
+    replay = Cassette(path=str(cassette.path), mode=REPLAY)
+    with _client(replay, lambda request: pytest.fail("went live")) as client:
+        assert client.post(URL, json={}).json() == {"id": "export-1"}
+        assert client.post(URL, json={}).json() == {"id": "export-2"}
+        assert client.post(URL, json={}).json() == {"id": "export-2"}
+        ## Status polls get the final recorded status.
+        assert client.get(URL).json() == {"status": "success"}
+
+    assert replay.stats == {"hits": 4, "misses": 0, "recorded": 0}
+    replay.close()
+
+
+def test_strict_replay_miss_fails_without_going_live(cassette):
+    replay = Cassette(path=str(cassette.path), mode=REPLAY, strict=True)
+
+    with _client(replay, lambda request: pytest.fail("went live")) as client:
+        response = client.post(URL, json={"unrecorded": True})
+
+    assert response.status_code == 404
+    assert response.headers["x-cassette-miss"] == "1"
+    assert replay.stats["misses"] == 1
+    assert replay.missed == [f"POST {URL}"]
+    replay.close()
+
+
+def test_lenient_replay_miss_goes_live_and_records(cassette):
+    replay = Cassette(path=str(cassette.path), mode=REPLAY, strict=False)
+
+    with _client(replay, lambda request: httpx.Response(200, json={"live": True})) as client:
+        assert client.post(URL, json={"new": True}).json() == {"live": True}
+    with _client(replay, lambda request: pytest.fail("went live")) as client:
+        replay.reset()
+        assert client.post(URL, json={"new": True}).json() == {"live": True}
+
+    assert replay.stats["hits"] == 1
+    replay.close()
+
+
+def test_recording_passes_event_streams_through_chunk_by_chunk(cassette):
+    produced = []
+
+    def events():
+        for piece in (b"data: 1\n\n", b"data: 2\n\n", b"data: [DONE]\n\n"):
+            produced.append(piece)
+            yield piece
+
+    def live(request):
+        return httpx.Response(200, headers={"content-type": "text/event-stream"}, content=events())
+
+    with _client(cassette, live) as client:
+        with client.stream("POST", URL, json={"stream": True}) as response:
+            chunks = response.iter_raw()
+            assert next(chunks) == b"data: 1\n\n"
+            ## The first event reached the caller before the rest was read.
+            assert produced == [b"data: 1\n\n"]
+            assert cassette.stats["recorded"] == 0
+            rest = b"".join(chunks)
+
+    assert cassette.stats["recorded"] == 1
+
+    replay = Cassette(path=str(cassette.path), mode=REPLAY)
+    with _client(replay, lambda request: pytest.fail("went live")) as client:
+        assert client.post(URL, json={"stream": True}).content == b"data: 1\n\n" + rest
+    replay.close()
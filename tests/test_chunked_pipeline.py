@@ -0,0 +1,77 @@
+import itertools
+import threading
+import time
+
+import pytest
+
+from chunked_pipeline import ChunkedPipeline
+
+
+def _pipeline(**workers) -> ChunkedPipeline:
+    return ChunkedPipeline(queue_size=1, workers=workers)
+
+
+def test_items_pass_every_stage_and_none_drops():
+    pipeline = _pipeline(double=3)
+    seen = []
+    lock = threading.Lock()
+
+    def collect(item):
+        with lock:
+            seen.append(item)
+        return item
+
+    done = pipeline.run(
+        range(10),
+        [
+            pipeline.stage("double", lambda x: x * 2),
+            pipeline.stage("odd", lambda x: None if x % 4 else x),
+            pipeline.stage("collect", collect),
+        ],
+    )
+
+    assert done == 5
+    assert sorted(seen) == [0, 4, 8, 12, 16]
+
+
+def test_stage_error_stops_an_endless_source():
+    pipeline = _pipeline()
+    read = itertools.count()
+
+    def judge(item):
+        if item == 3:
+            raise RuntimeError("judge failed")
+        return item
+
+    with pytest.raises(RuntimeError, match="judge failed"):
+        pipeline.run(read, [pipeline.stage("judge", judge)])
+
+    ## The reader blocked on the bounded queue instead of running ahead.
+    assert next(read) < 10
+
+
+def test_source_error_is_reraised_after_draining():
+    pipeline = _pipeline()
+    handled = []
+
+    def source():
+        yield 1
+        yield 2
+        raise ValueError("bad export")
+
+    with pytest.raises(ValueError, match="bad export"):
+        pipeline.run(source(), [pipeline.stage("write", handled.append)])
+
+
+def test_first_error_wins_and_workers_exit():
+    pipeline = _pipeline(replay=4)
+    before = threading.active_count()
+
+    def replay(item):
+        time.sleep(0.01)
+        raise RuntimeError(f"replay {item}")
+
+    with pytest.raises(RuntimeError, match="replay"):
+        pipeline.run(range(100), [pipeline.stage("replay", replay), pipeline.stage("judge", str)])
+
+    assert threading.active_count() == before
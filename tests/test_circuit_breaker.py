@@ -0,0 +1,105 @@
+import pytest
+
+import circuit_breaker
+from circuit_breaker import CLOSED, HALF_OPEN, OPEN, CircuitBreaker, CircuitBreakerRegistry
+
+
+class _Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = _Clock()
+    monkeypatch.setattr(circuit_breaker.time, "monotonic", clock)
+    return clock
+
+
+def _breaker(**kwargs) -> CircuitBreaker:
+    cfg = dict(window=4, min_calls=2, error_rate=0.5, cooldown_seconds=10, half_open_probes=1)
+    cfg.update(kwargs)
+    return CircuitBreaker("m", **cfg)
+
+
+def test_opens_on_error_rate_and_probes_after_cooldown(clock):
+    breaker = _breaker()
+
+    breaker.record_failure("boom")
+    assert breaker.state == CLOSED
+    breaker.record_failure("boom")
+    assert breaker.state == OPEN
+    assert not breaker.allow()
+
+    clock.now += 10
+    assert breaker.allow()
+    assert breaker.state == HALF_OPEN
+    ## One probe at a time.
+    assert not breaker.allow()
+
+    breaker.record_success(0.1)
+    assert breaker.state == CLOSED
+    assert breaker.allow()
+
+
+def test_failed_probe_reopens(clock):
+    breaker = _breaker()
+    breaker.record_failure("a")
+    breaker.record_failure("b")
+
+    clock.now += 10
+    assert breaker.allow()
+    breaker.record_failure("still down")
+
+    assert breaker.state == OPEN
+    assert "probe failed" in breaker.last_reason
+    assert not breaker.allow()
+
+
+def test_slow_success_counts_as_failure(clock):
+    breaker = _breaker(latency_threshold_seconds=1.0)
+    breaker.record_success(5.0)
+    breaker.record_success(5.0)
+    assert breaker.state == OPEN
+
+
+def test_unprefixed_model_has_a_single_breaker(clock):
+    registry = CircuitBreakerRegistry(
+        dict(window=4, min_calls=2, error_rate=0.5, cooldown_seconds=10)
+    )
+
+    registry.record_failure("mock-model", "boom")
+    assert [b["state"] for b in registry.snapshot()] == [CLOSED]
+
+    registry.record_failure("mock-model", "boom")
+    assert not registry.allow("mock-model")[0]
+
+    clock.now += 10
+    assert registry.allow("mock-model") == (True, "")
+    registry.record_success("mock-model", 0.1)
+    assert [b["state"] for b in registry.snapshot()] == [CLOSED]
+
+
+def test_provider_probe_is_released_when_model_breaker_rejects(clock):
+    registry = CircuitBreakerRegistry(
+        dict(window=4, min_calls=2, error_rate=0.5, cooldown_seconds=10)
+    )
+    provider, model = registry.breakers_for("@openai/gpt-4o")
+
+    for breaker in (provider, model):
+        breaker.record_failure("down")
+        breaker.record_failure("down")
+
+    ## Provider cools down first; the model breaker is still open.
+    model.opened_at += 5
+    clock.now += 10
+
+    allowed, reason = registry.allow("@openai/gpt-4o")
+    assert not allowed and "@openai/gpt-4o" in reason
+    assert provider.state == HALF_OPEN
+
+    ## The probe slot went back: another model of the provider may probe.
+    assert registry.allow("@openai/gpt-4o-mini") == (True, "")
@@ -0,0 +1,59 @@
+import pytest
+
+from cost_planner import CostPlan, CostPlanner
+
+
+class _Counter:
+    def count_batch(self, texts):
+        return [len(t) // 4 for t in texts]
+
+
+def _planner(**budget_cfg):
+    return CostPlanner(config={}, budget_cfg=budget_cfg, counter=_Counter())
+
+
+def _plan(replay, judge=1.0):
+    plan = CostPlan("agent8", traces=100)
+    plan.models = list(replay)
+    for model, usd in replay.items():
+        plan.lines[(model, "replay")] = {"tokens": 0, "usd": usd}
+    plan.lines[("judge-model", "judge")] = {"tokens": 0, "usd": judge}
+    return plan
+
+
+def test_downsample_only_when_it_fits():
+    plan = _plan({"a": 10, "b": 5})
+    _planner(min_sample_fraction=0.1)._fit(plan, budget=9.0)
+
+    ## 10 + 5 + 3 judge passes = 18 at full volume.
+    assert plan.models == ["a", "b"]
+    assert plan.sample_fraction == pytest.approx(0.5)
+    assert plan.cost() == pytest.approx(9.0)
+
+
+def test_drops_only_models_needed_for_min_sample_fraction():
+    plan = _plan({"m40": 40, "m30": 30, "m15": 15, "m10": 10})
+    _planner(min_sample_fraction=0.1)._fit(plan, budget=5.0)
+
+    assert plan.dropped_models == ["m40", "m30"]
+    assert plan.models == ["m15", "m10"]
+    ## 15 + 10 + 3 judge passes = 28 at full volume.
+    assert plan.sample_fraction == pytest.approx(5 / 28)
+    assert plan.cost() == pytest.approx(5.0)
+
+
+def test_drop_models_keeps_full_volume():
+    plan = _plan({"m40": 40, "m30": 30, "m15": 15, "m10": 10})
+    _planner(strategy="drop_models")._fit(plan, budget=30.0)
+
+    assert plan.models == ["m15", "m10"]
+    assert plan.sample_fraction == 1.0
+    assert plan.cost() <= 30.0
+
+
+def test_skips_agent_when_judge_alone_does_not_fit():
+    plan = _plan({"a": 10}, judge=10.0)
+    _planner(min_sample_fraction=0.5)._fit(plan, budget=1.0)
+
+    assert plan.models == []
+    assert plan.sample_fraction == 0.0
@@ -0,0 +1,21 @@
+from eval_metric_store import EvalMetricStore
+
+
+def test_every_call_closes_its_connection(tmp_path, sqlite_connections):
+    opened, closed = sqlite_connections
+
+    store = EvalMetricStore(str(tmp_path / "metrics.db"))
+    store.upsert_evaluation("t1", "a", "m", quality_score=8, run_id="run")
+    store.upsert_evaluations([{"trace_id": "t2", "agent": "a", "model": "m", "quality_score": 6}], "run")
+    store.upsert_stream_metrics([{"trace_id": "t1", "agent": "a", "model": "m", "ttft_ms": 200.0}])
+    store.record_spend("run", [{"agent": "a", "model": "m", "stage": "replay", "planned_usd": 1.0}])
+    assert store.acquire_lease("daily", "me", 60)
+    assert store.renew_lease("daily", "me", 60)
+    store.release_lease("daily", "me")
+
+    assert store.aggregate_model_metrics("run")[0]["traces"] == 2
+    assert len(store.evaluation_rows(run_id="run")) == 2
+    assert len(store.agent_metric_rows("a", "run")) == 2
+
+    assert opened
+    assert closed == opened
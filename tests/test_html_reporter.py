@@ -0,0 +1,129 @@
+import json
+import os
+
+import pytest
+
+from eval_metric_store import EvalMetricStore
+from html_reporter import HTMLReporter
+
+TRACES = 5
+
+
+def _write_export(path: str, model: str) -> str:
+    with open(path, "w") as f:
+        for i in range(TRACES):
+            f.write(json.dumps({
+                "trace_id": f"{model}-{i}",
+                "request": {"messages": [{"role": "system", "content": "sys"}, {"role": "user", "content": f"q{i}"}]},
+                "response": {"choices": [{"message": {"content": f"{model} a{i}"}}]},
+                "cost": 0.1,
+                "response_time": 100 + i,
+                "metadata": {} if model == "baseline" else {"source_trace_id": f"baseline-{i}"},
+            }) + "\n")
+    return path
+
+
+def _evaluations(agent: str, model: str, quality: float = 4.0) -> list:
+    return [
+        {
+            "trace_id": f"baseline-{i}", "agent": agent, "model": model,
+            "response_time_ms": 100 + 10 * i, "cost": 0.1 * (i + 1),
+            "quality_score": quality, "verdicts": json.dumps({"accuracy": quality}),
+        }
+        for i in range(TRACES)
+    ]
+
+
+@pytest.fixture
+def report(tmp_path):
+    store = EvalMetricStore(str(tmp_path / "metrics.db"))
+    reporter = HTMLReporter(store, str(tmp_path), page_size=2, histogram_bins=4)
+
+    exports = {}
+    for agent in ("agent8", "agent9"):
+        os.makedirs(tmp_path / agent)
+        exports[agent] = {
+            model: _write_export(str(tmp_path / agent / f"{model}.jsonl"), model)
+            for model in ("baseline", "gpt-4o-mini")
+        }
+        for model in exports[agent]:
+            store.upsert_evaluations(_evaluations(agent, model), run_id="run-2")
+
+    ## An earlier run's model must not leak into this run's report.
+    store.upsert_evaluations(
+        [dict(row, trace_id=f"old-{i}") for i, row in enumerate(_evaluations("agent8", "gpt-3.5"))],
+        run_id="run-1",
+    )
+    return store, reporter, exports
+
+
+def _read(tmp_path, *parts) -> str:
+    with open(os.path.join(str(tmp_path), *parts)) as f:
+        return f.read()
+
+
+def test_trace_table_is_paginated(tmp_path, report):
+    _, reporter, exports = report
+    reporter.write_html_report(exports, run_id="run-2")
+
+    data_dir = tmp_path / "report" / "data" / "agent8"
+    assert sorted(os.listdir(data_dir)) == ["page-00001.js", "page-00002.js", "page-00003.js"]
+
+    page = _read(data_dir, "page-00003.js")
+    assert page.startswith("reportPage(") and page.endswith(");\n")
+    rows = json.loads(page[len("reportPage("):-len(");\n")])["rows"]
+    assert [row["trace_id"] for row in rows] == ["baseline-4"]
+    assert rows[0]["input"] == "q4"
+    assert rows[0]["models"]["gpt-4o-mini"]["output"] == "gpt-4o-mini a4"
+    assert rows[0]["models"]["gpt-4o-mini"]["verdicts"] == {"accuracy": 4.0}
+
+    html = _read(tmp_path, "evaluation_report.html")
+    assert 'data-pages="3"' in html
+
+
+def test_report_shows_only_the_given_run(tmp_path, report):
+    _, reporter, exports = report
+    reporter.write_html_report(exports, run_id="run-2")
+
+    html = _read(tmp_path, "evaluation_report.html")
+    assert "gpt-4o-mini" in html
+    assert "gpt-3.5" not in html
+
+
+def test_histograms_share_bins_across_models(tmp_path, report):
+    _, reporter, exports = report
+    reporter.write_html_report(exports, run_id="run-2")
+
+    section = _read(tmp_path, "report", "sections", "agent-agent8.html")
+    assert 'aria-label="Latency (ms) histogram for baseline"' in section
+    assert 'aria-label="Cost (USD) histogram for gpt-4o-mini"' in section
+    ## 4 bins per chart, 2 models, 2 metrics.
+    assert section.count("<rect ") == 16
+    assert section.count("100 &ndash; 140") == 2
+
+
+def test_unchanged_sections_and_pages_are_not_rewritten(tmp_path, report, capsys):
+    store, reporter, exports = report
+    reporter.write_html_report(exports, run_id="run-2")
+
+    def mtimes(agent):
+        root = tmp_path / "report"
+        return (
+            os.stat(root / "sections" / f"agent-{agent}.html").st_mtime_ns,
+            [os.stat(root / "data" / agent / name).st_mtime_ns for name in sorted(os.listdir(root / "data" / agent))],
+        )
+
+    before = {agent: mtimes(agent) for agent in exports}
+    capsys.readouterr()
+
+    ## Only agent9's last trace changed.
+    store.upsert_evaluations(
+        [dict(_evaluations("agent9", "gpt-4o-mini")[4], quality_score=1.0)], run_id="run-2"
+    )
+    reporter.write_html_report(exports, run_id="run-2")
+
+    out = capsys.readouterr().out
+    assert "agent=agent9: 1 of 3 trace pages written" in out
+    assert "2 of 3 sections regenerated" in out
+    assert mtimes("agent8") == before["agent8"]
+    assert mtimes("agent9")[1][:2] == before["agent9"][1][:2]
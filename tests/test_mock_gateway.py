@@ -0,0 +1,23 @@
+import requests
+
+from mock_gateway import MockGateway
+
+
+def _export(gateway, team):
+    res = requests.post(f"{gateway.base_url}/logs/exports", json={
+        "filters": {"metadata": {"team": team, "agent": "agent8"}, "ai_model": "gpt-4o"},
+    })
+    res.raise_for_status()
+    return res.json()["total"]
+
+
+def test_eval_export_without_replays_is_empty():
+    with MockGateway(export_rows=5, export_delay_ms=0) as gateway:
+        assert _export(gateway, "portkey") == 0
+        assert _export(gateway, "team1") == 5
+
+
+def test_errors_are_drawn_per_attempt():
+    with MockGateway(seed=1, error_rate=0.5) as gateway:
+        outcomes = {gateway.state.inject_error() for _ in range(20)}
+    assert outcomes == {True, False}
@@ -0,0 +1,101 @@
+import numpy as np
+import pytest
+
+from model_analysis import BASELINE, EvaluationFrame, ModelAnalyzer, pareto_frontier
+
+TRACES = 40
+
+
+def _rows(agent: str, model: str, quality, cost: float, latency: float) -> list:
+    return [
+        (agent, model, f"t{i}", quality(i), cost, latency)
+        for i in range(TRACES)
+    ]
+
+
+@pytest.fixture
+def frame() -> EvaluationFrame:
+    rows = (
+        _rows("agent8", BASELINE, lambda i: 4.0, 1.0, 100)
+        ## Same quality on average (+/-0.1 per trace), half the cost.
+        + _rows("agent8", "cheap", lambda i: 4.0 + (0.1 if i % 2 else -0.1), 0.5, 100)
+        ## Cheapest, but clearly worse.
+        + _rows("agent8", "weak", lambda i: 2.0, 0.4, 90)
+        ## Worse than "cheap" on every axis.
+        + _rows("agent8", "dominated", lambda i: 3.5, 0.8, 120)
+        ## An agent without baseline traces.
+        + _rows("agent9", "cheap", lambda i: 4.0, 0.5, 100)
+    )
+    return EvaluationFrame(rows)
+
+
+def _analyzer(**kwargs) -> ModelAnalyzer:
+    cfg = dict(bootstrap_samples=500, min_paired_traces=30, max_bootstrap_cells=1000)
+    cfg.update(kwargs)
+    return ModelAnalyzer(**cfg)
+
+
+def test_pareto_frontier_keeps_non_dominated_and_tied_points():
+    points = np.array([
+        [1.0, 5.0],
+        [2.0, 2.0],
+        [2.0, 2.0],
+        [3.0, 3.0],
+        [5.0, 1.0],
+    ])
+
+    assert pareto_frontier(points).tolist() == [True, True, True, False, True]
+    assert pareto_frontier(np.zeros((0, 2))).tolist() == []
+
+
+def test_bootstrap_means_resample_each_column():
+    values = np.column_stack((np.arange(TRACES, dtype=float), np.full(TRACES, 2.0)))
+
+    means = _analyzer().bootstrap_means(values, np.random.default_rng(0))
+
+    assert means.shape == (500, 2)
+    assert np.all(means[:, 1] == 2.0)
+    assert 0 < means[:, 0].min() < means[:, 0].max() < TRACES - 1
+    assert abs(means[:, 0].mean() - values[:, 0].mean()) < 0.5
+
+
+def test_cheaper_non_inferior_model_is_recommended(frame):
+    result = _analyzer().analyze(frame, window_days=2, sample_fractions={"agent8": 0.5})
+    agent = result["agents"]["agent8"]
+    models = {m["model"]: m for m in agent["models"]}
+
+    assert {name for name, m in models.items() if m["pareto"]} == {"cheap", "weak"}
+    assert models["cheap"]["quality_diff"] == 0.0
+    assert models["cheap"]["p_non_inferior"] == 1.0
+    assert models["weak"]["p_non_inferior"] == 0.0
+    assert models["cheap"]["saving_per_trace"] == 0.5
+
+    ## 40 traces sampled at 50% over 2 days: 1200 a month.
+    assert agent["monthly_traces"] == 1200
+    assert models["cheap"]["monthly_savings_usd"] == 600.0
+    assert models["cheap"]["monthly_savings_ci"] == [600.0, 600.0]
+
+    assert agent["recommendation"]["model"] == "cheap"
+    assert agent["recommendation"]["monthly_savings_usd"] == 600.0
+
+
+def test_analysis_is_reproducible(frame):
+    first = _analyzer().analyze(frame)["agents"]
+    second = _analyzer().analyze(frame)["agents"]
+
+    assert first == second
+
+
+def test_too_few_pairs_keeps_the_baseline(frame):
+    agent = _analyzer(min_paired_traces=TRACES + 1).analyze(frame)["agents"]["agent8"]
+
+    assert all(m.get("p_non_inferior") is None for m in agent["models"])
+    assert agent["recommendation"]["model"] == BASELINE
+    assert "paired traces" in agent["recommendation"]["reason"]
+
+
+def test_agent_without_baseline_gets_no_recommendation(frame):
+    agent = _analyzer().analyze(frame)["agents"]["agent9"]
+
+    assert agent["recommendation"] is None
+    assert [m["model"] for m in agent["models"]] == ["cheap"]
@@ -0,0 +1,72 @@
+import httpx
+import pytest
+
+from cassette import RECORD, Cassette, CassetteAdapter, CassetteTransport
+from portkey_client import PortkeyClientFactory
+
+HTTP = {
+    "max_connections": 7,
+    "max_keepalive_connections": 3,
+    "keepalive_expiry": 11,
+    "connect_timeout": 2,
+    "read_timeout": 33,
+}
+
+
+@pytest.fixture
+def factory():
+    factory = PortkeyClientFactory(http_cfg=HTTP, api_key="mock", base_url="http://127.0.0.1:1/v1")
+    yield factory
+    factory.close()
+
+
+def _assert_pool(transport: httpx.HTTPTransport) -> None:
+    pool = transport._pool
+    assert pool._max_connections == 7
+    assert pool._max_keepalive_connections == 3
+    assert pool._keepalive_expiry == 11
+
+
+def test_clients_and_sessions_are_built_once_and_shared(factory):
+    client = factory.get_client()
+    session = factory.get_session()
+
+    assert factory.get_client() is client
+    assert factory.get_session() is session
+
+    ## Per-call option copies keep the pooled httpx client.
+    for copy in (client, client.with_options(metadata={"agent": "a"}, trace_id="t")):
+        assert copy._client is factory._http_client
+        assert copy.openai_client._client is factory._http_client
+
+    assert session.get_adapter("https://bucket/export") is session.get_adapter("http://gateway/")
+
+
+def test_pool_limits_and_timeouts_reach_the_transport(factory):
+    factory.get_client()
+    http_client = factory._http_client
+
+    _assert_pool(http_client._transport)
+    assert http_client.timeout == httpx.Timeout(33, connect=2)
+    assert factory.timeout == (2, 33)
+
+    adapter = factory.get_session().get_adapter("https://bucket/export")
+    assert adapter._pool_connections == 7
+    assert adapter._pool_maxsize == 7
+
+
+def test_cassette_wraps_the_pooled_transport(tmp_path):
+    cassette = Cassette(path=str(tmp_path / "pipeline.db"), mode=RECORD)
+    factory = PortkeyClientFactory(http_cfg=HTTP, api_key="mock", cassette=cassette)
+
+    factory.get_client()
+    transport = factory._http_client._transport
+    adapter = factory.get_session().get_adapter("https://bucket/export")
+
+    assert isinstance(transport, CassetteTransport)
+    _assert_pool(transport.inner)
+    assert isinstance(adapter, CassetteAdapter)
+    assert adapter._pool_maxsize == 7
+
+    factory.close()
+    cassette.close()
@@ -0,0 +1,82 @@
+import threading
+import time
+
+from profiler import Profiler
+
+MB = 2 ** 20
+
+
+def _spin(seconds: float) -> int:
+    total = 0
+    end = time.perf_counter() + seconds
+    while time.perf_counter() < end:
+        total += sum(range(1000))
+    return total
+
+
+def _profile(fn) -> Profiler:
+    profiler = Profiler(interval_ms=2, snapshot_depth=0)
+    profiler.start()
+    try:
+        fn(profiler)
+    finally:
+        profiler.stop()
+    return profiler
+
+
+def test_busy_stage_gets_cpu_samples_and_peak_memory(tmp_path):
+    def run(profiler):
+        active = profiler.enter("judge")
+        block = bytearray(8 * MB)
+        del block
+        _spin(0.2)
+        profiler.exit(active)
+
+    profiler = _profile(run)
+    stage = profiler.summary()["stages"]["judge"]
+
+    assert stage["calls"] == 1
+    assert stage["cpu_s"] > 0.1
+    assert stage["samples"] > 10
+    ## The buffer was freed before the span ended: peak, not current.
+    assert stage["peak_traced_mb"] >= 8
+    assert stage["net_traced_mb"] < 1
+    assert any("_spin" in fn["function"] for fn in stage["hot_functions"])
+
+    paths = profiler.write(str(tmp_path))
+    with open(paths["collapsed"]) as f:
+        lines = f.read().splitlines()
+    assert any(line.startswith("judge;") and "_spin" in line for line in lines)
+    assert all(line.rsplit(" ", 1)[1].isdigit() for line in lines)
+
+
+def test_outer_stage_keeps_peak_across_nested_spans():
+    def run(profiler):
+        outer = profiler.enter("replay")
+        block = bytearray(8 * MB)
+        del block
+        inner = profiler.enter("replay.call")
+        profiler.exit(inner)
+        profiler.exit(outer)
+
+    stages = _profile(run).summary()["stages"]
+
+    assert stages["replay"]["peak_traced_mb"] >= 8
+    assert stages["replay.call"]["peak_traced_mb"] < 8
+
+
+def test_finished_threads_leave_no_stacks():
+    def run(profiler):
+        def work():
+            profiler.exit(profiler.enter("judge.call"))
+
+        threads = [threading.Thread(target=work) for _ in range(20)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+
+    profiler = _profile(run)
+
+    assert profiler.summary()["stages"]["judge.call"]["calls"] == 20
+    assert profiler._stacks == {}
@@ -0,0 +1,92 @@
+from types import SimpleNamespace
+
+import pytest
+
+import runner_eval
+from eval_metric_store import EvalMetricStore
+from runner_eval import StreamedCompletion
+
+
+class _Clock:
+    def __init__(self):
+        self.now = 100.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def _chunk(content=None, usage=None):
+    choices = [] if content is None else [SimpleNamespace(delta=SimpleNamespace(content=content))]
+    return SimpleNamespace(choices=choices, usage=usage)
+
+
+def test_consume_times_first_token_gaps_and_throughput(monkeypatch):
+    clock = _Clock()
+    monkeypatch.setattr(runner_eval.time, "perf_counter", clock)
+    closed = []
+
+    class Stream:
+        def __iter__(self):
+            ## The role-only chunk does not count as the first token.
+            for at, chunk in (
+                (100.1, _chunk("")),
+                (100.5, _chunk("Hello")),
+                (100.6, _chunk(" wor")),
+                (100.9, _chunk("ld")),
+                (101.0, _chunk(usage=SimpleNamespace(completion_tokens=6))),
+            ):
+                clock.now = at
+                yield chunk
+
+        def close(self):
+            closed.append(True)
+
+    result = StreamedCompletion.consume(Stream(), started=100.0)
+
+    assert result.chunks == 3
+    assert result.ttft_seconds == pytest.approx(0.5)
+    assert result.inter_token_seconds == pytest.approx(0.2)
+    assert result.total_seconds == pytest.approx(1.0)
+    ## Usage tokens over the time after the first token.
+    assert result.tokens_per_second == pytest.approx(12.0)
+    assert closed == [True]
+
+
+def test_consume_without_usage_counts_chunks(monkeypatch):
+    clock = _Clock()
+    monkeypatch.setattr(runner_eval.time, "perf_counter", clock)
+
+    def stream():
+        clock.now = 100.2
+        yield _chunk("only")
+        clock.now = 100.4
+
+    result = StreamedCompletion.consume(stream(), started=100.0)
+
+    assert result.ttft_seconds == pytest.approx(0.2)
+    assert result.inter_token_seconds is None
+    assert result.tokens_per_second == pytest.approx(5.0)
+
+
+def test_stream_metrics_join_the_judged_row_of_their_run(tmp_path):
+    store = EvalMetricStore(str(tmp_path / "eval.db"))
+    metrics = {"agent": "a", "model": "m", "ttft_ms": 200.0, "inter_token_ms": 20.0, "tokens_per_second": 50.0}
+
+    store.upsert_stream_metrics([
+        {"trace_id": "t1", "run_id": "run-2", **metrics},
+        {"trace_id": "t2", "run_id": "run-2", **metrics, "ttft_ms": 400.0},
+    ])
+    store.upsert_evaluation("t1", "a", "m", response_time_ms=900, cost=0.01, quality_score=8, run_id="run-2")
+
+    (row,) = store.aggregate_model_metrics("run-2")
+    ## t2 was replayed but not judged: it feeds the streaming averages only.
+    assert row["traces"] == 1
+    assert row["avg_quality"] == 8
+    assert row["avg_ttft"] == pytest.approx(300.0)
+    assert store.aggregate_model_metrics("run-1") == []
+    assert [r[2] for r in store.evaluation_rows(run_id="run-2")] == ["t1"]
+
+    ## A later upsert without a run keeps the row's run.
+    store.upsert_stream_metrics([{"trace_id": "t1", **metrics, "ttft_ms": 100.0}])
+    (row,) = store.aggregate_model_metrics("run-2")
+    assert row["avg_ttft"] == pytest.approx(250.0)
@@ -0,0 +1,192 @@
+import json
+import os
+import sqlite3
+
+import pytest
+import yaml
+
+from benchmark import build_bench_config
+from log_extractor import BASELINE_REQUESTED_DATA, EVAL_REQUESTED_DATA
+from mock_gateway import MockGateway
+from scheduler import Scheduler
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+## A daemon slot: the whole window lies before the run starts.
+PAST_WINDOW = ("2026-01-16T00:00:00Z", "2026-01-17T00:00:00Z")
+
+
+@pytest.fixture
+def gateway(monkeypatch):
+    monkeypatch.setenv("PORTKEY_API_KEY", "mock")
+    with MockGateway(
+        agents=["agent8"], seed=7, latency_ms=1, latency_jitter_ms=0,
+        export_rows=6, export_delay_ms=0,
+    ) as gateway:
+        yield gateway
+
+
+def _scheduler(gateway, tmp_path, **overrides) -> Scheduler:
+    path = build_bench_config(
+        os.path.join(ROOT, "config.yaml"), str(tmp_path), gateway.base_url, ["agent8"],
+    )
+    with open(path) as f:
+        config = yaml.safe_load(f)
+
+    config["models"] = config["models"][:2]
+    ## Prompt paths in config.yaml are relative to the repository root.
+    for agent in config["agents"].values():
+        agent["system_prompt_for_runners"] = os.path.join(ROOT, agent["system_prompt_for_runners"])
+        agent["judge"]["prompt_file"] = os.path.join(ROOT, agent["judge"]["prompt_file"])
+    config["analysis"]["bootstrap_samples"] = 50
+    for section, values in overrides.items():
+        config.setdefault(section, {}).update(values)
+
+    with open(path, "w") as f:
+        yaml.safe_dump(config, f)
+    return Scheduler(path)
+
+
+def _evaluated(tmp_path) -> dict:
+    with sqlite3.connect(os.path.join(str(tmp_path), "metrics.db")) as conn:
+        rows = conn.execute("SELECT model, trace_id FROM evaluations").fetchall()
+
+    by_model: dict = {}
+    for model, trace_id in rows:
+        by_model.setdefault(model, set()).add(trace_id)
+    return by_model
+
+
+@pytest.mark.parametrize("batch", [False, True])
+def test_past_window_replays_pair_with_baseline(gateway, tmp_path, batch):
+    scheduler = _scheduler(gateway, tmp_path, export={"batch": batch})
+
+    assert scheduler.run_once(time_window=PAST_WINDOW)
+
+    evaluated = _evaluated(tmp_path)
+    baseline = evaluated.pop("baseline")
+    assert len(baseline) == 6
+    assert sorted(evaluated) == sorted(scheduler.config["models"])
+    for trace_ids in evaluated.values():
+        assert trace_ids == baseline
+
+
+def test_each_run_analyzes_only_its_own_evaluations(gateway, tmp_path):
+    scheduler = _scheduler(gateway, tmp_path, export={"batch": True})
+    agent_dir = os.path.join(scheduler.output_dir, "agent8")
+
+    scheduler.run_once(time_window=PAST_WINDOW)
+    stale = os.path.join(agent_dir, "gpt-4o_logs.jsonl")
+    assert os.path.exists(stale)
+
+    ## The next slot sees no replays for gpt-4o: last run's file must not
+    ## count as this run's traffic.
+    scheduler.config["models"] = scheduler.config["models"][:1]
+    scheduler.run_once(time_window=("2026-01-17T00:00:00Z", "2026-01-18T00:00:00Z"))
+
+    assert not os.path.exists(stale)
+    assert len(_evaluated(tmp_path)["baseline"]) == 12
+
+    with open(os.path.join(scheduler.output_dir, "recommendations.json")) as f:
+        analysis = json.load(f)["agents"]["agent8"]
+    assert analysis["baseline"]["traces"] == 6
+    assert [m["model"] for m in analysis["models"]] == ["@openai/gpt-4o-mini", "baseline"]
+
+
+@pytest.mark.parametrize("batch", [False, True])
+def test_batch_api_replays_pair_with_baseline(gateway, tmp_path, batch):
+    scheduler = _scheduler(
+        gateway, tmp_path,
+        export={"batch": batch}, batch_api={"enabled": True, "poll_interval": 0.01},
+    )
+
+    assert scheduler.run_once(time_window=PAST_WINDOW)
+
+    evaluated = _evaluated(tmp_path)
+    baseline = evaluated.pop("baseline")
+    assert len(baseline) == 6
+    assert sorted(evaluated) == sorted(scheduler.config["models"])
+    for trace_ids in evaluated.values():
+        assert trace_ids == baseline
+
+
+def test_cheaper_model_with_equal_quality_is_recommended(gateway, tmp_path):
+    scheduler = _scheduler(gateway, tmp_path, analysis={"min_paired_traces": 5})
+
+    scheduler.run_once(time_window=PAST_WINDOW)
+
+    with open(os.path.join(scheduler.output_dir, "recommendations.json")) as f:
+        pick = json.load(f)["agents"]["agent8"]["recommendation"]
+    assert pick["model"] == "@openai/gpt-4o-mini"
+    assert pick["confidence"] == 1.0
+
+
+def test_task_queue_rejects_streaming_pipeline(gateway, tmp_path):
+    with pytest.raises(ValueError, match="pipeline.streaming"):
+        _scheduler(
+            gateway, tmp_path,
+            task_queue={"enabled": True, "db_path": str(tmp_path / "tasks.db")},
+            pipeline={"streaming": True},
+        )
+
+
+@pytest.mark.parametrize("batch", [False, True])
+def test_exports_request_only_the_fields_of_their_kind(gateway, tmp_path, batch):
+    scheduler = _scheduler(gateway, tmp_path, export={"batch": batch})
+
+    scheduler.run_once(time_window=PAST_WINDOW)
+
+    requested = {
+        (export["filters"]["metadata"]["team"], tuple(export["requested_data"]))
+        for export in gateway.state.exports.values()
+    }
+    assert requested == {
+        (scheduler.team_id, tuple(BASELINE_REQUESTED_DATA)),
+        ("portkey", tuple(EVAL_REQUESTED_DATA)),
+    }
+
+
+def test_new_scheduler_keeps_other_runs_and_directories(gateway, tmp_path):
+    first = _scheduler(gateway, tmp_path)
+    first.run_once(time_window=PAST_WINDOW)
+
+    other = os.path.join(first.output_dir, "other-team-agent", "baseline.jsonl")
+    os.makedirs(os.path.dirname(other))
+    open(other, "w").close()
+
+    ## A restarted daemon (or another team's scheduler on the same store).
+    Scheduler(first.config_path).run_once(
+        time_window=("2026-01-17T00:00:00Z", "2026-01-18T00:00:00Z")
+    )
+
+    assert os.path.exists(other)
+    assert len(_evaluated(tmp_path)["baseline"]) == 12
+
+
+def test_run_stops_when_its_lease_is_lost(gateway, tmp_path, monkeypatch):
+    scheduler = _scheduler(gateway, tmp_path, scheduler={"lease_ttl_seconds": 0.06})
+    ## Another instance took the lease over: renewals fail from now on.
+    monkeypatch.setattr(scheduler.EvalMetricStore, "renew_lease", lambda *args: False)
+
+    with pytest.raises(RuntimeError, match="Lost run lease"):
+        scheduler.run_once(time_window=PAST_WINDOW)
+
+    assert _evaluated(tmp_path) == {}
+    ## Not released: the row may belong to the new holder.
+    assert scheduler.EvalMetricStore.lease_holder(scheduler._lease_name()) is not None
+
+
+def test_components_share_one_pooled_client_and_session(gateway, tmp_path):
+    scheduler = _scheduler(
+        gateway, tmp_path,
+        http={"max_connections": 5, "read_timeout": 45}, batch_api={"enabled": True},
+    )
+    factory = scheduler.client_factory
+    runner = scheduler._runner("agent8", os.path.join(str(tmp_path), "agent8.jsonl"), None)
+
+    assert scheduler.log_extractor.portkey is scheduler.portkey
+    assert scheduler.log_extractor.session is factory.get_session()
+    assert scheduler.batch_client.portkey is scheduler.portkey
+    assert runner.portkey is scheduler.portkey
+    assert scheduler.portkey._client._transport._pool._max_connections == 5
+    assert scheduler.portkey._client.timeout.read == 45
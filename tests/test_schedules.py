@@ -0,0 +1,64 @@
+from datetime import datetime, timezone
+
+import pytest
+
+from schedules import ALL, LATEST, SKIP, CronTrigger, IntervalTrigger, Schedule
+
+
+def _at(hour: int, minute: int = 0, day: int = 16) -> datetime:
+    return datetime(2026, 1, day, hour, minute, tzinfo=timezone.utc)
+
+
+@pytest.fixture
+def hourly() -> Schedule:
+    return Schedule("hourly", IntervalTrigger(3600))
+
+
+@pytest.mark.parametrize("catch_up", [SKIP, LATEST, ALL])
+def test_on_time_slot_runs_the_window_since_the_previous_slot(hourly, catch_up):
+    assert hourly.due(None, _at(10, 1), catch_up) == ([(_at(9), _at(10))], _at(10))
+    assert hourly.due(_at(9), _at(10, 1), catch_up) == ([(_at(9), _at(10))], _at(10))
+
+
+@pytest.mark.parametrize("catch_up", [SKIP, LATEST, ALL])
+def test_completed_slot_is_not_due_again(hourly, catch_up):
+    assert hourly.due(_at(10), _at(10, 30), catch_up) == ([], None)
+
+
+def test_skip_drops_missed_slots(hourly):
+    assert hourly.due(_at(6), _at(10, 30), SKIP) == ([], _at(10))
+    ## The current slot is on time: only its own window runs.
+    assert hourly.due(_at(6), _at(10, 1), SKIP) == ([(_at(9), _at(10))], _at(10))
+
+
+def test_latest_runs_once_since_the_last_completed_slot(hourly):
+    assert hourly.due(_at(6), _at(10, 30), LATEST) == ([(_at(6), _at(10))], _at(10))
+    assert hourly.due(_at(6), _at(10, 1), LATEST) == ([(_at(6), _at(10))], _at(10))
+
+
+def test_all_runs_each_missed_slot_up_to_the_limit(hourly):
+    windows, slot = hourly.due(_at(6), _at(10, 30), ALL, max_catch_up=10)
+    assert windows == [(_at(h), _at(h + 1)) for h in range(6, 10)]
+    assert slot == _at(10)
+
+    windows, slot = hourly.due(_at(6), _at(10, 30), ALL, max_catch_up=3)
+    assert windows == [(_at(h), _at(h + 1)) for h in range(7, 10)]
+    assert slot == _at(10)
+
+
+def test_all_without_history_runs_only_the_latest_slot(hourly):
+    assert hourly.due(None, _at(10, 30), ALL) == ([(_at(9), _at(10))], _at(10))
+
+
+def test_cron_window_spans_days_without_a_slot():
+    ## Weekdays at 09:00: Monday's run covers the weekend.
+    weekdays = Schedule("weekdays", CronTrigger("0 9 * * 1-5"))
+    friday, monday = _at(9, day=16), _at(9, day=19)
+
+    assert weekdays.due(friday, _at(9, 1, day=19)) == ([(friday, monday)], monday)
+    assert weekdays.due(None, _at(9, 1, day=19)) == ([(friday, monday)], monday)
+
+
+def test_unknown_catch_up_policy_is_rejected(hourly):
+    with pytest.raises(ValueError, match="catch_up"):
+        hourly.due(None, _at(10), "never")
@@ -0,0 +1,141 @@
+import itertools
+import threading
+import time
+from types import SimpleNamespace
+
+import pytest
+
+from synthetic_runner import TrafficGenerator, TrafficStream, load_streams, plan_requests
+
+FIELDS = {"tone": ["formal", "casual"], "segment": ["smb", "enterprise"]}
+
+
+def _stream(agent="a", weight=1, **cfg) -> TrafficStream:
+    return TrafficStream({"agent_id": agent, "weight": weight, **cfg}, {"team_id": "t"}, seed=7)
+
+
+def test_combinatorial_template_walks_every_combination_then_cycles():
+    stream = _stream(
+        inputs=[{"literal": True}],
+        template={"mode": "combinatorial", "fields": FIELDS, "fixed": {"goal": "g"}},
+    )
+
+    inputs = list(itertools.islice(stream.iter_inputs(), 10))
+
+    assert stream.distinct_inputs() == 5
+    assert inputs[0] == {"literal": True}
+    assert inputs[1:5] == [
+        {"goal": "g", "tone": tone, "segment": segment}
+        for tone in FIELDS["tone"] for segment in FIELDS["segment"]
+    ]
+    assert inputs[5:] == inputs[:5]
+
+
+def test_random_template_is_seeded_per_stream():
+    template = {"mode": "random", "fields": FIELDS}
+
+    def draw(seed, agent="a"):
+        stream = TrafficStream({"agent_id": agent, "template": template}, {"team_id": "t"}, seed)
+        return list(itertools.islice(stream.iter_inputs(), 50))
+
+    inputs = draw(7)
+
+    assert _stream(template=template).distinct_inputs() is None
+    assert all(i["tone"] in FIELDS["tone"] and i["segment"] in FIELDS["segment"] for i in inputs)
+    assert {i["tone"] for i in inputs} == set(FIELDS["tone"])
+    assert draw(7) == inputs
+    assert draw(8) != inputs
+    assert draw(7, agent="b") != inputs
+
+
+def test_stream_without_inputs_or_template_is_rejected():
+    with pytest.raises(ValueError, match="neither inputs nor template"):
+        _stream()
+
+
+def test_plan_picks_streams_by_weight_and_is_seeded():
+    streams = load_streams(
+        {
+            "team_id": "t",
+            "streams": [
+                {"agent_id": "heavy", "weight": 3, "inputs": [{"n": i} for i in range(5)]},
+                {"agent_id": "light", "weight": 1, "inputs": [{"n": i} for i in range(5)]},
+            ],
+        },
+        seed=7,
+    )
+
+    def plan(seed):
+        return [(seq, s.name, i["n"]) for seq, s, i in plan_requests(streams, 4000, seed)]
+
+    first = plan(1)
+    heavy = [n for _, name, n in first if name == "t/heavy"]
+
+    assert [seq for seq, _, _ in first] == list(range(4000))
+    assert len(heavy) / len(first) == pytest.approx(0.75, abs=0.03)
+    ## Each stream still walks its own inputs in order.
+    assert heavy[:7] == [0, 1, 2, 3, 4, 0, 1]
+    assert plan(1) == first
+    assert plan(2) != first
+
+
+def _client_factory(create):
+    client = SimpleNamespace(chat=SimpleNamespace(completions=SimpleNamespace(create=create)))
+    return SimpleNamespace(get_client=lambda: SimpleNamespace(with_options=lambda **_: client))
+
+
+def test_duration_stops_a_run_waiting_for_a_free_slot():
+    release = threading.Event()
+    calls = []
+
+    def create(**_):
+        calls.append(1)
+        release.wait(5)
+
+    generator = TrafficGenerator(
+        [_stream(inputs=[{"n": 1}])],
+        concurrency=1,
+        duration_seconds=0.1,
+        client_factory=_client_factory(create),
+    )
+
+    ## The only slot stays busy past the deadline.
+    threading.Timer(0.5, release.set).start()
+    started = time.perf_counter()
+    report = generator.run()
+
+    assert report["sent"] == 1
+    assert len(calls) == 1
+    assert time.perf_counter() - started < 2
+
+
+def test_report_counts_errors_and_latency_percentiles():
+    generator = TrafficGenerator(
+        [_stream(inputs=[{"n": 1}])],
+        target_rps=10,
+        client_factory=_client_factory(lambda **_: None),
+    )
+    generator.latencies = [i / 1000 for i in range(1, 101)]
+    generator.per_stream = {"t/a": {"ok": 100, "error": 0}, "t/b": {"ok": 0, "error": 25}}
+    generator.errors = {"RateLimitError(429)": 25}
+    generator.max_lag = 0.0123
+
+    report = generator.report(sent=125, elapsed=12.5)
+
+    assert report["ok"] == 100
+    assert report["errors"] == 25
+    assert report["error_rate"] == 0.2
+    assert report["achieved_rps"] == 10.0
+    assert report["max_schedule_lag_seconds"] == 0.012
+    assert report["latency_ms"] == {"p50": 51.0, "p95": 96.0, "p99": 100.0}
+    assert report["error_types"] == {"RateLimitError(429)": 25}
+
+
+def test_report_of_an_empty_run():
+    generator = TrafficGenerator([_stream(inputs=[{"n": 1}])], client_factory=_client_factory(None))
+
+    report = generator.report(sent=0, elapsed=0)
+
+    assert report["error_rate"] == 0.0
+    assert report["achieved_rps"] is None
+    assert report["latency_ms"] == {"p50": None, "p95": None, "p99": None}
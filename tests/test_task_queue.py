@@ -0,0 +1,99 @@
+import pytest
+
+import task_queue
+from task_queue import DONE, FAILED, LEASED, PENDING, REPLAY, SQLiteTaskQueue, Task
+
+
+class _Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = _Clock()
+    monkeypatch.setattr(task_queue.time, "time", clock)
+    return clock
+
+
+def _queue(tmp_path, **kwargs) -> SQLiteTaskQueue:
+    cfg = dict(visibility_timeout=30, max_attempts=2)
+    cfg.update(kwargs)
+    queue = SQLiteTaskQueue(db_path=str(tmp_path / "tasks.db"), **cfg)
+    queue.enqueue([Task(REPLAY, "agent8", "m", "t1", {"input": "hi"}, run_id="run")])
+    return queue
+
+
+def test_enqueue_is_idempotent_per_run(clock, tmp_path):
+    queue = _queue(tmp_path)
+
+    assert queue.enqueue([Task(REPLAY, "agent8", "m", "t1", {}, run_id="run")]) == 0
+    assert queue.enqueue([Task(REPLAY, "agent8", "m", "t1", {}, run_id="other")]) == 1
+
+
+def test_expired_lease_is_reoffered_and_fences_the_late_worker(clock, tmp_path):
+    queue = _queue(tmp_path)
+
+    [late] = queue.lease("w1")
+    assert queue.lease("w2") == []
+
+    clock.now += 30
+    [task] = queue.lease("w2")
+    assert task.attempts == 2
+
+    ## The first worker's lease was replaced: it can neither extend nor
+    ## settle the task.
+    assert queue.extend([late]) == 0
+    assert not queue.complete(late)
+    assert not queue.fail(late, "boom")
+
+    assert queue.complete(task, {"model": "m", "prompt_tokens": 3, "completion_tokens": 4})
+    assert queue.counts("run")[DONE] == 1
+    assert queue.usage("run") == [
+        {"agent": "agent8", "stage": REPLAY, "model": "m", "prompt_tokens": 3.0, "completion_tokens": 4.0}
+    ]
+
+
+def test_extend_keeps_the_lease(clock, tmp_path):
+    queue = _queue(tmp_path)
+
+    [task] = queue.lease("w1")
+    clock.now += 20
+    assert queue.extend([task]) == 1
+
+    clock.now += 20
+    assert queue.lease("w2") == []
+    assert queue.counts("run")[LEASED] == 1
+
+
+def test_lease_expiring_on_last_attempt_fails_the_task(clock, tmp_path):
+    queue = _queue(tmp_path)
+
+    queue.lease("w1")
+    clock.now += 30
+    queue.lease("w2")
+    clock.now += 30
+
+    assert queue.lease("w3") == []
+    assert queue.counts("run")[FAILED] == 1
+    assert queue.failures("run")[0]["last_error"] == "lease expired"
+
+
+def test_fail_retries_after_delay_and_release_keeps_the_attempt(clock, tmp_path):
+    queue = _queue(tmp_path, max_attempts=3)
+
+    [task] = queue.lease("w1")
+    assert queue.fail(task, "boom", delay=5)
+    assert queue.lease("w1") == []
+
+    clock.now += 5
+    [task] = queue.lease("w1")
+    assert task.attempts == 2
+
+    assert queue.release(task)
+    assert queue.counts("run")[PENDING] == 1
+    [task] = queue.lease("w1")
+    assert task.attempts == 2
@@ -0,0 +1,40 @@
+import json
+
+import pytest
+
+from telemetry import Telemetry
+
+
+def test_spans_fold_into_stages_and_stream_to_file(tmp_path):
+    path = tmp_path / "spans.jsonl"
+    telemetry = Telemetry(buckets=(0.1, 1.0))
+    telemetry.reset(spans_path=str(path))
+
+    for _ in range(3):
+        with telemetry.span("judge.call", model="m"):
+            pass
+    with pytest.raises(ValueError):
+        with telemetry.span("judge.call", model="m"):
+            raise ValueError("boom")
+
+    telemetry.close_spans()
+
+    records = [json.loads(line) for line in path.read_text().splitlines()]
+    assert [r["name"] for r in records] == ["judge.call"] * 4
+    assert records[-1]["error"] == "ValueError"
+
+    stage = telemetry.summary()["stages"]["judge.call"]
+    assert stage["count"] == 4
+    assert stage["errors"] == 1
+    assert stage["p95_s"] <= stage["max_s"] <= 0.1
+
+
+def test_reset_without_path_keeps_only_totals():
+    telemetry = Telemetry()
+    telemetry.reset()
+
+    with telemetry.span("export"):
+        pass
+
+    assert telemetry.summary()["stages"]["export"]["count"] == 1
+    assert not hasattr(telemetry, "spans")
@@ -0,0 +1,85 @@
+import json
+
+import pytest
+
+from trace_batch import EvaluationBatch, TraceBatch
+from trace_store import TraceStore
+
+
+def _entry(i: int) -> dict:
+    return {
+        "trace_id": f"r{i}",
+        "request": {"messages": [{"role": "system", "content": "sys"}, {"role": "user", "content": f"q{i}"}]},
+        "response": {"choices": [{"message": {"content": f"a{i}"}}]},
+        "cost": i / 10,
+        "response_time": 100 + i,
+        "metadata": {"source_trace_id": f"t{i}"},
+    }
+
+
+@pytest.fixture(params=[False, True], ids=["jsonl", "store"])
+def export(request, tmp_path) -> str:
+    path = tmp_path / "gpt-4o_logs.jsonl"
+    lines = [json.dumps(_entry(i)) + "\n" for i in range(5)]
+    ## Skipped by both readers, so positions stay aligned with store rows.
+    lines.insert(2, "{not json\n")
+    path.write_text("".join(lines))
+
+    if request.param:
+        TraceStore.ingest(str(path))
+    return str(path)
+
+
+def _rows(batch: TraceBatch) -> list:
+    return [
+        (t.trace_id, t.source_trace_id, t.cost, t.response_time, t.bodies())
+        for t in batch
+    ]
+
+
+EXPECTED = [
+    (f"r{i}", f"t{i}", i / 10, 100 + i, (f"q{i}", f"a{i}")) for i in range(5)
+]
+
+
+def test_batch_round_trips_the_export(export):
+    with TraceBatch.from_log_file(export) as batch:
+        assert len(batch) == 5
+        assert _rows(batch) == EXPECTED
+        assert batch[3].input == "q3" and batch[3].output == "a3"
+        assert batch.load_entry(4)["trace_id"] == "r4"
+
+        with pytest.raises(IndexError):
+            batch[5]
+
+
+def test_chunks_cover_the_export_in_order(export):
+    chunks = list(TraceBatch.iter_chunks(export, chunk_size=2))
+
+    assert [(c.start, len(c)) for c in chunks] == [(0, 2), (2, 2), (4, 1)]
+    assert [row for c in chunks for row in _rows(c)] == EXPECTED
+
+    for chunk in chunks:
+        chunk.close()
+
+
+def test_missing_export_raises(tmp_path):
+    with pytest.raises(FileNotFoundError):
+        TraceBatch.from_log_file(str(tmp_path / "missing.jsonl"))
+
+
+def test_evaluation_batch_yields_judge_rows():
+    evals = EvaluationBatch("agent8", "gpt-4o")
+    evals.append("t1", 120, 0.5, 4, {"accuracy": 4})
+    evals.append("t2", None, None, None)
+
+    assert list(evals) == [
+        {
+            "agent": "agent8", "model": "gpt-4o", "trace_id": "t1", "response_time_ms": 120,
+            "cost": 0.5, "quality_score": 4, "verdicts": '{"accuracy":4}',
+        },
+        {
+            "agent": "agent8", "model": "gpt-4o", "trace_id": "t2", "response_time_ms": 0,
+            "cost": 0, "quality_score": 0, "verdicts": None,
+        },
+    ]
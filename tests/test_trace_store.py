@@ -0,0 +1,101 @@
+import json
+
+import pytest
+
+from trace_store import TraceStore
+
+ENTRIES = [
+    {
+        "trace_id": "t1",
+        "created_at": "2026-01-16T00:00:00Z",
+        "ai_model": "gpt-4o",
+        "request": {"messages": [{"role": "system", "content": "sys"}, {"role": "user", "content": "q1"}]},
+        "response": {"choices": [{"message": {"content": "a1"}}]},
+        "total_units": 12,
+        "cost": 0.5,
+        "response_time": 120,
+        "metadata": {"agent": "agent8"},
+    },
+    {
+        "trace_id": "t2",
+        "ai_model": "gpt-4o-mini",
+        "request": {"messages": [{"role": "user", "content": "no system prompt"}]},
+        "total_units": 3,
+        "cost": 0.25,
+        "response_time": 80,
+        ## Replays carry the production trace they replay.
+        "metadata": json.dumps({"source_trace_id": "t1"}),
+    },
+]
+
+
+def _write_export(path, entries=ENTRIES, broken_after: int = 1) -> str:
+    lines = [json.dumps(entry) + "\n" for entry in entries]
+    lines.insert(broken_after, "{not json\n")
+    path.write_text("".join(lines))
+    return str(path)
+
+
+@pytest.fixture
+def export(tmp_path) -> str:
+    return _write_export(tmp_path / "baseline_logs.jsonl")
+
+
+def test_ingest_round_trips_scalars_and_bodies(export):
+    store = TraceStore.ingest(export)
+
+    assert TraceStore.for_log_file(export).db_path == store.db_path
+    assert store.count() == 2
+    assert store.read_columns(["trace_id", "source_trace_id", "model", "cost", "input", "output"]) == {
+        "trace_id": ["t1", "t2"],
+        "source_trace_id": ["t1", "t1"],
+        "model": ["gpt-4o", "gpt-4o-mini"],
+        "cost": [0.5, 0.25],
+        "input": ["q1", None],
+        "output": ["a1", None],
+    }
+    assert store.read_column("created_at", skip_null=True) == ["2026-01-16T00:00:00Z"]
+    assert store.summary() == {
+        "traces": 2, "total_cost": 0.75, "avg_cost": 0.375, "avg_latency": 100.0, "total_units": 15,
+    }
+
+
+def test_line_offsets_point_at_the_original_lines(export):
+    store = TraceStore.ingest(export)
+
+    with open(export, "rb") as f:
+        data = f.read()
+    for trace_id, offset, length in store.iter_rows(["trace_id", "line_offset", "line_length"]):
+        assert json.loads(data[offset:offset + length])["trace_id"] == trace_id
+
+
+def test_body_reader_looks_up_rows_by_position(export):
+    store = TraceStore.ingest(export)
+
+    conn = store.open_body_reader()
+    try:
+        assert TraceStore.read_bodies(conn, 0) == ("q1", "a1")
+        assert TraceStore.read_bodies(conn, 5) == (None, None)
+    finally:
+        conn.close()
+
+
+def test_reingest_replaces_the_store(tmp_path, export):
+    TraceStore.ingest(export)
+    _write_export(tmp_path / "baseline_logs.jsonl", ENTRIES[:1])
+
+    assert TraceStore.ingest(export).count() == 1
+
+
+def test_unknown_column_is_rejected(export):
+    with pytest.raises(ValueError, match="Unknown trace column"):
+        TraceStore.ingest(export).read_column("is_success")
+
+
+def test_ingest_closes_its_connection(export, sqlite_connections):
+    opened, closed = sqlite_connections
+
+    TraceStore.ingest(export)
+
+    assert opened
+    assert closed == opened
@@ -0,0 +1,114 @@
+import pytest
+import yaml
+
+import task_queue
+from task_queue import DONE, FAILED, LEASED, PENDING, REPLAY, SQLiteTaskQueue, Task
+from worker import Worker
+
+
+class _Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = _Clock()
+    monkeypatch.setattr(task_queue.time, "time", clock)
+    return clock
+
+
+@pytest.fixture
+def queue(tmp_path) -> SQLiteTaskQueue:
+    queue = SQLiteTaskQueue(db_path=str(tmp_path / "tasks.db"), visibility_timeout=30, max_attempts=3)
+    queue.enqueue([Task(REPLAY, "agent8", "@openai/m", "t1", {"input": "hi"}, run_id="run")])
+    return queue
+
+
+def _worker(tmp_path, monkeypatch, queue, execute, **breaker) -> Worker:
+    monkeypatch.setenv("PORTKEY_API_KEY", "mock")
+    path = tmp_path / "config.yaml"
+    path.write_text(yaml.safe_dump({
+        "task_queue": {"enabled": True, "retry_delay": 5},
+        "scheduler": {"db_path": str(tmp_path / "metrics.db")},
+        "circuit_breaker": {"cooldown_seconds": 90, **breaker},
+    }))
+
+    worker = Worker(str(path), queue=queue, worker_id="w1")
+    worker.execute = execute
+    return worker
+
+
+def _fail(task):
+    raise RuntimeError("upstream 500")
+
+
+def test_failed_task_is_retried_with_exponential_backoff(clock, tmp_path, monkeypatch, queue):
+    worker = _worker(tmp_path, monkeypatch, queue, _fail)
+
+    for attempt, delay in ((1, 5), (2, 10)):
+        [task] = queue.lease("w1")
+        assert task.attempts == attempt
+        worker._process(task)
+
+        clock.now += delay - 0.1
+        assert queue.lease("w1") == []
+        clock.now += 0.1
+
+    [task] = queue.lease("w1")
+    worker._process(task)
+
+    assert worker.stats["failed"] == 3
+    assert queue.counts("run")[FAILED] == 1
+    assert queue.failures("run")[0]["last_error"] == "RuntimeError: upstream 500"
+
+
+def test_open_breaker_releases_the_task_without_using_an_attempt(clock, tmp_path, monkeypatch, queue):
+    calls = []
+
+    def execute(task):
+        calls.append(task.attempts)
+        raise RuntimeError("upstream 500")
+
+    ## One failure opens the provider breaker.
+    worker = _worker(tmp_path, monkeypatch, queue, execute, min_calls=1, window=1)
+
+    [task] = queue.lease("w1")
+    worker._process(task)
+    clock.now += 5
+    [task] = queue.lease("w1")
+    worker._process(task)
+
+    assert calls == [1]
+    assert worker.stats["released"] == 1
+    assert queue.counts("run")[PENDING] == 1
+
+    ## Back after the breaker cooldown, on the same attempt.
+    clock.now += 89
+    assert queue.lease("w1") == []
+    clock.now += 1
+    [task] = queue.lease("w1")
+    assert task.attempts == 2
+
+
+def test_completing_a_lost_lease_is_fenced(clock, tmp_path, monkeypatch, queue):
+    usage = {"model": "@openai/m", "prompt_tokens": 3, "completion_tokens": 4}
+    worker = _worker(tmp_path, monkeypatch, queue, lambda task: usage)
+
+    [stale] = queue.lease("w1")
+    clock.now += 30
+    [task] = queue.lease("w2")
+
+    worker._process(stale)
+
+    assert worker.stats["lost"] == 1
+    assert worker.stats["done"] == 0
+    assert queue.counts("run")[LEASED] == 1
+    assert queue.usage("run") == []
+
+    ## The new owner settles it.
+    assert queue.complete(task, usage)
+    assert queue.counts("run")[DONE] == 1
@@ -0,0 +1,313 @@
+import json
+import threading
+from array import array
+from pathlib import Path
+from typing import Any, BinaryIO, Dict, Iterator, List, Optional, Tuple
+
+from trace_store import TraceStore, source_trace_id
+
+
+def _extract_input(entry: Dict[str, Any]) -> Optional[str]:
+    try:
+        return entry["request"]["messages"][1]["content"]
+    except (KeyError, IndexError, TypeError):
+        return None
+
+
+def _extract_output(entry: Dict[str, Any]) -> Optional[str]:
+    try:
+        return entry["response"]["choices"][0]["message"]["content"]
+    except (KeyError, IndexError, TypeError):
+        return None
+
+
+class TraceRecord:
+    """
+    Lightweight view of one trace in a TraceBatch. Bodies are read on
+    access (from the TraceStore when there is one) and are not retained.
+    """
+
+    __slots__ = ("batch", "index")
+
+    def __init__(self, batch: "TraceBatch", index: int):
+        self.batch = batch
+        self.index = index
+
+    @property
+    def trace_id(self) -> str:
+        return self.batch.trace_ids[self.index]
+
+    @property
+    def source_trace_id(self) -> str:
+        return self.batch.source_trace_ids[self.index]
+
+    @property
+    def cost(self) -> float:
+        return self.batch.cost[self.index]
+
+    @property
+    def response_time(self) -> float:
+        return self.batch.response_time[self.index]
+
+    @property
+    def input(self) -> Optional[str]:
+        return self.batch.load_bodies(self.index)[0]
+
+    @property
+    def output(self) -> Optional[str]:
+        return self.batch.load_bodies(self.index)[1]
+
+    def bodies(self) -> Tuple[Optional[str], Optional[str]]:
+        """
+        (input, output) with a single read.
+        """
+        return self.batch.load_bodies(self.index)
+
+
+class TraceBatch:
+    """
+    Traces of one export held as compact columns: trace ids (and the
+    production trace each row replays, for eval exports), array-backed
+    cost / latency, and (offset, length) of each JSONL line so request and
+    response bodies can be loaded lazily.
+
+    Bodies come from the TraceStore's projected `bodies` table when the
+    export was ingested, otherwise from the JSONL line. Reads are
+    serialized, so pipeline and hedge threads may share a batch.
+    """
+
+    __slots__ = (
+        "log_file_path",
+        "trace_ids",
+        "source_trace_ids",
+        "cost",
+        "response_time",
+        "offsets",
+        "lengths",
+        "start",
+        "_handle",
+        "_bodies",
+        "_lock",
+    )
+
+    def __init__(self, log_file_path: str, start: int = 0):
+        self.log_file_path = log_file_path
+        ## Position of the first trace in the export (non-zero for chunks).
+        self.start = start
+        self.trace_ids: List[str] = []
+        self.source_trace_ids: List[str] = []
+        self.cost = array("d")
+        self.response_time = array("d")
+        self.offsets = array("q")
+        self.lengths = array("q")
+        self._handle: Optional[BinaryIO] = None
+        ## TraceStore connection; False once the export turned out to have
+        ## no store.
+        self._bodies: Any = None
+        self._lock = threading.Lock()
+
+    # ---------- LOAD ----------
+
+    @classmethod
+    def from_log_file(cls, log_file_path: str) -> "TraceBatch":
+        """
+        Load scalar columns from the ingested TraceStore when present,
+        otherwise from a single pass over the JSONL export.
+        """
+        batch = cls(log_file_path)
+        for row in cls._iter_rows(log_file_path):
+            batch._append(*row)
+
+        print(
+            f"[TraceBatch] Loaded {len(batch)} traces from {log_file_path}"
+        )
+
+        return batch
+
+    @classmethod
+    def iter_chunks(
+        cls,
+        log_file_path: str,
+        chunk_size: int,
+    ) -> Iterator["TraceBatch"]:
+        """
+        Yield consecutive batches of at most `chunk_size` traces, so only
+        one chunk of the export is indexed at a time.
+        """
+        batch = cls(log_file_path)
+        for row in cls._iter_rows(log_file_path):
+            batch._append(*row)
+            if len(batch) >= chunk_size:
+                yield batch
+                batch = cls(log_file_path, start=batch.start + len(batch))
+
+        if len(batch):
+            yield batch
+
+    @staticmethod
+    def _iter_rows(log_file_path: str) -> Iterator[Tuple]:
+        log_path = Path(log_file_path)
+        if not log_path.exists():
+            raise FileNotFoundError(f"Log file not found: {log_path}")
+
+        store = TraceStore.for_log_file(log_file_path)
+        if store is not None:
+            return store.iter_rows(
+                [
+                    "trace_id", "source_trace_id", "cost", "response_time",
+                    "line_offset", "line_length",
+                ]
+            )
+        return TraceBatch._scan_jsonl(log_file_path)
+
+    @staticmethod
+    def _scan_jsonl(log_file_path: str) -> Iterator[Tuple]:
+        offset = 0
+        with open(log_file_path, "rb") as f:
+            for line_no, line in enumerate(f, start=1):
+                length = len(line)
+                try:
+                    entry = json.loads(line)
+                    yield (
+                        entry.get("trace_id", ""),
+                        source_trace_id(entry),
+                        entry.get("cost", 0),
+                        entry.get("response_time", 0),
+                        offset,
+                        length,
+                    )
+                except Exception as e:
+                    print(f"[TraceBatch] Skipping line {line_no}: {e}")
+                offset += length
+
+    def _append(
+        self,
+        trace_id: Optional[str],
+        source: Optional[str],
+        cost: Optional[float],
+        response_time: Optional[float],
+        offset: int,
+        length: int,
+    ) -> None:
+        self.trace_ids.append(trace_id or "")
+        self.source_trace_ids.append(source or trace_id or "")
+        self.cost.append(cost or 0)
+        self.response_time.append(response_time or 0)
+        self.offsets.append(offset)
+        self.lengths.append(length)
+
+    # ---------- ACCESS ----------
+
+    def __len__(self) -> int:
+        return len(self.trace_ids)
+
+    def __iter__(self) -> Iterator[TraceRecord]:
+        for i in range(len(self)):
+            yield TraceRecord(self, i)
+
+    def __getitem__(self, index: int) -> TraceRecord:
+        if not 0 <= index < len(self):
+            raise IndexError(index)
+        return TraceRecord(self, index)
+
+    def load_bodies(self, index: int) -> Tuple[Optional[str], Optional[str]]:
+        """
+        (input, output) of one trace.
+        """
+        with self._lock:
+            if self._bodies is None:
+                store = TraceStore.for_log_file(self.log_file_path)
+                self._bodies = store.open_body_reader() if store is not None else False
+
+            if self._bodies:
+                ## Store rows are numbered in export order, like positions.
+                return TraceStore.read_bodies(self._bodies, self.start + index)
+
+        entry = self.load_entry(index)
+        return _extract_input(entry), _extract_output(entry)
+
+    def load_entry(self, index: int) -> Dict[str, Any]:
+        """
+        Parse the full JSONL line for one trace.
+        """
+        with self._lock:
+            if self._handle is None:
+                self._handle = open(self.log_file_path, "rb")
+
+            self._handle.seek(self.offsets[index])
+            line = self._handle.read(self.lengths[index])
+
+        return json.loads(line)
+
+    def close(self) -> None:
+        with self._lock:
+            if self._handle is not None:
+                self._handle.close()
+                self._handle = None
+            if self._bodies:
+                self._bodies.close()
+            self._bodies = None
+
+    def __enter__(self) -> "TraceBatch":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+
+class EvaluationBatch:
+    """
+    Judge results for one (agent, model) pair, stored column-wise.
+    Iterating yields the same dict rows the judge used to return.
+    """
+
+    __slots__ = (
+        "agent",
+        "model",
+        "trace_ids",
+        "response_time_ms",
+        "cost",
+        "quality_score",
+        "verdicts",
+    )
+
+    def __init__(self, agent: str, model: str):
+        self.agent = agent
+        self.model = model
+        self.trace_ids: List[str] = []
+        self.response_time_ms = array("d")
+        self.cost = array("d")
+        self.quality_score = array("d")
+        ## Per-criterion judge output, kept as compact JSON strings.
+        self.verdicts: List[Optional[str]] = []
+
+    def append(
+        self,
+        trace_id: str,
+        response_time_ms: float,
+        cost: float,
+        quality_score: float,
+        verdicts: Optional[Dict[str, Any]] = None,
+    ) -> None:
+        self.trace_ids.append(trace_id)
+        self.response_time_ms.append(response_time_ms or 0)
+        self.cost.append(cost or 0)
+        self.quality_score.append(quality_score or 0)
+        self.verdicts.append(
+            json.dumps(verdicts, separators=(",", ":")) if verdicts else None
+        )
+
+    def __len__(self) -> int:
+        return len(self.trace_ids)
+
+    def __iter__(self) -> Iterator[Dict[str, Any]]:
+        for i in range(len(self)):
+            yield {
+                "agent": self.agent,
+                "model": self.model,
+                "trace_id": self.trace_ids[i],
+                "response_time_ms": self.response_time_ms[i],
+                "cost": self.cost[i],
+                "quality_score": self.quality_score[i],
+                "verdicts": self.verdicts[i],
+            }
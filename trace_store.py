@@ -0,0 +1,306 @@
+import json
+import sqlite3
+from contextlib import closing
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple
+
+## Scalar columns live in `traces`; text bodies live in `bodies`, so reads
+## that only need numbers never touch the (large) body pages.
+SCALAR_COLUMNS = (
+    "trace_id",
+    "source_trace_id",
+    "created_at",
+    "model",
+    "cost",
+    "response_time",
+    "total_units",
+    "line_offset",
+    "line_length",
+)
+
+BODY_COLUMNS = (
+    "input",
+    "output",
+    "metadata",
+)
+
+MMAP_SIZE = 256 * 1024 * 1024
+
+
+def source_trace_id(entry: Dict[str, Any]) -> str:
+    """
+    Production trace a log entry belongs to: replays carry it in their
+    metadata (EvalRunner), everything else is its own source.
+    """
+    metadata = entry.get("metadata") or {}
+    if isinstance(metadata, str):
+        try:
+            metadata = json.loads(metadata)
+        except json.JSONDecodeError:
+            metadata = {}
+
+    return metadata.get("source_trace_id") or entry.get("trace_id") or ""
+
+
+class TraceStore:
+    """
+    Columnar-ish SQLite copy of one exported JSONL file.
+
+    Each export is ingested once into `<export>.db` next to the JSONL;
+    consumers then read only the columns they need.
+    """
+
+    def __init__(self, db_path: str):
+        self.db_path = Path(db_path)
+
+    @staticmethod
+    def store_path_for(log_file_path: str) -> Path:
+        return Path(log_file_path).with_suffix(".db")
+
+    @classmethod
+    def for_log_file(cls, log_file_path: str) -> Optional["TraceStore"]:
+        """
+        Return the store ingested from `log_file_path`, if there is one.
+        """
+        path = cls.store_path_for(log_file_path)
+        return cls(str(path)) if path.exists() else None
+
+    # ---------- INGEST ----------
+
+    @classmethod
+    def ingest(
+        cls,
+        log_file_path: str,
+        db_path: Optional[str] = None,
+        batch_size: int = 1000,
+    ) -> "TraceStore":
+        """
+        Convert a JSONL export into a store in a single streaming pass.
+        """
+        db_path = Path(db_path or cls.store_path_for(log_file_path))
+        if db_path.exists():
+            db_path.unlink()
+
+        store = cls(str(db_path))
+        rows = 0
+        skipped = 0
+
+        with closing(sqlite3.connect(db_path)) as conn, conn:
+            conn.execute("PRAGMA journal_mode = OFF")
+            conn.execute("PRAGMA synchronous = OFF")
+            store._create_schema(conn)
+
+            scalars: List[Tuple] = []
+            bodies: List[Tuple] = []
+
+            with open(log_file_path, "rb") as f:
+                offset = 0
+                for line_no, line in enumerate(f, start=1):
+                    length = len(line)
+                    try:
+                        entry = json.loads(line)
+                    except json.JSONDecodeError as e:
+                        print(f"[TraceStore] Skipping line {line_no}: {e}")
+                        skipped += 1
+                        offset += length
+                        continue
+
+                    scalar, body = cls._split_entry(rows, entry, offset, length)
+                    scalars.append(scalar)
+                    bodies.append(body)
+                    rows += 1
+                    offset += length
+
+                    if len(scalars) >= batch_size:
+                        store._insert(conn, scalars, bodies)
+                        scalars, bodies = [], []
+
+            if scalars:
+                store._insert(conn, scalars, bodies)
+
+            conn.execute("CREATE INDEX idx_traces_trace ON traces(trace_id)")
+
+        print(
+            f"[TraceStore] Ingested {rows} rows ({skipped} skipped) "
+            f"from {log_file_path} into {db_path}"
+        )
+
+        return store
+
+    @staticmethod
+    def _create_schema(conn: sqlite3.Connection) -> None:
+        conn.execute("""
+            CREATE TABLE traces (
+                row_id INTEGER PRIMARY KEY,
+                trace_id TEXT,
+                source_trace_id TEXT,
+                created_at TEXT,
+                model TEXT,
+                cost REAL,
+                response_time INTEGER,
+                total_units INTEGER,
+                line_offset INTEGER,
+                line_length INTEGER
+            )
+        """)
+
+        conn.execute("""
+            CREATE TABLE bodies (
+                row_id INTEGER PRIMARY KEY,
+                input TEXT,
+                output TEXT,
+                metadata TEXT
+            )
+        """)
+
+    @staticmethod
+    def _split_entry(
+        row_id: int,
+        entry: Dict[str, Any],
+        offset: int,
+        length: int,
+    ) -> Tuple[Tuple, Tuple]:
+        try:
+            input_text = entry["request"]["messages"][1]["content"]
+        except (KeyError, IndexError, TypeError):
+            input_text = None
+
+        try:
+            output_text = entry["response"]["choices"][0]["message"]["content"]
+        except (KeyError, IndexError, TypeError):
+            output_text = None
+
+        metadata = entry.get("metadata")
+
+        scalar = (
+            row_id,
+            entry.get("trace_id", ""),
+            source_trace_id(entry),
+            entry.get("created_at"),
+            entry.get("ai_model"),
+            entry.get("cost", 0),
+            entry.get("response_time", 0),
+            entry.get("total_units"),
+            offset,
+            length,
+        )
+        body = (
+            row_id,
+            input_text,
+            output_text,
+            json.dumps(metadata) if metadata is not None else None,
+        )
+        return scalar, body
+
+    @staticmethod
+    def _insert(
+        conn: sqlite3.Connection,
+        scalars: List[Tuple],
+        bodies: List[Tuple],
+    ) -> None:
+        placeholders = ", ".join("?" * (len(SCALAR_COLUMNS) + 1))
+        conn.executemany(f"INSERT INTO traces VALUES ({placeholders})", scalars)
+        conn.executemany("INSERT INTO bodies VALUES (?, ?, ?, ?)", bodies)
+
+    # ---------- READ ----------
+
+    def _connect(self, check_same_thread: bool = True) -> sqlite3.Connection:
+        conn = sqlite3.connect(
+            f"file:{self.db_path}?mode=ro", uri=True, check_same_thread=check_same_thread
+        )
+        conn.execute(f"PRAGMA mmap_size = {MMAP_SIZE}")
+        return conn
+
+    def open_body_reader(self) -> sqlite3.Connection:
+        """
+        Connection for repeated read_bodies() lookups. It may be shared
+        across threads; callers serialize access to it.
+        """
+        return self._connect(check_same_thread=False)
+
+    @staticmethod
+    def read_bodies(conn: sqlite3.Connection, row_id: int) -> Tuple[Optional[str], Optional[str]]:
+        """
+        (input, output) of one row by primary key, without parsing the
+        JSONL line.
+        """
+        row = conn.execute(
+            "SELECT input, output FROM bodies WHERE row_id = ?", (row_id,)
+        ).fetchone()
+        return (row[0], row[1]) if row else (None, None)
+
+    @staticmethod
+    def _select(columns: Sequence[str]) -> str:
+        fields = []
+        needs_bodies = False
+
+        for column in columns:
+            if column in SCALAR_COLUMNS:
+                fields.append(f"t.{column}")
+            elif column in BODY_COLUMNS:
+                fields.append(f"b.{column}")
+                needs_bodies = True
+            else:
+                raise ValueError(f"Unknown trace column: {column}")
+
+        source = "traces t"
+        if needs_bodies:
+            source += " JOIN bodies b ON b.row_id = t.row_id"
+
+        return f"SELECT {', '.join(fields)} FROM {source} ORDER BY t.row_id"
+
+    def iter_rows(self, columns: Sequence[str]) -> Iterator[Tuple]:
+        """
+        Stream tuples of the requested columns in export order.
+        """
+        conn = self._connect()
+        try:
+            yield from conn.execute(self._select(columns))
+        finally:
+            conn.close()
+
+    def read_columns(self, columns: Sequence[str]) -> Dict[str, List[Any]]:
+        """
+        Projected read: one list per requested column.
+        """
+        out: Dict[str, List[Any]] = {column: [] for column in columns}
+        appenders = [out[column].append for column in columns]
+
+        for row in self.iter_rows(columns):
+            for append, value in zip(appenders, row):
+                append(value)
+
+        return out
+
+    def read_column(self, column: str, skip_null: bool = False) -> List[Any]:
+        values = [row[0] for row in self.iter_rows([column])]
+        if skip_null:
+            values = [v for v in values if v is not None]
+        return values
+
+    def count(self) -> int:
+        conn = self._connect()
+        try:
+            return conn.execute("SELECT COUNT(*) FROM traces").fetchone()[0]
+        finally:
+            conn.close()
+
+    def summary(self) -> Dict[str, Any]:
+        """
+        Scalar-only aggregate, without reading any bodies.
+        """
+        conn = self._connect()
+        conn.row_factory = sqlite3.Row
+        try:
+            row = conn.execute("""
+                SELECT
+                    COUNT(*) AS traces,
+                    SUM(cost) AS total_cost,
+                    AVG(cost) AS avg_cost,
+                    AVG(response_time) AS avg_latency,
+                    SUM(total_units) AS total_units
+                FROM traces
+            """).fetchone()
+            return dict(row)
+        finally:
+            conn.close()
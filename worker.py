@@ -0,0 +1,277 @@
+import argparse
+import json
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional, Tuple
+
+import yaml
+from dotenv import load_dotenv
+
+from call_policy import CallPolicy
+from circuit_breaker import CircuitBreakerRegistry
+from eval_metric_store import EvalMetricStore
+from llm_judge import LLMJudge
+from portkey_client import PortkeyClientFactory
+from runner_eval import EvalRunner
+from task_queue import JUDGE, REPLAY, Task, TaskQueueBackend, default_worker_id
+from telemetry import Telemetry
+
+load_dotenv()
+
+
+def _usage(model: str, usage: Any) -> Optional[Dict[str, Any]]:
+    if usage is None:
+        return None
+    return {
+        "model": model,
+        "prompt_tokens": getattr(usage, "prompt_tokens", None),
+        "completion_tokens": getattr(usage, "completion_tokens", None),
+    }
+
+
+class Worker:
+    """
+    Pulls replay / judge tasks from the task queue and executes them.
+
+    Any number of workers (processes or machines sharing the queue and
+    metric store) can run side by side; the scheduler only enqueues,
+    waits and reports. Leases of in-flight tasks are extended by a
+    heartbeat so long calls are not handed to another worker.
+    """
+
+    def __init__(
+        self,
+        config_path: str,
+        queue: Optional[TaskQueueBackend] = None,
+        concurrency: Optional[int] = None,
+        kinds: Optional[List[str]] = None,
+        worker_id: Optional[str] = None,
+    ):
+        self.config_path = config_path
+        with open(config_path, "r") as f:
+            self.config = yaml.safe_load(f)
+
+        cfg = self.config.get("task_queue") or {}
+
+        self.queue = queue or TaskQueueBackend.from_config(self.config)
+        if self.queue is None:
+            raise ValueError("task_queue.enabled is false in config")
+
+        self.concurrency = concurrency or int(cfg.get("concurrency", 8))
+        self.poll_interval = float(cfg.get("poll_interval", 2))
+        self.kinds = kinds
+        self.worker_id = worker_id or default_worker_id()
+
+        self.client_factory = PortkeyClientFactory.from_config(self.config)
+        self.portkey = self.client_factory.get_client()
+        self.telemetry = Telemetry.from_config(self.config)
+        self.call_policy = CallPolicy.from_config(self.config, telemetry=self.telemetry)
+        self.breakers = CircuitBreakerRegistry.from_config(self.config)
+        self.metric_store = EvalMetricStore(
+            db_path=self.config["scheduler"].get("db_path", "metrics.db")
+        )
+
+        self._runners: Dict[str, EvalRunner] = {}
+        self._judges: Dict[Tuple[str, str], LLMJudge] = {}
+        self._lock = threading.Lock()
+
+        self._held: Dict[int, Task] = {}
+        self._stop = threading.Event()
+        self.stats = {"done": 0, "failed": 0, "released": 0, "lost": 0}
+
+    # ---------- EXECUTORS ----------
+
+    def _runner(self, agent: str) -> EvalRunner:
+        with self._lock:
+            if agent not in self._runners:
+                self._runners[agent] = EvalRunner(
+                    config_path=self.config_path,
+                    team_id="portkey",
+                    agent_id=agent,
+                    log_file_path="",
+                    portkey=self.portkey,
+                    call_policy=self.call_policy,
+                    breakers=self.breakers,
+                    telemetry=self.telemetry,
+                    metric_store=self.metric_store,
+                    config=self.config,
+                )
+            return self._runners[agent]
+
+    def _judge(self, agent: str, model: str) -> LLMJudge:
+        with self._lock:
+            if (agent, model) not in self._judges:
+                self._judges[(agent, model)] = LLMJudge(
+                    agent_name=agent,
+                    model_name=model,
+                    config_path=self.config_path,
+                    log_file_path="",
+                    portkey=self.portkey,
+                    call_policy=self.call_policy,
+                    telemetry=self.telemetry,
+                    config=self.config,
+                )
+            return self._judges[(agent, model)]
+
+    def execute(self, task: Task) -> Optional[Dict[str, Any]]:
+        """
+        Run one task and return its token usage.
+        """
+        payload = task.payload
+
+        if task.kind == REPLAY:
+            usage = self._runner(task.agent).replay_one(
+                task.model, payload.get("input"), task.trace_id, payload.get("index", 0),
+                task.run_id,
+            )
+            return _usage(task.model, usage)
+
+        if task.kind == JUDGE:
+            judge = self._judge(task.agent, task.model)
+            evaluation, score, usage = judge.judge_one(payload["input"], payload["output"])
+
+            ## Idempotent per (trace_id, agent, model): a duplicate delivery
+            ## rewrites the same row.
+            self.metric_store.upsert_evaluation(
+                trace_id=task.trace_id,
+                agent=task.agent,
+                model=task.model,
+                response_time_ms=payload.get("response_time"),
+                cost=payload.get("cost"),
+                quality_score=score,
+                verdicts=json.dumps(evaluation, separators=(",", ":")),
+                run_id=task.run_id,
+            )
+            return _usage(judge.judge_cfg["model"], usage)
+
+        raise ValueError(f"Unknown task kind: {task.kind}")
+
+    def _handle(self, task: Task) -> None:
+        try:
+            self._process(task)
+        finally:
+            with self._lock:
+                self._held.pop(task.id, None)
+
+    def _process(self, task: Task) -> None:
+        ## Replays honour the provider/model circuit breaker; the task goes
+        ## back to the queue until the breaker cools down.
+        if task.kind == REPLAY:
+            allowed, reason = self.breakers.allow(task.model)
+            if not allowed:
+                cooldown = float(self.breakers.breaker_cfg.get("cooldown_seconds", 60))
+                self.queue.release(task, delay=cooldown)
+                self._count("released")
+                return
+
+        start = time.monotonic()
+        try:
+            usage = self.execute(task)
+        except Exception as e:
+            if task.kind == REPLAY:
+                self.breakers.record_failure(task.model, str(e))
+            print(f"[Worker] {task} failed: {e}")
+            self.queue.fail(task, f"{type(e).__name__}: {e}", delay=self._retry_delay(task))
+            self._count("failed")
+            return
+
+        if task.kind == REPLAY:
+            self.breakers.record_success(task.model, time.monotonic() - start)
+
+        if self.queue.complete(task, usage):
+            self._count("done")
+        else:
+            ## The lease expired and the task was handed to someone else;
+            ## their attempt owns the outcome.
+            print(f"[Worker] Lost lease on {task}")
+            self._count("lost")
+
+    def _retry_delay(self, task: Task) -> float:
+        base = float((self.config.get("task_queue") or {}).get("retry_delay", 5))
+        return base * 2 ** (task.attempts - 1)
+
+    def _count(self, key: str) -> None:
+        with self._lock:
+            self.stats[key] += 1
+
+    # ---------- LOOP ----------
+
+    def _heartbeat(self) -> None:
+        interval = max(1.0, getattr(self.queue, "visibility_timeout", 300) / 3)
+        while not self._stop.wait(interval):
+            with self._lock:
+                held = list(self._held.values())
+            if held:
+                self.queue.extend(held)
+
+    def run(self, drain: bool = False) -> Dict[str, int]:
+        """
+        Lease and execute tasks until stopped. With `drain`, return once
+        the queue has nothing visible.
+        """
+        print(
+            f"[Worker] {self.worker_id} started "
+            f"concurrency={self.concurrency} kinds={self.kinds or 'all'}"
+        )
+
+        threading.Thread(target=self._heartbeat, name="worker-heartbeat", daemon=True).start()
+
+        with ThreadPoolExecutor(max_workers=self.concurrency) as pool:
+            try:
+                while not self._stop.is_set():
+                    with self._lock:
+                        free = self.concurrency - len(self._held)
+
+                    tasks = self.queue.lease(self.worker_id, free, self.kinds) if free else []
+
+                    if not tasks:
+                        with self._lock:
+                            idle = not self._held
+                        if drain and idle:
+                            break
+                        time.sleep(self.poll_interval if idle else 0.05)
+                        continue
+
+                    with self._lock:
+                        for task in tasks:
+                            self._held[task.id] = task
+                    for task in tasks:
+                        pool.submit(self._handle, task)
+            except KeyboardInterrupt:
+                print("[Worker] Interrupted, finishing in-flight tasks")
+            finally:
+                self._stop.set()
+
+        print(f"[Worker] {self.worker_id} stopped: {self.stats}")
+        return self.stats
+
+    def stop(self) -> None:
+        self._stop.set()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay / judge task queue worker")
+    parser.add_argument("--config", default="config.yaml")
+    parser.add_argument("--concurrency", type=int, help="Tasks executed at once")
+    parser.add_argument(
+        "--kinds", help="Comma-separated task kinds to take (replay,judge)"
+    )
+    parser.add_argument("--worker-id", help="Defaults to host-pid-random")
+    parser.add_argument(
+        "--drain", action="store_true",
+        help="Exit once no task is visible instead of polling forever",
+    )
+
+    args = parser.parse_args()
+
+    Worker(
+        config_path=args.config,
+        concurrency=args.concurrency,
+        kinds=args.kinds.split(",") if args.kinds else None,
+        worker_id=args.worker_id,
+    ).run(drain=args.drain)
+
+
+if __name__ == "__main__":
+    main()